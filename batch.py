@@ -0,0 +1,277 @@
+import argparse
+import html
+import json
+import os
+import shutil
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import calendario as cal
+import estadisticas
+import informes
+import particiones
+import procesamiento
+import unidades
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+# Ejecución sin interfaz de las cuatro pestañas para uno o muchos logs:
+#   python batch.py --estados maestro.csv logs/*.csv --salida informes/ --procesos 4
+# Cada log se procesa en un proceso del pool y deja en <salida>/<nombre del log>/
+# un resumen.json, una tabla CSV por resultado y (opcional) un informe.html, que dibuja
+# el mapa con la copia local de Mermaid (mermaid.min.js en la misma carpeta). Con
+# --memoria agrega memoria.csv (bytes por columna del modelo).
+FORMATOS       = ('json', 'csv', 'html')
+NIVEL_IC       = 95
+PRESUPUESTO_IC = 60.0      # segundos por tabla de IC bootstrap (sin apuro en batch)
+EXTENSIONES    = ('.csv', '.xes', '.jsonocel')   # logs que se toman de un directorio
+
+
+# ==========================================
+# CÁLCULO DE RESULTADOS
+# ==========================================
+def resultados_modelo(modelo, nivel=NIVEL_IC, presupuesto_ic=PRESUPUESTO_IC, unidad=unidades.UNIDAD_DEFECTO,
+                      calendario=None):
+    # Devuelve (tablas, resumen, código Mermaid del mapa); tablas es {nombre: DataFrame}
+    # con las duraciones expresadas en `unidad` (las hábiles según `calendario`)
+    vista = unidades.vista_modelo(modelo, unidad, calendario)
+    cfg_unidad = unidades.UNIDADES[unidad]
+    df_trans, df_var = vista['df_transiciones'], vista['df_variantes']
+    tablas = {}
+
+    # ── Mapa ──
+    edges_stats, node_stats = informes.resumen_mapa(vista['dfg'], modelo['orden_estados'])
+    tablas['mapa_aristas'] = edges_stats
+    tablas['mapa_nodos'] = pd.DataFrame.from_dict(node_stats, orient='index').rename_axis('Etapa').reset_index()
+    tablas['variantes'] = informes.frecuencia_variantes(df_var)[['Nombre_Variante', 'Ruta', 'Frecuencia', 'Porcentaje']] \
+        .iloc[::-1].rename(columns={'Nombre_Variante': 'Variante'})
+
+    # ── Estadísticas ──
+    for clave, (df, col_agrupacion, col_valor, nombre) in informes.grupos_estadisticas(df_trans, df_var).items():
+        ic = estadisticas.intervalos_bootstrap(df, col_agrupacion, col_valor, nivel / 100,
+                                               n_min=informes.N_MIN_VALIDO, presupuesto_s=presupuesto_ic)
+        tablas[f'estadisticas_{clave}'] = informes.tabla_estadisticas(df, col_agrupacion, col_valor, nombre, ic=ic)
+
+    # ── Diagnóstico ──
+    etapa_stats = informes.cuellos_botella(df_trans)
+    recurso_stats = informes.recursos_sobrecarga(df_trans)
+    tablas['diagnostico_etapas'] = etapa_stats
+    tablas['diagnostico_recursos'] = recurso_stats
+    tablas['diagnostico_prediccion'] = informes.prediccion_variantes(df_var)
+
+    # ── Pronóstico ──
+    tarjetas, n_excluidas = informes.pronostico_variantes(
+        df_var, segundos_unidad=unidades.segundos_por_unidad(unidad, vista['calendario']))
+    tablas['pronostico'] = pd.DataFrame(tarjetas)
+
+    def fila_json(fila):
+        return None if fila is None else {'nombre': fila.iloc[0], 'promedio': fila['Promedio'], 'casos': fila['Casos']}
+
+    resumen = {
+        'periodo':               modelo['periodo_fechas'],
+        'casos':                 len(df_var),
+        'transiciones':          len(df_trans),
+        'variantes':             len(tablas['variantes']),
+        'filas_omitidas':        modelo['filas_omitidas'],
+        'nivel_confianza':       nivel,
+        'unidad':                cfg_unidad['nombre'],
+        'cuello_botella':        fila_json(etapa_stats.iloc[0] if not etapa_stats.empty else None),
+        'recurso_critico':       fila_json(informes.recurso_critico(recurso_stats) if not recurso_stats.empty else None),
+        'pronostico':            tarjetas,
+        'sin_pronostico':        n_excluidas,
+    }
+    mermaid_code = ""
+    if not edges_stats.empty:
+        mermaid_code, _ = informes.codigo_mermaid(edges_stats, node_stats, resaltar_cuellos=True,
+                                                  tiene_est_orden=modelo['tiene_est_orden'],
+                                                  nombre_unidad=cfg_unidad['nombre'])
+    return tablas, resumen, mermaid_code
+
+
+# ==========================================
+# SALIDAS
+# ==========================================
+def _json_default(valor):
+    return valor.item() if hasattr(valor, 'item') else str(valor)
+
+
+def informe_html(titulo, tablas, resumen, mermaid_code):
+    # Página autónoma: tablas + mapa Mermaid (sin callbacks de clic, que solo existen en la app)
+    secciones = [
+        ("Mapa de proceso", ['mapa_nodos', 'mapa_aristas', 'variantes']),
+        ("Estadísticas", ['estadisticas_variante', 'estadisticas_etapa', 'estadisticas_recurso']),
+        ("Diagnóstico", ['diagnostico_etapas', 'diagnostico_recursos', 'diagnostico_prediccion']),
+        ("Pronóstico", ['pronostico']),
+    ]
+    mermaid = "\n".join(l for l in mermaid_code.splitlines() if not l.strip().startswith('click '))
+    cuerpo = f"<h1>{html.escape(titulo)}</h1><p>{html.escape(resumen['periodo'])} · {resumen['casos']:,} casos</p>"
+    if mermaid:
+        cuerpo += f'<h2>Mapa</h2><pre class="mermaid">{html.escape(mermaid)}</pre>'
+    for seccion, nombres in secciones:
+        cuerpo += f"<h2>{seccion}</h2>"
+        for nombre in nombres:
+            df = tablas[nombre]
+            if df.empty: continue
+            cuerpo += f"<h3>{nombre.replace('_', ' ').capitalize()}</h3>"
+            cuerpo += df.to_html(index=False, float_format=lambda x: informes.formato_latino(x), border=0, classes='tabla')
+    return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(titulo)}</title>
+<style>
+    body{{font-family:Arial,sans-serif;margin:24px;color:#1f2937;}}
+    .tabla{{border-collapse:collapse;font-size:13px;margin-bottom:18px;}}
+    .tabla th,.tabla td{{border-bottom:1px solid #e5e7eb;padding:4px 10px;text-align:left;}}
+    .tabla th{{background:#f8fafc;}}
+</style>
+<script src="mermaid.min.js"></script>
+<script>window.addEventListener('load', function() {{ if (window.mermaid) mermaid.initialize({{startOnLoad: true}}); }});</script>
+</head><body>{cuerpo}</body></html>"""
+
+
+def escribir_resultados(dir_salida, titulo, tablas, resumen, mermaid_code, formatos=FORMATOS):
+    os.makedirs(dir_salida, exist_ok=True)
+    if 'json' in formatos:
+        with open(os.path.join(dir_salida, 'resumen.json'), 'w', encoding='utf-8') as f:
+            json.dump(resumen, f, ensure_ascii=False, indent=2, default=_json_default)
+    if 'csv' in formatos:
+        for nombre, df in tablas.items():
+            df.to_csv(os.path.join(dir_salida, f"{nombre}.csv"), index=False, encoding='utf-8')
+    if 'html' in formatos:
+        # El bundle viaja con el informe: se abre sin Internet y sin el repositorio
+        shutil.copyfile(informes.ruta_mermaid(), os.path.join(dir_salida, 'mermaid.min.js'))
+        with open(os.path.join(dir_salida, 'informe.html'), 'w', encoding='utf-8') as f:
+            f.write(informe_html(titulo, tablas, resumen, mermaid_code))
+
+
+def escribir_memoria(dir_salida, modelo):
+    # memoria.csv: bytes por columna de las tablas del modelo, almacenadas (categóricas)
+    # vs. como strings de Python
+    reportes = [procesamiento.reporte_memoria(modelo[t]).assign(Tabla=t) for t in ('df_transiciones', 'df_variantes')]
+    reporte = pd.concat(reportes, ignore_index=True)
+    reporte[['Tabla'] + [c for c in reporte.columns if c != 'Tabla']].to_csv(
+        os.path.join(dir_salida, 'memoria.csv'), index=False, encoding='utf-8')
+
+
+# ==========================================
+# EJECUCIÓN
+# ==========================================
+def procesar_log(ruta_log, ruta_estados, dir_salida, formatos=FORMATOS, nivel=NIVEL_IC, presupuesto_ic=PRESUPUESTO_IC,
+                 unidad=unidades.UNIDAD_DEFECTO, calendario=None, presupuesto_mb=particiones.PRESUPUESTO_MB,
+                 memoria=False):
+    # Un log completo: lectura, modelo, resultados y escritura. Devuelve (casos, segundos)
+    inicio = time.perf_counter()
+    with open(ruta_estados, 'rb') as f: bytes_est = f.read()
+    if particiones.usar_particiones(ruta_log, presupuesto_mb):
+        modelo = particiones.procesar_en_particiones(ruta_log, bytes_est, presupuesto_mb)
+    else:
+        with open(ruta_log, 'rb') as f: bytes_log = f.read()
+        modelo = particiones.procesar_en_paralelo(bytes_log, bytes_est)
+    tablas, resumen, mermaid_code = resultados_modelo(modelo, nivel, presupuesto_ic, unidad, calendario)
+    resumen['log'] = os.path.abspath(ruta_log)
+    escribir_resultados(dir_salida, os.path.basename(ruta_log), tablas, resumen, mermaid_code, formatos)
+    if memoria:
+        escribir_memoria(dir_salida, modelo)
+    return resumen['casos'], time.perf_counter() - inicio
+
+
+def _inicializar_proceso():
+    # Los logs ya se reparten entre procesos: ni el bootstrap ni las particiones abren un pool propio
+    estadisticas.MAX_PROCESOS = 1
+    particiones.MAX_PROCESOS = 1
+
+
+def expandir_logs(rutas):
+    # Acepta archivos y directorios (sus logs según EXTENSIONES); nombres de salida sin colisiones
+    logs = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            logs += sorted(os.path.join(ruta, a) for a in os.listdir(ruta) if a.lower().endswith(EXTENSIONES))
+        else:
+            logs.append(ruta)
+    nombres = [os.path.splitext(os.path.basename(r))[0] for r in logs]
+    # Ante nombres repetidos se antepone la carpeta y, si siguen repetidos, se agrega
+    # la extensión (log.xes y log.jsonocel de una misma carpeta)
+    for desambiguar in (lambda r, n: f"{os.path.basename(os.path.dirname(os.path.abspath(r)))}_{n}",
+                        lambda r, n: f"{n}_{os.path.splitext(r)[1].lstrip('.')}"):
+        repetidos = {n for n, veces in Counter(m.lower() for m in nombres).items() if veces > 1}
+        nombres = [desambiguar(r, n) if n.lower() in repetidos else n for r, n in zip(logs, nombres)]
+    # Lo que aún coincida (el mismo log dos veces, ...) lleva un contador: nunca se pisan salidas
+    usados, salida = set(), []
+    for r, n in zip(logs, nombres):
+        nombre, i = n, 1
+        while nombre.lower() in usados:
+            i += 1
+            nombre = f"{n}_{i}"
+        usados.add(nombre.lower())
+        salida.append((r, nombre))
+    return salida
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera los resultados del monitor de procesos sin la interfaz.")
+    parser.add_argument('logs', nargs='+', help="Logs de eventos (CSV, XES u OCEL JSON) o directorios con logs")
+    parser.add_argument('--estados', required=True, help="Maestro de estados (CSV) común a todos los logs")
+    parser.add_argument('--salida', default='salida_batch', help="Directorio de salida (una carpeta por log)")
+    parser.add_argument('--formatos', default=','.join(FORMATOS), help="Subconjunto de json,csv,html")
+    parser.add_argument('--procesos', type=int, default=min(4, os.cpu_count() or 1), help="Logs en paralelo")
+    parser.add_argument('--nivel', type=int, default=NIVEL_IC, help="Nivel de confianza de los IC (%%)")
+    parser.add_argument('--presupuesto-ic', type=float, default=PRESUPUESTO_IC, help="Segundos por tabla de IC")
+    parser.add_argument('--unidad', default=unidades.UNIDAD_DEFECTO, choices=list(unidades.UNIDADES),
+                        help="Unidad de tiempo de las duraciones informadas")
+    parser.add_argument('--turno', default=cal.TURNO, help="Turno de las unidades hábiles (HH:MM-HH:MM)")
+    parser.add_argument('--feriados', default=cal.FERIADOS, help="Archivo con un feriado por línea")
+    parser.add_argument('--presupuesto-mb', type=float, default=particiones.PRESUPUESTO_MB,
+                        help="Memoria para leer cada log; los más grandes se procesan por particiones en disco")
+    parser.add_argument('--memoria', action='store_true',
+                        help="Deja memoria.csv con los bytes por columna del modelo (categóricas vs. strings)")
+    args = parser.parse_args(argv)
+
+    formatos = tuple(f.strip() for f in args.formatos.split(',') if f.strip())
+    if invalidos := set(formatos) - set(FORMATOS):
+        parser.error(f"formatos no soportados: {', '.join(sorted(invalidos))}")
+    if 'html' in formatos:
+        try: informes.ruta_mermaid()
+        except FileNotFoundError as e: parser.error(str(e))
+    logs = expandir_logs(args.logs)
+    if not logs:
+        parser.error("no se encontraron logs")
+    try:
+        feriados = []
+        if args.feriados:
+            with open(args.feriados, encoding='utf-8') as f: feriados = cal.leer_feriados(f.read())
+        calendario = cal.crear_calendario(args.turno, feriados)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    tareas = [(ruta, args.estados, os.path.join(args.salida, nombre), formatos, args.nivel, args.presupuesto_ic,
+               args.unidad, calendario, args.presupuesto_mb, args.memoria) for ruta, nombre in logs]
+    errores = 0
+
+    def informar(ruta, resultado=None, error=None):
+        nonlocal errores
+        if error is None:
+            casos, segundos = resultado
+            print(f"OK     {ruta}: {casos:,} casos en {segundos:.1f} s")
+        else:
+            errores += 1
+            print(f"ERROR  {ruta}: {error!r}", file=sys.stderr)
+
+    if args.procesos > 1 and len(tareas) > 1:
+        with ProcessPoolExecutor(max_workers=args.procesos, initializer=_inicializar_proceso) as pool:
+            futuros = {pool.submit(procesar_log, *t): t[0] for t in tareas}
+            for futuro in as_completed(futuros):
+                try: informar(futuros[futuro], futuro.result())
+                except Exception as e: informar(futuros[futuro], error=e)
+    else:
+        for t in tareas:
+            try: informar(t[0], procesar_log(*t))
+            except Exception as e: informar(t[0], error=e)
+
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
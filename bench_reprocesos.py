@@ -0,0 +1,99 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import grafo
+import procesamiento
+from procesamiento import INICIO, FIN
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+# Compara la clasificación de reprocesos del mapa (grafo.clasificar_reprocesos) con la
+# versión anterior, que por cada arista filtraba todo edges_stats con una máscara para
+# buscar la inversa. Grafo "spaghetti": todos los pares entre N estados (~2.000 aristas
+# con 45), parte de los estados sin EST_ORDEN para ejercitar la heurística.
+#   python bench_reprocesos.py --estados 45 --repeticiones 3
+N_ESTADOS      = 45
+FRAC_SIN_ORDEN = 0.3
+REPETICIONES   = 3
+
+
+def generar_grafo(n_estados=N_ESTADOS, frac_sin_orden=FRAC_SIN_ORDEN, seed=0):
+    # (edges_stats, dict_orden, estados) con todas las aristas entre estados (bucles incluidos)
+    rng = np.random.default_rng(seed)
+    nombres = [f"Estado {i:03d}" for i in range(n_estados)]
+    origen, destino = np.meshgrid(np.arange(n_estados), np.arange(n_estados), indexing='ij')
+    origen, destino = origen.ravel(), destino.ravel()
+    estados = pd.Index([INICIO, FIN] + nombres)
+    edges_stats = pd.DataFrame({
+        'Origen':          pd.Categorical.from_codes(origen + 2, estados),
+        'Destino':         pd.Categorical.from_codes(destino + 2, estados),
+        'Frecuencia':      rng.integers(1, 500, len(origen)),
+        'Tiempo_Promedio': rng.exponential(86400, len(origen)),
+    })
+    con_orden = rng.random(n_estados) >= frac_sin_orden
+    dict_orden = {INICIO: -9999, FIN: 9999}
+    dict_orden.update({n: float(o) for n, o, c in zip(nombres, rng.permutation(n_estados), con_orden) if c})
+    return edges_stats, dict_orden, estados
+
+
+def clasificar_por_mascara(edges_stats, dict_orden):
+    # Referencia: el bucle del mapa antes de clasificar_reprocesos
+    tipos = []
+    for _, row in edges_stats.iterrows():
+        origen, destino, freq = row['Origen'], row['Destino'], row['Frecuencia']
+        tipo = 'normal'
+        if origen == destino:
+            tipo = 'bucle'
+        else:
+            o_order = dict_orden.get(str(origen).strip())
+            d_order = dict_orden.get(str(destino).strip())
+            if o_order is not None and d_order is not None:
+                if d_order < o_order: tipo = 'retroceso'
+            else:
+                freq_bwd = edges_stats[
+                    (edges_stats['Origen'] == destino) &
+                    (edges_stats['Destino'] == origen)
+                ]['Frecuencia'].sum()
+                if freq_bwd > freq: tipo = 'heuristico'
+        tipos.append(tipo)
+    return np.array(tipos, dtype=object)
+
+
+def medir(funcion, repeticiones):
+    # Mejor tiempo (ms) y último resultado
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor * 1000, resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la clasificación de reprocesos del mapa.")
+    parser.add_argument('--estados', type=int, default=N_ESTADOS, help="estados del grafo (aristas = estados²)")
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES)
+    args = parser.parse_args(argv)
+
+    edges_stats, dict_orden, estados = generar_grafo(args.estados)
+    orden = procesamiento.orden_por_codigo(dict_orden, estados)
+
+    ms_mascara, ref = medir(lambda: clasificar_por_mascara(edges_stats, dict_orden), args.repeticiones)
+    ms_vector, res = medir(lambda: grafo.clasificar_reprocesos(edges_stats, orden, estados), args.repeticiones)
+
+    iguales = (res['Tipo_Reproceso'].to_numpy(dtype=object) == ref).all()
+    conteo = pd.Series(ref).value_counts().to_dict()
+    print(f"Aristas: {len(edges_stats):,}  Estados: {args.estados}  Tipos: {conteo}")
+    print(f"Máscara por arista: {ms_mascara:9.1f} ms")
+    print(f"Vectorizado:        {ms_vector:9.1f} ms  (x{ms_mascara / max(ms_vector, 1e-9):,.0f})")
+    print(f"Clasificación idéntica: {'sí' if iguales else 'NO'}")
+    return 0 if iguales else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
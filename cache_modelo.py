@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import incremental
+import ingesta
+import particiones
+import procesamiento
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+# Caché a nivel de proceso: todas las sesiones de Streamlit que suben el mismo
+# log (y el mismo maestro de estados) reciben la misma instancia del modelo.
+# Las pestañas solo leen los DataFrames compartidos; nunca los modifican in situ.
+MAX_ENTRADAS = int(os.environ.get('MONITOR_CACHE_ENTRADAS', 8))
+MAX_MB       = float(os.environ.get('MONITOR_CACHE_MB', 2048))
+DIR_DISCO    = os.environ.get('MONITOR_CACHE_DIR')   # opcional: persiste el modelo entre reinicios
+
+_cache     = OrderedDict()      # clave -> (modelo, bytes)
+_bytes_uso = 0
+_lock      = threading.Lock()
+_en_curso  = {}                 # clave -> Lock (evita procesar dos veces el mismo archivo)
+BLOQUE_HASH = 16 * 1024 ** 2    # lectura por bloques al hashear un archivo abierto
+
+
+def _actualizar_hash(h, datos):
+    # bytes o archivo binario abierto; ambos dan la misma clave para el mismo contenido
+    if isinstance(datos, (bytes, bytearray, memoryview)):
+        h.update(len(datos).to_bytes(8, 'little'))
+        h.update(datos)
+        return
+    h.update(particiones.tamano_archivo(datos).to_bytes(8, 'little'))
+    for bloque in iter(lambda: datos.read(BLOQUE_HASH), b''):
+        h.update(bloque)
+    datos.seek(0)
+
+
+def _actualizar_mapeo(h, datos, campos):
+    # El mismo archivo con otro mapeo de columnas es otro modelo
+    h.update(json.dumps(ingesta.mapeo_columnas(datos, campos), sort_keys=True).encode())
+
+
+def clave_modelo(bytes_log, bytes_est):
+    # La versión invalida los modelos persistidos en disco con un formato anterior
+    h = hashlib.sha256(procesamiento.VERSION_MODELO.to_bytes(4, 'little'))
+    for b, campos in ((bytes_log, ingesta.COLUMNAS_LOG), (bytes_est, ingesta.COLUMNAS_ESTADOS)):
+        _actualizar_hash(h, b)
+        _actualizar_mapeo(h, b, campos)
+    return h.hexdigest()
+
+
+def tamano_modelo(valor):
+    # Bytes del modelo para el límite MAX_MB: tablas, arreglos, matrices dispersas del
+    # índice DFG y diccionarios anidados (dfg, prefijos, sketches); escalares y textos cuentan ~0
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, (pd.Series, pd.Index)):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if sparse.issparse(valor):
+        return sum(int(getattr(valor, a).nbytes) for a in ('data', 'indices', 'indptr', 'row', 'col') if hasattr(valor, a))
+    if isinstance(valor, dict):
+        return sum(tamano_modelo(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sum(tamano_modelo(v) for v in valor)
+    return 0
+
+
+def _guardar(clave, modelo):
+    global _bytes_uso
+    tam = tamano_modelo(modelo)
+    _cache[clave] = (modelo, tam)
+    _cache.move_to_end(clave)
+    _bytes_uso += tam
+    # Desalojo LRU por número de entradas y por memoria (siempre se conserva la más reciente)
+    while len(_cache) > 1 and (len(_cache) > MAX_ENTRADAS or _bytes_uso > MAX_MB * 1024 ** 2):
+        _, (_, tam_viejo) = _cache.popitem(last=False)
+        _bytes_uso -= tam_viejo
+
+
+def _ruta_disco(clave):
+    return os.path.join(DIR_DISCO, f"{clave}.pkl")
+
+
+def _leer_disco(clave):
+    if not DIR_DISCO or not os.path.exists(_ruta_disco(clave)): return None
+    try:
+        with open(_ruta_disco(clave), 'rb') as f: modelo = pickle.load(f)
+    except Exception:
+        return None
+    os.utime(_ruta_disco(clave))
+    return modelo
+
+
+def _escribir_disco(clave, modelo):
+    if not DIR_DISCO: return
+    os.makedirs(DIR_DISCO, exist_ok=True)
+    tmp = _ruta_disco(clave) + '.tmp'
+    with open(tmp, 'wb') as f: pickle.dump(modelo, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, _ruta_disco(clave))
+    # En disco se aplica el mismo límite de entradas (LRU por fecha de uso)
+    archivos = sorted(
+        (os.path.join(DIR_DISCO, a) for a in os.listdir(DIR_DISCO) if a.endswith('.pkl')),
+        key=os.path.getmtime
+    )
+    for viejo in archivos[:-MAX_ENTRADAS]:
+        try: os.remove(viejo)
+        except OSError: pass
+
+
+def _obtener(clave, construir):
+    with _lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave][0]
+        lock_clave = _en_curso.setdefault(clave, threading.Lock())
+
+    with lock_clave:
+        with _lock:
+            if clave in _cache:
+                return _cache[clave][0]
+        try:
+            modelo = _leer_disco(clave)
+            if modelo is None:
+                modelo = construir()
+                _escribir_disco(clave, modelo)
+            with _lock:
+                _guardar(clave, modelo)
+        finally:
+            with _lock:
+                _en_curso.pop(clave, None)
+    return modelo
+
+
+def obtener_modelo(bytes_log, bytes_est, clave=None):
+    clave = clave or clave_modelo(bytes_log, bytes_est)
+    return _obtener(clave, lambda: particiones.procesar_en_paralelo(bytes_log, bytes_est))
+
+
+def obtener_modelo_particionado(archivo_log, bytes_est, clave=None):
+    # Log grande como archivo abierto: se lee por bloques (particiones.py)
+    clave = clave or clave_modelo(archivo_log, bytes_est)
+    return _obtener(clave, lambda: particiones.procesar_en_particiones(archivo_log, bytes_est))
+
+
+def clave_anexo(clave_base, bytes_delta):
+    # La clave del modelo ampliado encadena la del modelo base con los eventos anexados
+    h = hashlib.sha256(clave_base.encode())
+    h.update(len(bytes_delta).to_bytes(8, 'little'))
+    h.update(bytes_delta)
+    _actualizar_mapeo(h, bytes_delta, ingesta.COLUMNAS_LOG)
+    return h.hexdigest()
+
+
+def anexar_modelo(clave_base, modelo_base, bytes_delta):
+    # Devuelve (clave, modelo) con los eventos nuevos incorporados sin reprocesar el log
+    clave = clave_anexo(clave_base, bytes_delta)
+    return clave, _obtener(clave, lambda: incremental.anexar_eventos(modelo_base, bytes_delta))
+
+
+def limpiar():
+    global _bytes_uso
+    with _lock:
+        _cache.clear()
+        _bytes_uso = 0
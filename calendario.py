@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# CALENDARIO LABORAL
+# ==========================================
+# Tiempo hábil = segundos dentro del turno en días hábiles (lunes a viernes salvo
+# feriados). Para el rango de fechas del log se arma una tabla con los segundos hábiles
+# acumulados al inicio de cada día: el tiempo hábil hasta un instante es acumulado[día]
+# + lo transcurrido del turno ese día, y la duración hábil de una transición es la
+# resta de sus dos extremos (dos búsquedas por fila, sin recorrer días).
+SEGUNDOS_DIA = 86_400
+DIAS_HABILES = '1111100'                                      # máscara lunes..domingo de np.busday_*
+TURNO        = os.environ.get('MONITOR_TURNO', '00:00-24:00')  # ej. '08:30-17:30'
+FERIADOS     = os.environ.get('MONITOR_FERIADOS')              # opcional: archivo con una fecha por línea
+
+
+# ==========================================
+# CONFIGURACIÓN DEL CALENDARIO
+# ==========================================
+def leer_turno(texto):
+    # 'HH:MM-HH:MM' -> (inicio, fin) en segundos desde la medianoche; sin turnos nocturnos
+    try:
+        horas = [tuple(int(p) for p in h.strip().split(':')) for h in texto.split('-')]
+        inicio, fin = [h * 3600 + m * 60 for h, m in horas]
+    except ValueError:
+        raise ValueError(f"Turno inválido: '{texto}' (formato HH:MM-HH:MM).")
+    if not 0 <= inicio < fin <= SEGUNDOS_DIA:
+        raise ValueError(f"Turno inválido: '{texto}' (el fin debe ser posterior al inicio, mismo día).")
+    return inicio, fin
+
+
+def leer_feriados(texto):
+    # Una fecha por línea o separadas por coma (dd-mm-aaaa o aaaa-mm-dd); '#' inicia un comentario
+    valores = [v.strip() for linea in texto.splitlines() for v in linea.split('#')[0].split(',') if v.strip()]
+    if not valores: return []
+    try:
+        # aaaa-mm-dd se lee tal cual; el resto con el día primero
+        fechas = [pd.to_datetime(v, format='ISO8601') if v[:4].isdigit() else pd.to_datetime(v, dayfirst=True)
+                  for v in valores]
+    except (ValueError, TypeError):
+        raise ValueError("Feriados inválidos: use una fecha por línea (dd-mm-aaaa).")
+    return [f.strftime('%Y-%m-%d') for f in fechas]
+
+
+def crear_calendario(turno=TURNO, feriados=(), dias_habiles=DIAS_HABILES):
+    # Solo tuplas: el calendario forma parte de la clave de caché de las vistas (clave_calendario)
+    inicio, fin = leer_turno(turno) if isinstance(turno, str) else turno
+    return {
+        'turno':        (int(inicio), int(fin)),
+        'feriados':     tuple(sorted({str(np.datetime64(f, 'D')) for f in feriados})),
+        'dias_habiles': dias_habiles,
+    }
+
+
+def calendario_defecto():
+    feriados = []
+    if FERIADOS:
+        with open(FERIADOS, encoding='utf-8') as f: feriados = leer_feriados(f.read())
+    return crear_calendario(TURNO, feriados)
+
+
+def clave_calendario(calendario):
+    return calendario['turno'], calendario['feriados'], calendario['dias_habiles']
+
+
+def segundos_jornada(calendario):
+    inicio, fin = calendario['turno']
+    return fin - inicio
+
+
+# ==========================================
+# DURACIONES HÁBILES VECTORIZADAS
+# ==========================================
+def tabla_acumulada(calendario, dia_min, dia_max):
+    # (primer día, día hábil sí/no, segundos hábiles acumulados al inicio de cada día)
+    dias = np.arange(dia_min, dia_max + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+    habil = np.is_busday(dias, weekmask=calendario['dias_habiles'],
+                         holidays=np.array(calendario['feriados'], dtype='datetime64[D]'))
+    acumulado = np.concatenate(([0], np.cumsum(habil * np.int64(segundos_jornada(calendario)))))
+    return dias[0], habil, acumulado
+
+
+def tiempo_habil(instantes, tabla, calendario):
+    # Segundos hábiles desde el inicio de la tabla hasta cada instante (datetime64[s])
+    dia0, habil, acumulado = tabla
+    inicio, fin = calendario['turno']
+    dia = instantes.astype('datetime64[D]')
+    i = (dia - dia0).astype(np.int64)
+    en_turno = np.clip((instantes - dia).astype(np.int64) - inicio, 0, fin - inicio)
+    return acumulado[i] + np.where(habil[i], en_turno, 0)
+
+
+def segundos_habiles(inicio, fin, calendario):
+    # Duración hábil de [inicio, fin) para todos los pares; 0 si falta una fecha o fin <= inicio
+    resultado = np.zeros(len(inicio), dtype=np.int64)
+    validas = ~(np.isnat(inicio) | np.isnat(fin))
+    validas[validas] = fin[validas] > inicio[validas]
+    if not validas.any(): return resultado
+    ini, fin = inicio[validas].astype('datetime64[s]'), fin[validas].astype('datetime64[s]')
+    tabla = tabla_acumulada(calendario, ini.min().astype('datetime64[D]'), fin.max().astype('datetime64[D]'))
+    resultado[validas] = tiempo_habil(fin, tabla, calendario) - tiempo_habil(ini, tabla, calendario)
+    return resultado
+
+
+def duraciones_habiles(df_trans, calendario):
+    # Columna alternativa a Duracion (segundos hábiles por transición, mismo orden que df_trans)
+    fechas = df_trans['Fecha_Inicio'].to_numpy()
+    return segundos_habiles(fechas, fechas + df_trans['Duracion'].to_numpy().astype('timedelta64[s]'), calendario)
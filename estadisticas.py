@@ -0,0 +1,284 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+# ==========================================
+# ESTADÍSTICAS AGRUPADAS (UNA SOLA PASADA)
+# ==========================================
+# Un único lexsort por (grupo, valor) deja cada grupo contiguo y ordenado; los
+# percentiles se leen por posición dentro de su tramo, sin ordenar por grupo.
+PERCENTILES = [5, 25, 75, 95]
+FACTOR_IQR  = 1.5
+
+
+def codificar_grupos(serie):
+    # Devuelve (códigos, etiquetas) respetando el orden que usaría groupby(observed=True)
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy().astype(np.int64), serie.cat.categories
+    codigos, etiquetas = pd.factorize(serie, sort=True)
+    return codigos.astype(np.int64), etiquetas
+
+
+def percentil_ordenado(ordenados, inicios, n, p):
+    # Percentil con interpolación lineal (igual a np.percentile) sobre tramos ya ordenados
+    idx = (p / 100) * (n - 1)
+    lo, hi = np.floor(idx).astype(np.int64), np.ceil(idx).astype(np.int64)
+    v_lo, v_hi = ordenados[inicios + lo], ordenados[inicios + hi]
+    return v_lo + (v_hi - v_lo) * (idx - lo)
+
+
+def tramos_ordenados(df, col_agrupacion, col_valor):
+    # Devuelve (etiquetas, valores ordenados, inicio y largo del tramo de cada grupo presente)
+    codigos, etiquetas = codificar_grupos(df[col_agrupacion])
+    valores = df[col_valor].to_numpy(dtype=np.float64, na_value=np.nan)
+    validos = (codigos >= 0) & ~np.isnan(valores)
+    codigos, valores = codigos[validos], valores[validos]
+
+    orden = np.lexsort((valores, codigos))
+    codigos, ordenados = codigos[orden], valores[orden]
+    conteo = np.bincount(codigos, minlength=len(etiquetas))
+    presentes = np.flatnonzero(conteo)
+    n = conteo[presentes]
+    inicios = np.concatenate(([0], np.cumsum(n)[:-1])).astype(np.int64)
+    return etiquetas[presentes], ordenados, inicios, n
+
+
+def estadisticas_agrupadas(df, col_agrupacion, col_valor):
+    # Columnas: grupo, n, Media, Mediana, P5, P25, P75, P95, Atipicos (solo grupos con n > 0)
+    etiquetas, ordenados, inicios, n = tramos_ordenados(df, col_agrupacion, col_valor)
+
+    resultado = {'grupo': etiquetas, 'n': n}
+    resultado['Media'] = np.add.reduceat(ordenados, inicios) / n if len(n) else n.astype(np.float64)
+    resultado['Mediana'] = percentil_ordenado(ordenados, inicios, n, 50)
+    for p in PERCENTILES:
+        resultado[f'P{p}'] = percentil_ordenado(ordenados, inicios, n, p)
+
+    # Atípicos por IQR: se compara cada valor contra los límites de su propio grupo
+    iqr = resultado['P75'] - resultado['P25']
+    lim_inf = np.repeat(resultado['P25'] - FACTOR_IQR * iqr, n)
+    lim_sup = np.repeat(resultado['P75'] + FACTOR_IQR * iqr, n)
+    fuera = (ordenados < lim_inf) | (ordenados > lim_sup)
+    resultado['Atipicos'] = np.add.reduceat(fuera.astype(np.int64), inicios) if len(n) else n
+    return pd.DataFrame(resultado)
+
+
+# ==========================================
+# INTERVALOS DE CONFIANZA BOOTSTRAP
+# ==========================================
+# Intervalo percentil para Mediana y P95. Las réplicas se generan por lotes como una
+# matriz de índices (réplicas x n) para no iterar en Python; los grupos grandes se
+# reparten en un pool de procesos. Cada grupo usa su propia semilla derivada de
+# SEMILLA_BOOTSTRAP y de su posición, así el resultado no depende del reparto.
+N_REPLICAS           = 1000
+SEMILLA_BOOTSTRAP    = 20240601
+PRESUPUESTO_S        = 2.0          # segundos por tabla; los grupos que no alcanzan quedan sin IC
+MAX_CELDAS_LOTE      = 4_000_000    # réplicas x n por lote (~32 MB de float64)
+MIN_N_PARALELO       = 20_000       # grupos con al menos n valores van al pool
+MAX_PROCESOS         = int(os.environ.get('MONITOR_BOOTSTRAP_PROCESOS', min(4, os.cpu_count() or 1)))
+PERCENTILES_IC       = [50, 95]
+
+_pool = None
+
+
+def _pool_bootstrap():
+    global _pool
+    if _pool is None: _pool = ProcessPoolExecutor(max_workers=MAX_PROCESOS)
+    return _pool
+
+
+def _percentiles_conteos(unicos, conteos, n):
+    # Percentiles (interpolación lineal) de réplicas dadas como conteos por valor único
+    acumulado = np.cumsum(conteos, axis=1)
+    salida = []
+    for p in PERCENTILES_IC:
+        idx = (p / 100) * (n - 1)
+        lo, hi = int(np.floor(idx)), int(np.ceil(idx))
+        v_lo = unicos[(acumulado <= lo).sum(axis=1)]
+        v_hi = unicos[(acumulado <= hi).sum(axis=1)]
+        salida.append(v_lo + (v_hi - v_lo) * (idx - lo))
+    return np.array(salida)
+
+
+def bootstrap_grupo(valores, nivel, semilla, limite=None, n_replicas=N_REPLICAS):
+    # valores ordenados de un grupo -> [inf_P50, sup_P50, inf_P95, sup_P95]; NaN si vence `limite`
+    n = len(valores)
+    if n < 2: return np.repeat(valores[:1], 2 * len(PERCENTILES_IC)) if n else np.full(2 * len(PERCENTILES_IC), np.nan)
+    rng = np.random.default_rng(semilla)
+
+    # Con muchos empates (duraciones en días enteros) remuestrear conteos por valor único es
+    # equivalente y mucho más barato: una multinomial de u categorías en vez de n índices.
+    corte = np.flatnonzero(np.r_[True, valores[1:] != valores[:-1]])
+    unicos, frecuencia = valores[corte], np.diff(np.r_[corte, n])
+    por_conteos = len(unicos) * 4 <= n
+    ancho = len(unicos) if por_conteos else n
+    lote = max(1, min(n_replicas, MAX_CELDAS_LOTE // ancho))
+
+    replicas = []
+    for hechas in range(0, n_replicas, lote):
+        if limite is not None and time.monotonic() > limite: return np.full(2 * len(PERCENTILES_IC), np.nan)
+        tam = min(lote, n_replicas - hechas)
+        if por_conteos:
+            replicas.append(_percentiles_conteos(unicos, rng.multinomial(n, frecuencia / n, size=tam), n))
+        else:
+            idx = rng.integers(0, n, size=(tam, n))
+            replicas.append(np.percentile(valores[idx], PERCENTILES_IC, axis=1))
+    replicas = np.concatenate(replicas, axis=1)
+    alfa = (1 - nivel) / 2
+    limites = np.percentile(replicas, [alfa * 100, (1 - alfa) * 100], axis=1)
+    return limites.T.ravel()
+
+
+def intervalos_bootstrap(df, col_agrupacion, col_valor, nivel, n_min=2, presupuesto_s=PRESUPUESTO_S, semilla=SEMILLA_BOOTSTRAP):
+    # Columnas: grupo, IC_Mediana_Inf, IC_Mediana_Sup, IC_P95_Inf, IC_P95_Sup
+    # NaN para grupos con menos de n_min valores o que no alcanzaron el presupuesto de tiempo
+    etiquetas, ordenados, inicios, n = tramos_ordenados(df, col_agrupacion, col_valor)
+    limite = time.monotonic() + presupuesto_s
+    resultado = np.full((len(n), 2 * len(PERCENTILES_IC)), np.nan)
+    semillas = [np.random.SeedSequence([semilla, i]) for i in range(len(n))]
+
+    grandes = {i for i in range(len(n)) if n[i] >= MIN_N_PARALELO and MAX_PROCESOS > 1}
+    futuros = {}
+    if grandes:
+        pool = _pool_bootstrap()
+        futuros = {pool.submit(bootstrap_grupo, ordenados[inicios[i]:inicios[i] + n[i]], nivel, semillas[i], limite): i for i in grandes}
+
+    # Los grupos chicos se calculan aquí mientras el pool trabaja, de mayor a menor n
+    for i in np.argsort(-n, kind='stable'):
+        if i in grandes or n[i] < n_min or time.monotonic() > limite: continue
+        resultado[i] = bootstrap_grupo(ordenados[inicios[i]:inicios[i] + n[i]], nivel, semillas[i], limite)
+
+    if futuros:
+        hechos, pendientes = wait(futuros, timeout=max(0.0, limite - time.monotonic()))
+        for f in hechos: resultado[futuros[f]] = f.result()
+        for f in pendientes: f.cancel()
+
+    columnas = ['IC_Mediana_Inf', 'IC_Mediana_Sup', 'IC_P95_Inf', 'IC_P95_Sup']
+    return pd.DataFrame(resultado, columns=columnas).assign(grupo=etiquetas)[['grupo'] + columnas]
+
+
+# ==========================================
+# SKETCHES DE CUANTILES (MODO APROXIMADO)
+# ==========================================
+# Sketch tipo DDSketch: cada valor x > 0 cae en la cubeta i = ceil(log_gamma(x)) con
+# gamma = (1 + alfa) / (1 - alfa), y la cubeta se representa por 2·gamma^i / (gamma + 1).
+# Garantía: cada percentil estimado tiene error relativo <= alfa respecto del percentil
+# exacto (misma interpolación lineal que estadisticas_agrupadas), acotado a [mínimo, máximo].
+# El tamaño depende solo del rango de valores (≈ ln(max/min) / ln(gamma) cubetas por grupo,
+# ~1.100 para 1 segundo..100 años con alfa = 1%), no del número de eventos. Dos sketches con el
+# mismo alfa se combinan sumando conteos (p. ej. logs mensuales -> vista anual). Los del
+# modelo están en segundos; 'escala' los expresa en otra unidad sin tocar las cubetas.
+ALFA_SKETCH   = 0.01
+CUBETA_CERO   = np.iinfo(np.int32).min     # valores <= 0 (duraciones nulas)
+
+
+def _gamma(alfa):
+    return (1 + alfa) / (1 - alfa)
+
+
+def construir_sketch(df, col_agrupacion, col_valor, alfa=ALFA_SKETCH):
+    # {'alfa', 'cubetas': DataFrame[grupo, cubeta, conteo], 'resumen': DataFrame[grupo, n, suma, minimo, maximo]}
+    grupos = df[col_agrupacion].astype(str).to_numpy()
+    valores = df[col_valor].to_numpy(dtype=np.float64, na_value=np.nan)
+    validos = ~np.isnan(valores) & df[col_agrupacion].notna().to_numpy()
+    grupos, valores = grupos[validos], valores[validos]
+
+    positivos = valores > 0
+    cubeta = np.full(len(valores), CUBETA_CERO, dtype=np.int64)
+    cubeta[positivos] = np.ceil(np.log(valores[positivos]) / np.log(_gamma(alfa))).astype(np.int64)
+
+    base = pd.DataFrame({'grupo': grupos, 'cubeta': cubeta, 'valor': valores})
+    cubetas = base.groupby(['grupo', 'cubeta'], sort=True).size().rename('conteo').reset_index()
+    resumen = base.groupby('grupo', sort=True)['valor'].agg(n='size', suma='sum', minimo='min', maximo='max').reset_index()
+    return {'alfa': alfa, 'cubetas': cubetas, 'resumen': resumen}
+
+
+def combinar_sketches(sketches):
+    sketches = list(sketches)
+    alfa = sketches[0]['alfa']
+    escala = sketches[0].get('escala', 1.0)
+    if any(s['alfa'] != alfa or s.get('escala', 1.0) != escala for s in sketches):
+        raise ValueError("Solo se pueden combinar sketches con el mismo alfa y la misma unidad.")
+    cubetas = (pd.concat([s['cubetas'] for s in sketches])
+               .groupby(['grupo', 'cubeta'], sort=True)['conteo'].sum().reset_index())
+    resumen = (pd.concat([s['resumen'] for s in sketches])
+               .groupby('grupo', sort=True).agg(n=('n', 'sum'), suma=('suma', 'sum'), minimo=('minimo', 'min'), maximo=('maximo', 'max'))
+               .reset_index())
+    return {'alfa': alfa, 'escala': escala, 'cubetas': cubetas, 'resumen': resumen}
+
+
+def restar_sketch(sketch, parte):
+    # Quita de `sketch` los valores resumidos en `parte` (mismo alfa). Mínimo y máximo se
+    # conservan como cotas: sin los valores originales no se pueden recalcular.
+    cubetas = sketch['cubetas'].merge(parte['cubetas'], on=['grupo', 'cubeta'], how='left', suffixes=('', '_q'))
+    cubetas['conteo'] = cubetas['conteo'] - cubetas['conteo_q'].fillna(0).astype(np.int64)
+    resumen = sketch['resumen'].merge(parte['resumen'][['grupo', 'n', 'suma']], on='grupo', how='left', suffixes=('', '_q'))
+    resumen['n'] = resumen['n'] - resumen['n_q'].fillna(0).astype(np.int64)
+    resumen['suma'] = resumen['suma'] - resumen['suma_q'].fillna(0)
+    return {
+        'alfa':    sketch['alfa'],
+        'escala':  sketch.get('escala', 1.0),
+        'cubetas': cubetas.loc[cubetas['conteo'] > 0, ['grupo', 'cubeta', 'conteo']].reset_index(drop=True),
+        'resumen': resumen.loc[resumen['n'] > 0, ['grupo', 'n', 'suma', 'minimo', 'maximo']].reset_index(drop=True),
+    }
+
+
+def escalar_sketch(sketch, factor):
+    # El mismo sketch en otra unidad (valores x factor): cubetas intactas, mismo error relativo
+    resumen = sketch['resumen'].copy()
+    resumen[['suma', 'minimo', 'maximo']] = resumen[['suma', 'minimo', 'maximo']] * factor
+    return {**sketch, 'escala': sketch.get('escala', 1.0) * factor, 'resumen': resumen}
+
+
+def _valor_cubeta(cubeta, alfa):
+    gamma = _gamma(alfa)
+    return np.where(cubeta == CUBETA_CERO, 0.0, 2 * np.power(gamma, cubeta.astype(np.float64)) / (gamma + 1))
+
+
+def cuantiles_sketch(sketch, percentiles):
+    # Devuelve resumen + una columna P{p} por percentil, para todos los grupos a la vez
+    cubetas, resumen = sketch['cubetas'], sketch['resumen'].copy()
+    valor = _valor_cubeta(cubetas['cubeta'].to_numpy(), sketch['alfa']) * sketch.get('escala', 1.0)
+    acumulado = np.cumsum(cubetas['conteo'].to_numpy())
+    # Conteo acumulado antes de cada grupo (cubetas y resumen comparten el orden por grupo)
+    n = resumen['n'].to_numpy()
+    previo = np.concatenate(([0], np.cumsum(n)[:-1]))
+    minimo, maximo = resumen['minimo'].to_numpy(), resumen['maximo'].to_numpy()
+
+    def _rango(r):
+        # Valor de la observación de orden r (0-based) dentro de cada grupo
+        pos = np.searchsorted(acumulado, previo + r, side='right')
+        return np.clip(valor[np.minimum(pos, len(valor) - 1)], minimo, maximo)
+
+    for p in percentiles:
+        idx = (p / 100) * (n - 1)
+        lo, hi = np.floor(idx), np.ceil(idx)
+        v_lo, v_hi = _rango(lo), _rango(hi)
+        resumen[f'P{p}'] = v_lo + (v_hi - v_lo) * (idx - lo)
+    return resumen
+
+
+def estadisticas_sketch(sketch):
+    # Mismas columnas que estadisticas_agrupadas; Atipicos se estima con el valor de cada cubeta
+    res = cuantiles_sketch(sketch, [50] + PERCENTILES)
+    res = res.rename(columns={'P50': 'Mediana'}).assign(Media=res['suma'] / res['n'])
+    iqr = res['P75'] - res['P25']
+    limites = pd.DataFrame({'grupo': res['grupo'], 'inf': res['P25'] - FACTOR_IQR * iqr, 'sup': res['P75'] + FACTOR_IQR * iqr})
+    cubetas = sketch['cubetas'].merge(limites, on='grupo', how='left')
+    valor = _valor_cubeta(cubetas['cubeta'].to_numpy(), sketch['alfa']) * sketch.get('escala', 1.0)
+    fuera = (valor < cubetas['inf'].to_numpy()) | (valor > cubetas['sup'].to_numpy())
+    atipicos = cubetas['conteo'].where(fuera, 0).groupby(cubetas['grupo'], sort=True).sum()
+    res['Atipicos'] = res['grupo'].map(atipicos).fillna(0).astype(np.int64).to_numpy()
+    return res[['grupo', 'n', 'Media', 'Mediana'] + [f'P{p}' for p in PERCENTILES] + ['Atipicos']]
+
+
+def sketches_modelo(df_trans, df_var, alfa=ALFA_SKETCH):
+    # Sketches que se guardan con el modelo al cargar el log. Las variantes se identifican
+    # por su ruta (no por el nombre "Variante N", que depende de cada log) para poder combinarlas.
+    etapas = df_trans[(df_trans['Origen'] != 'Inicio proceso') & (df_trans['Destino'] != 'Fin proceso')]
+    return {
+        'etapa':    construir_sketch(etapas, 'Origen', 'Duracion', alfa),
+        'recurso':  construir_sketch(df_trans[df_trans['Recurso_Origen'] != 'Sistema'], 'Recurso_Origen', 'Duracion', alfa),
+        'variante': construir_sketch(df_var, 'Ruta', 'Duracion_Total', alfa),
+    }
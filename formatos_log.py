@@ -0,0 +1,214 @@
+import codecs
+import collections
+import itertools
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+import ingesta
+
+# ==========================================
+# FORMATOS DE LOG: CSV, XES Y OCEL (JSON)
+# ==========================================
+# XES y OCEL se leen en streaming y se entregan de a bloques con las mismas columnas
+# que el CSV (ID, ESTADO, FECHA_ESTADO, RECURSO), así entran al modelo por
+# particiones.py sin conversión previa ni árbol XML / documento JSON en memoria:
+#   - XES: iterparse; cada <event> se lee y se borra al cerrarse, y cada <trace> al
+#     terminar (su concept:name es el ID de los eventos que contiene).
+#   - OCEL 1.0 / 2.0: un valor JSON por vez con raw_decode sobre un buffer. Se aplana
+#     por un tipo de objeto (por defecto el más frecuente): una fila por evento y objeto
+#     de ese tipo. Dos pasadas: objetos (id -> tipo) y eventos.
+# Las fechas conservan la hora local registrada (se descarta el desfase horario).
+ATRIBUTO_CASO     = 'concept:name'
+ATRIBUTO_ESTADO   = 'concept:name'
+ATRIBUTO_FECHA    = 'time:timestamp'
+ATRIBUTOS_RECURSO = ('org:resource', 'resource')
+CICLOS_XES        = ('complete',)    # eventos con otro lifecycle:transition se ignoran
+TIPO_OBJETO_OCEL  = os.environ.get('MONITOR_OCEL_TIPO')   # opcional: tipo de objeto que hace de caso
+BLOQUE_JSON       = 1024 ** 2        # caracteres leídos por vez del OCEL
+LARGO_EVENTO      = 64               # bytes de CSV equivalentes por evento (filas por bloque)
+EXPANSION         = {'csv': 1, 'xes': 8, 'ocel': 6}   # bytes de archivo por byte de CSV equivalente
+
+_DESFASE = r'(?:Z|[+-]\d{2}:?\d{2})$'
+
+
+def formato_log(muestra):
+    # 'csv', 'xes' u 'ocel' según el primer carácter significativo de la muestra
+    inicio = muestra.lstrip(codecs.BOM_UTF8).lstrip()[:1]
+    return 'xes' if inicio == b'<' else 'ocel' if inicio == b'{' else 'csv'
+
+
+def huella_log(muestra):
+    # Huella para recordar el formato de fecha (ver ingesta.parsear_fechas)
+    formato = formato_log(muestra)
+    return ingesta.huella_encabezado(muestra) if formato == 'csv' else formato
+
+
+def leer_bloques(archivo, filas_bloque):
+    # (DataFrame, filas_omitidas) de a bloques para cualquier formato soportado
+    formato = formato_log(ingesta.leer_muestra(archivo))
+    if formato == 'csv':
+        return ingesta.leer_log_bloques(archivo, filas_bloque)
+    filas = filas_xes(archivo) if formato == 'xes' else filas_ocel(archivo)
+    return _en_bloques(filas, filas_bloque)
+
+
+def _en_bloques(filas, filas_bloque):
+    # Tuplas (ID, ESTADO, FECHA_ESTADO, RECURSO) -> bloques; sin ID o estado se omiten
+    while True:
+        lote = list(itertools.islice(filas, filas_bloque))
+        if not lote: return
+        df = pd.DataFrame(lote, columns=['ID', 'ESTADO', 'FECHA_ESTADO', 'RECURSO'], dtype=object)
+        validas = df['ID'].notna() & df['ESTADO'].notna()
+        df = df[validas].astype({'ID': 'str', 'ESTADO': 'category', 'RECURSO': 'category', 'FECHA_ESTADO': 'str'})
+        df['FECHA_ESTADO'] = df['FECHA_ESTADO'].str.replace(_DESFASE, '', regex=True)
+        yield df, int((~validas).sum())
+
+
+def _recurso(atributos):
+    return next((atributos[a] for a in ATRIBUTOS_RECURSO if a in atributos), None)
+
+
+# ==========================================
+# XES
+# ==========================================
+def _atributos(elem):
+    # Atributos directos (<string key=.. value=..>, <date ..>, ...) de un elemento
+    return {hijo.get('key'): hijo.get('value') for hijo in elem if 'key' in hijo.attrib}
+
+
+def filas_xes(archivo):
+    contexto = iter(ET.iterparse(archivo, events=('start', 'end')))
+    _, raiz = next(contexto)
+    eventos = []                                     # eventos de la traza en curso
+    for tipo, elem in contexto:
+        if tipo != 'end': continue
+        etiqueta = elem.tag.rsplit('}', 1)[-1]
+        if etiqueta == 'event':
+            atributos = _atributos(elem)
+            ciclo = atributos.get('lifecycle:transition')
+            if ciclo is None or ciclo.lower() in CICLOS_XES:
+                eventos.append((atributos.get(ATRIBUTO_ESTADO), atributos.get(ATRIBUTO_FECHA), _recurso(atributos)))
+            elem.clear()
+        elif etiqueta == 'trace':
+            caso = _atributos(elem).get(ATRIBUTO_CASO)
+            for estado, fecha, recurso in eventos:
+                yield caso, estado, fecha, recurso
+            eventos = []
+            raiz.clear()                              # la raíz no acumula trazas vacías
+
+
+# ==========================================
+# OCEL (JSON)
+# ==========================================
+_decodificador = json.JSONDecoder()
+_NO_ESPACIO = re.compile(r'\S')
+
+
+def _cargar(b):
+    # Agrega un bloque al buffer descartando lo ya consumido; False al final del archivo
+    if b['fin']: return False
+    crudo = b['archivo'].read(BLOQUE_JSON)
+    b['fin'] = not crudo
+    b['texto'] = b['texto'][b['pos']:] + b['utf8'].decode(crudo, final=b['fin'])
+    b['pos'] = 0
+    return not b['fin']
+
+
+def _siguiente(b):
+    # Próximo carácter significativo, sin consumirlo ('' al final)
+    while True:
+        m = _NO_ESPACIO.search(b['texto'], b['pos'])
+        if m:
+            b['pos'] = m.start()
+            return m.group()
+        b['pos'] = len(b['texto'])
+        if not _cargar(b): return ''
+
+
+def _consumir(b, caracter):
+    if _siguiente(b) != caracter:
+        raise ValueError(f"OCEL inválido: se esperaba '{caracter}' (posición {b['pos']}).")
+    b['pos'] += 1
+
+
+def _valor(b):
+    # Un valor completo; si quedó cortado por el bloque (o puede seguir) se lee más
+    _siguiente(b)
+    while True:
+        try:
+            valor, fin = _decodificador.raw_decode(b['texto'], b['pos'])
+            if fin < len(b['texto']) or b['fin']:
+                b['pos'] = fin
+                return valor
+        except json.JSONDecodeError:
+            if b['fin']: raise ValueError("OCEL inválido: JSON incompleto o mal formado.")
+        _cargar(b)
+
+
+def _elementos(b):
+    # (clave o None, posición lista para leer el valor) por elemento del contenedor actual
+    apertura = _siguiente(b)
+    cierre = '}' if apertura == '{' else ']'
+    _consumir(b, apertura)
+    if _siguiente(b) == cierre:
+        b['pos'] += 1
+        return
+    while True:
+        clave = None
+        if apertura == '{':
+            clave = _valor(b)
+            _consumir(b, ':')
+        yield clave
+        if _siguiente(b) == cierre:
+            b['pos'] += 1
+            return
+        _consumir(b, ',')
+
+
+def _recorrer_json(archivo, claves):
+    # (clave de primer nivel, clave del elemento, valor) de cada elemento de los
+    # miembros `claves` del objeto raíz; el resto se salta sin decodificarlo entero
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, 'rb') as f:
+            yield from _recorrer_json(f, claves)
+        return
+    archivo.seek(0)
+    b = {'archivo': archivo, 'utf8': codecs.getincrementaldecoder('utf-8-sig')(), 'texto': '', 'pos': 0, 'fin': False}
+    for miembro in _elementos(b):
+        if _siguiente(b) not in ('{', '['):
+            _valor(b)
+            continue
+        for clave in _elementos(b):
+            valor = _valor(b)
+            if miembro in claves: yield miembro, clave, valor
+
+
+def tipos_objetos_ocel(archivo):
+    # id de objeto -> tipo (OCEL 1.0: "ocel:objects" {id: {...}}; 2.0: "objects" [{id, type}])
+    tipos = {}
+    for miembro, clave, objeto in _recorrer_json(archivo, ('ocel:objects', 'objects')):
+        if miembro == 'ocel:objects': tipos[clave] = objeto.get('ocel:type')
+        else: tipos[objeto.get('id')] = objeto.get('type')
+    return tipos
+
+
+def filas_ocel(archivo, tipo_objeto=TIPO_OBJETO_OCEL):
+    tipos = tipos_objetos_ocel(archivo)
+    if tipo_objeto is None and tipos:
+        tipo_objeto = collections.Counter(tipos.values()).most_common(1)[0][0]
+    for miembro, _, evento in _recorrer_json(archivo, ('ocel:events', 'events')):
+        if miembro == 'ocel:events':
+            estado, fecha = evento.get('ocel:activity'), evento.get('ocel:timestamp')
+            objetos, atributos = evento.get('ocel:omap', []), evento.get('ocel:vmap', {})
+        else:
+            estado, fecha = evento.get('type'), evento.get('time')
+            objetos = [r.get('objectId') for r in evento.get('relationships', [])]
+            atributos = {a.get('name'): a.get('value') for a in evento.get('attributes', [])}
+        recurso = _recurso(atributos)
+        for objeto in objetos:
+            if tipos.get(objeto) == tipo_objeto:
+                yield objeto, estado, fecha, recurso
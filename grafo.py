@@ -0,0 +1,284 @@
+import pandas as pd
+import numpy as np
+from scipy import sparse
+
+# ==========================================
+# ÍNDICE DFG (DIRECTLY-FOLLOWS GRAPH) POR VARIANTE
+# ==========================================
+# Se construye una vez al cargar el log. Cada fila de las matrices dispersas es una
+# variante y cada columna una arista (origen * n_estados + destino); así el mapa
+# completo o el de cualquier conjunto de variantes se obtiene sumando filas.
+# Las duraciones quedan ordenadas por (variante, nodo, duración) y por
+# (variante, origen, destino, duración) para medianas/percentiles sin reagrupar.
+
+def _codigos(df_trans):
+    o = df_trans['Origen'].cat.codes.to_numpy().astype(np.int64)
+    d = df_trans['Destino'].cat.codes.to_numpy().astype(np.int64)
+    v = df_trans['Nombre_Variante'].cat.codes.to_numpy().astype(np.int64)
+    dur = df_trans['Duracion'].to_numpy().astype(np.float64)
+    validas = (o >= 0) & (d >= 0) & (v >= 0)
+    return o[validas], d[validas], v[validas], dur[validas], np.flatnonzero(validas)
+
+
+def _matriz(v, columna, datos, forma):
+    m = sparse.csr_matrix((datos, (v, columna)), shape=forma)
+    m.sum_duplicates()
+    return m
+
+
+def _indice(estados, variantes, matrices, ordenes):
+    n_var = len(variantes)
+    totales = {f'{k}_total': _sumar_filas(m, np.arange(n_var)) for k, m in matrices.items()}
+    return {'estados': estados, 'variantes': variantes, **matrices, **totales, **ordenes}
+
+
+def construir_indice_dfg(df_trans):
+    estados = df_trans['Origen'].cat.categories
+    variantes = df_trans['Nombre_Variante'].cat.categories
+    n_est, n_var = len(estados), len(variantes)
+
+    o, d, v, dur, filas = _codigos(df_trans)     # filas: posición de cada transición en df_trans
+    arista = o * n_est + d
+    forma = (n_var, n_est * n_est)
+
+    orden_nodo = np.lexsort((dur, o, v))
+    orden_arista = np.lexsort((dur, d, o, v))
+    orden_total = np.lexsort((dur, o))
+    matrices = {k: _matriz(v, arista, datos, forma) for k, datos in
+                (('n', np.ones(len(o))), ('suma', dur), ('suma2', dur * dur))}
+    return _indice(estados, variantes, matrices, {
+        'nodo_total':    o[orden_total],
+        'dur_total':     dur[orden_total],
+        'fila_total':    filas[orden_total],
+        'clave_nodo':    (v * n_est + o)[orden_nodo],
+        'dur_nodo':      dur[orden_nodo],
+        'fila_nodo':     filas[orden_nodo],
+        'clave_arista':  (v * n_est * n_est + arista)[orden_arista],
+        'dur_arista':    dur[orden_arista],
+        'fila_arista':   filas[orden_arista],
+    })
+
+
+def _filas_variantes(indice, variantes):
+    if variantes is None: return None
+    pos = indice['variantes'].get_indexer(list(variantes))
+    return pos[pos >= 0]
+
+
+def _sumar_filas(matriz, filas):
+    return sparse.csr_matrix(np.ones((1, len(filas)))) @ matriz[filas]
+
+
+def _duraciones(claves, valores, filas, multiplicador, clave_local):
+    # Concatena los tramos (ya ordenados) de cada variante seleccionada para una clave local
+    buscadas = filas * multiplicador + clave_local
+    ini = np.searchsorted(claves, buscadas, side='left')
+    fin = np.searchsorted(claves, buscadas, side='right')
+    tramos = [valores[a:b] for a, b in zip(ini, fin) if b > a]
+    if not tramos: return np.empty(0)
+    return tramos[0] if len(tramos) == 1 else np.sort(np.concatenate(tramos))
+
+
+def _duraciones_nodo(indice, filas, cod):
+    if filas is None:
+        ini, fin = np.searchsorted(indice['nodo_total'], [cod, cod + 1])
+        return indice['dur_total'][ini:fin]
+    return _duraciones(indice['clave_nodo'], indice['dur_nodo'], filas, len(indice['estados']), cod)
+
+
+def escalar_indice(indice, factor):
+    # Mismo índice con las duraciones multiplicadas por `factor` (cambio de unidad): el
+    # orden por duración no cambia, así que no hay que reordenar
+    escalado = dict(indice)
+    for k in ('suma', 'suma_total'): escalado[k] = indice[k] * factor
+    for k in ('suma2', 'suma2_total'): escalado[k] = indice[k] * (factor * factor)
+    for k in ('dur_total', 'dur_nodo', 'dur_arista'): escalado[k] = indice[k] * factor
+    return escalado
+
+
+def filas_nodo(indice, nodo, variantes=None):
+    # Posiciones en df_trans de las transiciones que salen de `nodo` (ordenadas por duración
+    # dentro de cada variante); permite paginar el detalle sin filtrar todo el log.
+    cod = indice['estados'].get_loc(nodo)
+    filas = _filas_variantes(indice, variantes)
+    if filas is None:
+        ini, fin = np.searchsorted(indice['nodo_total'], [cod, cod + 1])
+        return indice['fila_total'][ini:fin]
+    buscadas = filas * len(indice['estados']) + cod
+    ini = np.searchsorted(indice['clave_nodo'], buscadas, side='left')
+    fin = np.searchsorted(indice['clave_nodo'], buscadas, side='right')
+    return np.concatenate([indice['fila_nodo'][a:b] for a, b in zip(ini, fin)] or [np.empty(0, dtype=np.int64)])
+
+
+def duraciones_nodo(indice, nodo, variantes=None):
+    return _duraciones_nodo(indice, _filas_variantes(indice, variantes), indice['estados'].get_loc(nodo))
+
+
+def duraciones_arista(indice, origen, destino, variantes=None):
+    n_est = len(indice['estados'])
+    filas = _filas_variantes(indice, variantes)
+    filas = np.arange(len(indice['variantes'])) if filas is None else filas
+    cod = indice['estados'].get_loc(origen) * n_est + indice['estados'].get_loc(destino)
+    return _duraciones(indice['clave_arista'], indice['dur_arista'], filas, n_est * n_est, cod)
+
+
+def componer_mapa(indice, variantes=None):
+    # Devuelve (edges_stats, node_stats) para todas las variantes o para un subconjunto.
+    # edges_stats: Origen, Destino, Frecuencia, Tiempo_Promedio, Desv_Estandar
+    # node_stats:  {estado: {'Casos', 'Tiempo_Promedio', 'Mediana'}}
+    estados = indice['estados']
+    n_est = len(estados)
+    filas = _filas_variantes(indice, variantes)
+
+    if filas is None:
+        n, suma, suma2 = indice['n_total'], indice['suma_total'], indice['suma2_total']
+    else:
+        n, suma, suma2 = (_sumar_filas(indice[k], filas) for k in ('n', 'suma', 'suma2'))
+    columnas = n.indices
+    orden = np.argsort(columnas, kind='stable')
+    columnas = columnas[orden]
+    frec = n.data[orden]
+    s1 = np.asarray(suma[0, columnas].todense()).ravel() if len(columnas) else np.empty(0)
+    s2 = np.asarray(suma2[0, columnas].todense()).ravel() if len(columnas) else np.empty(0)
+    origen, destino = np.divmod(columnas, n_est)
+
+    media = s1 / frec
+    varianza = np.where(frec > 1, (s2 - frec * media ** 2) / np.maximum(frec - 1, 1), 0.0)
+    edges_stats = pd.DataFrame({
+        'Origen':          estados[origen],
+        'Destino':         estados[destino],
+        'Frecuencia':      frec.astype(np.int64),
+        'Tiempo_Promedio': media,
+        'Desv_Estandar':   np.sqrt(np.maximum(varianza, 0.0)),
+    })
+
+    casos_nodo = np.bincount(origen, weights=frec, minlength=n_est)
+    suma_nodo  = np.bincount(origen, weights=s1, minlength=n_est)
+    node_stats = {}
+    for cod in np.flatnonzero(casos_nodo):
+        valores = _duraciones_nodo(indice, filas, cod)
+        node_stats[estados[cod]] = {
+            'Casos':           int(casos_nodo[cod]),
+            'Tiempo_Promedio': suma_nodo[cod] / casos_nodo[cod],
+            'Mediana':         float(np.median(valores)) if len(valores) else 0.0,
+        }
+    return edges_stats, node_stats
+
+
+# ==========================================
+# CLASIFICACIÓN DE REPROCESOS
+# ==========================================
+# Tipo_Reproceso por arista:
+#   'bucle'      -> origen == destino
+#   'retroceso'  -> ambos estados tienen orden (orden_estados) y el destino es anterior
+#   'heuristico' -> sin orden para algún extremo y la arista inversa es más frecuente
+#   'normal'     -> resto
+# orden_estados está alineado a los códigos de `estados` (procesamiento.orden_por_codigo):
+# el orden de los extremos y la arista inversa se buscan por código, sin diccionarios.
+def clasificar_reprocesos(edges_stats, orden_estados, estados):
+    n_est = len(estados)
+    origen  = estados.get_indexer(edges_stats['Origen'])
+    destino = estados.get_indexer(edges_stats['Destino'])
+    o_orden = orden_estados[origen]
+    d_orden = orden_estados[destino]
+
+    frecuencia = edges_stats['Frecuencia'].to_numpy()
+    inversa = pd.Index(origen * n_est + destino).get_indexer(destino * n_est + origen)
+    freq_bwd = np.where(inversa >= 0, frecuencia[inversa], 0)
+
+    es_bucle = origen == destino
+    con_orden = ~(np.isnan(o_orden) | np.isnan(d_orden))
+    retrocede = con_orden & (d_orden < o_orden)
+    heuristico = ~es_bucle & ~con_orden & (freq_bwd > frecuencia)
+
+    tipo = np.select([es_bucle, retrocede, heuristico], ['bucle', 'retroceso', 'heuristico'], 'normal')
+    return edges_stats.assign(Tipo_Reproceso=tipo)
+
+
+# ==========================================
+# ACTUALIZACIÓN INCREMENTAL DEL ÍNDICE
+# ==========================================
+# Al anexar eventos solo cambian los casos afectados: sus transiciones previas se restan
+# de las matrices y se quitan de los arreglos ordenados, y las nuevas se suman e
+# intercalan. Lo que se conserva ya está ordenado, así que la fusión es un timsort sobre
+# dos tramos (lineal) en lugar de reordenar todo el log.
+def _permutar_bloques(bloque, mapa):
+    # `bloque` ascendente (variante de cada entrada). Devuelve el orden que agrupa las
+    # entradas por mapa[bloque] conservando el orden interno de cada bloque.
+    ids = np.arange(len(mapa))
+    inicios = np.searchsorted(bloque, ids, side='left')
+    largos = np.searchsorted(bloque, ids, side='right') - inicios
+    orden_bloques = np.argsort(mapa, kind='stable')
+    largos = largos[orden_bloques]
+    destino_inicio = np.r_[0, np.cumsum(largos)[:-1]]
+    return np.arange(largos.sum()) + np.repeat(inicios[orden_bloques] - destino_inicio, largos)
+
+
+def _fusionar(claves, dur, filas, claves_n, dur_n, filas_n):
+    # Intercala entradas nuevas en arreglos ya ordenados por (clave, duración)
+    previo = np.lexsort((dur_n, claves_n))
+    claves = np.concatenate([claves, claves_n[previo]])
+    dur = np.concatenate([dur, dur_n[previo]])
+    filas = np.concatenate([filas, filas_n[previo]])
+    if not len(dur): return claves, dur, filas
+    escala = int(dur.max()) + 1
+    enteras = dur.min() >= 0 and np.array_equal(dur, np.floor(dur))
+    if enteras and (int(claves.max()) + 1) * escala < 2 ** 62:
+        orden = np.argsort(claves * escala + dur.astype(np.int64), kind='stable')
+    else:
+        orden = np.lexsort((dur, claves))
+    return claves[orden], dur[orden], filas[orden]
+
+
+def actualizar_indice_dfg(indice, df_trans, quitar, mapa_fila, mapa_var, mapa_est, filas_nuevas):
+    # indice: índice previo; df_trans: transiciones ya actualizadas.
+    # quitar: máscara sobre las filas previas de los casos reemplazados.
+    # mapa_fila / mapa_var / mapa_est: fila, variante y estado nuevos de cada fila, variante
+    # y estado previos (-1 si desaparece). filas_nuevas: posiciones agregadas en df_trans.
+    estados = df_trans['Origen'].cat.categories
+    variantes = df_trans['Nombre_Variante'].cat.categories
+    n_est_p, n_est = len(indice['estados']), len(estados)
+    mapa_est, mapa_var = np.asarray(mapa_est, dtype=np.int64), np.asarray(mapa_var, dtype=np.int64)
+
+    o_n, d_n, v_n, dur_n, pos_n = _codigos(df_trans.iloc[filas_nuevas])
+    filas_n = np.asarray(filas_nuevas, dtype=np.int64)[pos_n]
+
+    # ── Matrices: se resta con la codificación previa y luego se traduce ──
+    v_a, resto = np.divmod(indice['clave_arista'], n_est_p * n_est_p)
+    sale = quitar[indice['fila_arista']]
+    forma_p = (len(indice['variantes']), n_est_p * n_est_p)
+    dur_q = indice['dur_arista'][sale]
+    matrices = {}
+    for k, datos_q, datos_n in (('n', np.ones(len(dur_q)), np.ones(len(dur_n))),
+                                ('suma', dur_q, dur_n), ('suma2', dur_q * dur_q, dur_n * dur_n)):
+        m = (indice[k] - _matriz(v_a[sale], resto[sale], datos_q, forma_p)).tocoo()
+        vigente = (m.data != 0) & (mapa_var[m.row] >= 0)
+        o_m, d_m = np.divmod(m.col[vigente], n_est_p)
+        filas_m = np.r_[mapa_var[m.row[vigente]], v_n]
+        columnas_m = np.r_[mapa_est[o_m] * n_est + mapa_est[d_m], o_n * n_est + d_n]
+        matrices[k] = _matriz(filas_m, columnas_m, np.r_[m.data[vigente], datos_n], (len(variantes), n_est * n_est))
+    matrices['n'].eliminate_zeros()
+
+    # ── Arreglos ordenados ──
+    queda = ~quitar[indice['fila_total']]
+    total = _fusionar(mapa_est[indice['nodo_total'][queda]], indice['dur_total'][queda],
+                      mapa_fila[indice['fila_total'][queda]], o_n, dur_n, filas_n)
+
+    queda = ~quitar[indice['fila_nodo']]
+    v_p, o_p = np.divmod(indice['clave_nodo'][queda], n_est_p)
+    orden = _permutar_bloques(v_p, mapa_var)
+    nodo = _fusionar((mapa_var[v_p] * n_est + mapa_est[o_p])[orden], indice['dur_nodo'][queda][orden],
+                     mapa_fila[indice['fila_nodo'][queda]][orden], v_n * n_est + o_n, dur_n, filas_n)
+
+    queda = ~sale
+    o_p, d_p = np.divmod(resto[queda], n_est_p)
+    orden = _permutar_bloques(v_a[queda], mapa_var)
+    arista = _fusionar((mapa_var[v_a[queda]] * n_est * n_est + mapa_est[o_p] * n_est + mapa_est[d_p])[orden],
+                       indice['dur_arista'][queda][orden], mapa_fila[indice['fila_arista'][queda]][orden],
+                       v_n * n_est * n_est + o_n * n_est + d_n, dur_n, filas_n)
+
+    return _indice(estados, variantes, matrices, {
+        'nodo_total':   total[0], 'dur_total':    total[1], 'fila_total':  total[2],
+        'clave_nodo':   nodo[0],  'dur_nodo':     nodo[1],  'fila_nodo':   nodo[2],
+        'clave_arista': arista[0], 'dur_arista':  arista[1], 'fila_arista': arista[2],
+    })
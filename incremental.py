@@ -0,0 +1,239 @@
+import pandas as pd
+import numpy as np
+
+import estadisticas
+import grafo
+import ingesta
+import procesamiento
+from procesamiento import INICIO, COLUMNAS_TRANSICIONES
+
+# ==========================================
+# ANEXAR EVENTOS A UN MODELO EXISTENTE
+# ==========================================
+# Solo se leen los eventos nuevos. Los casos que aparecen en ellos se reconstruyen
+# (eventos previos, recuperados de sus transiciones, + eventos nuevos) y se reemplazan;
+# el resto de los casos no se vuelve a construir ni a hashear:
+#   - transiciones / variantes: las filas conservadas solo se traducen de código
+#   - índice DFG: se restan y suman las transiciones afectadas (grafo.actualizar_indice_dfg)
+#   - sketches: se restan los casos reemplazados y se suman los reconstruidos
+# El modelo previo no se modifica: puede estar compartido por otras sesiones.
+
+
+def eventos_de_casos(df_trans):
+    # Cada evento es el origen de exactamente una transición (todas menos "Inicio proceso")
+    eventos = df_trans[df_trans['Origen'] != INICIO]
+    return pd.DataFrame({
+        'ID':           eventos['ID'].to_numpy(),
+        'ESTADO':       eventos['Origen'].to_numpy(),
+        'FECHA_ESTADO': eventos['Fecha_Inicio'].to_numpy(),
+        'RECURSO':      eventos['Recurso_Origen'].to_numpy(),
+        **{c: eventos[c].to_numpy() for c in procesamiento.columnas_atributo(df_trans)},
+    })
+
+
+def _catalogo_comun(previo, nuevo):
+    # Catálogo ordenado con ambas categorías (mismo criterio que construir_transiciones)
+    catalogo = procesamiento.catalogo(previo.categories, nuevo.categories)
+    return catalogo, catalogo.get_indexer(previo.categories)
+
+
+def _recodificar(columna, catalogo, mapa=None):
+    mapa = catalogo.get_indexer(columna.cat.categories) if mapa is None else mapa
+    codigos = columna.cat.codes.to_numpy()
+    return pd.Categorical.from_codes(np.where(codigos >= 0, mapa[codigos], -1), catalogo)
+
+
+def _intercalar(n_previos, insercion):
+    # Posición final de los elementos conservados y de los nuevos cuando cada nuevo j
+    # se inserta antes del conservado insercion[j] (insercion ascendente)
+    pos_nuevos = insercion + np.arange(len(insercion))
+    pos_previos = np.arange(n_previos) + np.searchsorted(insercion, np.arange(n_previos), side='right')
+    return pos_previos, pos_nuevos
+
+
+def anexar_eventos(modelo, bytes_log):
+    df_trans_p, df_var_p = modelo['df_transiciones'], modelo['df_variantes']
+    n_filas_p, n_casos_p = len(df_trans_p), len(df_var_p)
+    atributos = procesamiento.columnas_atributo(df_trans_p)    # los del modelo; otros del anexo se ignoran
+
+    # ── Eventos nuevos ──
+    df_log, omitidas = ingesta.leer_log(bytes_log)
+    df_log['FECHA_ESTADO'] = ingesta.parsear_fechas(df_log['FECHA_ESTADO'], ingesta.huella_encabezado(bytes_log))
+    col_responsable = procesamiento.columna_responsable(df_log)
+    nuevos = pd.DataFrame({
+        'ID':           df_log['ID'],
+        'ESTADO':       df_log['ESTADO'],
+        'FECHA_ESTADO': df_log['FECHA_ESTADO'],
+        'RECURSO':      df_log[col_responsable] if col_responsable else 'Desconocido',
+        **{c: df_log[c] if c in df_log.columns else None for c in atributos},
+    })
+    nuevos = nuevos[nuevos['ID'].notna()]
+    if nuevos.empty:
+        return {**modelo, 'filas_omitidas': modelo['filas_omitidas'] + omitidas}
+    try:
+        nuevos = nuevos.assign(ID=nuevos['ID'].astype(df_trans_p['ID'].dtype))
+    except (TypeError, ValueError):
+        raise ValueError("Los ID del archivo a anexar no son compatibles con los del log cargado.")
+
+    # ── Casos afectados (IDs ordenados: df_variantes sigue el orden de df_transiciones) ──
+    ids_casos = df_var_p['ID'].to_numpy()
+    ids_delta = np.sort(pd.unique(nuevos['ID'].to_numpy()))
+    pos = np.searchsorted(ids_casos, ids_delta)
+    existe = pos < n_casos_p
+    existe[existe] = ids_casos[pos[existe]] == ids_delta[existe]
+    casos_af = pos[existe]
+
+    inicios_p = modelo['inicios_casos']
+    largos_p = np.diff(np.r_[inicios_p, n_filas_p])
+    filas_af = procesamiento.rangos(inicios_p[casos_af], largos_p[casos_af])
+    quitar = np.zeros(n_filas_p, dtype=bool); quitar[filas_af] = True
+    quitar_caso = np.zeros(n_casos_p, dtype=bool); quitar_caso[casos_af] = True
+
+    # ── Transiciones de los casos afectados y nuevos ──
+    df_casos = pd.concat([eventos_de_casos(df_trans_p.iloc[filas_af]), nuevos], ignore_index=True)
+    trans_n = procesamiento.construir_transiciones(df_casos, 'RECURSO')
+
+    cat_estados, mapa_est = _catalogo_comun(df_trans_p['Origen'].cat, trans_n['Origen'].cat)
+    cat_recursos, mapa_rec = _catalogo_comun(df_trans_p['Recurso_Origen'].cat, trans_n['Recurso_Origen'].cat)
+    cat_atributos = {c: _catalogo_comun(df_trans_p[c].cat, trans_n[c].cat) for c in atributos}
+    trans_n = trans_n.assign(
+        Origen=_recodificar(trans_n['Origen'], cat_estados),
+        Destino=_recodificar(trans_n['Destino'], cat_estados),
+        Recurso_Origen=_recodificar(trans_n['Recurso_Origen'], cat_recursos),
+        **{c: _recodificar(trans_n[c], cat) for c, (cat, _) in cat_atributos.items()},
+    )
+    rutas_n = procesamiento.hash_rutas(trans_n)
+    inicios_n = rutas_n['inicios']
+    n_casos_n, n_filas_n = len(inicios_n), len(trans_n)
+    largos_n = np.diff(np.r_[inicios_n, n_filas_n])
+
+    # ── Orden final de casos y filas ──
+    casos_q = np.flatnonzero(~quitar_caso)
+    ids_n = trans_n['ID'].to_numpy()[inicios_n]
+    ins_caso = np.searchsorted(ids_casos[casos_q], ids_n)
+    pos_caso_q, pos_caso_n = _intercalar(len(casos_q), ins_caso)
+
+    filas_q = np.flatnonzero(~quitar)
+    inicios_q = np.r_[0, np.cumsum(largos_p[casos_q])].astype(np.int64)     # inicio de cada caso conservado
+    pos_fila_q, pos_fila_n = _intercalar(len(filas_q), np.repeat(inicios_q[ins_caso], largos_n))
+    mapa_fila = np.full(n_filas_p, -1, dtype=np.int64); mapa_fila[filas_q] = pos_fila_q
+
+    n_casos, n_filas = len(casos_q) + n_casos_n, len(filas_q) + n_filas_n
+
+    # ── Variantes: hashes previos por variante + hashes de los casos reconstruidos ──
+    cod_var_p = df_var_p['Nombre_Variante'].cat.codes.to_numpy().astype(np.int64)
+    n_var_p = len(df_var_p['Nombre_Variante'].cat.categories)
+    hash_var_p = np.zeros((n_var_p, 2), dtype=np.uint64)
+    hash_var_p[cod_var_p] = modelo['hash_casos']
+    if len(cat_estados) != len(mapa_est) or (mapa_est != np.arange(len(mapa_est))).any():
+        # El hash depende de los códigos de estado: con estados nuevos se vuelve a
+        # hashear un caso representativo por variante previa con el catálogo común
+        _, rep = np.unique(cod_var_p, return_index=True)
+        filas_rep = procesamiento.rangos(inicios_p[rep], largos_p[rep])
+        trans_rep = df_trans_p.iloc[filas_rep]
+        hash_var_p = procesamiento.hash_rutas(pd.DataFrame({
+            'ID':      trans_rep['ID'].to_numpy(),
+            'Destino': _recodificar(trans_rep['Destino'], cat_estados, mapa_est),
+        }))['hash']
+    por_hash = {(int(a), int(b)): v for v, (a, b) in enumerate(hash_var_p)}
+
+    var_n = np.empty(n_casos_n, dtype=np.int64)
+    representante = {}                               # variante nueva -> caso reconstruido que la define
+    for j, (a, b) in enumerate(rutas_n['hash']):
+        v = por_hash.setdefault((int(a), int(b)), n_var_p + len(representante))
+        if v >= n_var_p and v not in representante: representante[v] = j
+        var_n[j] = v
+    n_var_int = n_var_p + len(representante)
+
+    var_final = np.empty(n_casos, dtype=np.int64)
+    var_final[pos_caso_q] = cod_var_p[casos_q]
+    var_final[pos_caso_n] = var_n
+    frecuencia = np.bincount(var_final, minlength=n_var_int)
+    primera = np.full(n_var_int, n_casos, dtype=np.int64)
+    np.minimum.at(primera, var_final, np.arange(n_casos))       # primera aparición en orden de ID
+
+    vigentes = np.flatnonzero(frecuencia)
+    orden = vigentes[np.lexsort((primera[vigentes], -frecuencia[vigentes]))]
+    rango = np.full(n_var_int, -1, dtype=np.int64); rango[orden] = np.arange(len(orden))
+    mapa_var = rango[:n_var_p]
+
+    textos_p = df_var_p['Ruta'].cat.categories.astype(str).tolist()
+    textos_n = procesamiento.textos_ruta(rutas_n, list(representante.values()), cat_estados)
+    textos = textos_p + textos_n
+    cat_nombres, cat_rutas, cat_tooltips = procesamiento.categorias_variantes([textos[v] for v in orden])
+
+    # ── df_transiciones ──
+    trans_q = df_trans_p.iloc[filas_q]
+    var_fila_q = mapa_var[trans_q['Nombre_Variante'].cat.codes.to_numpy()]
+    var_fila_n = rango[np.repeat(var_n, largos_n)]
+    trans_q = trans_q[COLUMNAS_TRANSICIONES + atributos].assign(
+        Origen=_recodificar(trans_q['Origen'], cat_estados, mapa_est),
+        Destino=_recodificar(trans_q['Destino'], cat_estados, mapa_est),
+        Recurso_Origen=_recodificar(trans_q['Recurso_Origen'], cat_recursos, mapa_rec),
+        **{c: _recodificar(trans_q[c], cat, mapa) for c, (cat, mapa) in cat_atributos.items()},
+        Nombre_Variante=pd.Categorical.from_codes(var_fila_q, cat_nombres),
+        Ruta=pd.Categorical.from_codes(var_fila_q, cat_rutas),
+    )
+    trans_n = trans_n.assign(
+        Nombre_Variante=pd.Categorical.from_codes(var_fila_n, cat_nombres),
+        Ruta=pd.Categorical.from_codes(var_fila_n, cat_rutas),
+    )
+    orden_filas = np.empty(n_filas, dtype=np.int64)
+    orden_filas[pos_fila_q] = np.arange(len(filas_q))
+    orden_filas[pos_fila_n] = len(filas_q) + np.arange(n_filas_n)
+    df_trans = pd.concat([trans_q, trans_n], ignore_index=True).take(orden_filas).reset_index(drop=True)
+
+    largos = np.empty(n_casos, dtype=np.int64)
+    largos[pos_caso_q] = largos_p[casos_q]
+    largos[pos_caso_n] = largos_n
+    inicios = np.r_[0, np.cumsum(largos)[:-1]].astype(np.int64)
+
+    # ── df_variantes ──
+    var_caso_n = rango[var_n]
+    fechas_n = trans_n['Fecha_Inicio'].to_numpy()
+    var_q = df_var_p.iloc[casos_q][['ID', 'Duracion_Total', 'Fecha_Inicio_Caso']]
+    var_nuevas = pd.DataFrame({
+        'ID':                ids_n,
+        'Duracion_Total':    np.add.reduceat(trans_n['Duracion'].to_numpy(), inicios_n) if n_casos_n else np.zeros(0, dtype=np.int64),
+        'Fecha_Inicio_Caso': fechas_n[inicios_n],
+    })
+    orden_casos = np.empty(n_casos, dtype=np.int64)
+    orden_casos[pos_caso_q] = np.arange(len(casos_q))
+    orden_casos[pos_caso_n] = len(casos_q) + np.arange(n_casos_n)
+    df_var = pd.concat([var_q, var_nuevas], ignore_index=True).take(orden_casos).reset_index(drop=True)
+    var_caso = rango[var_final]
+    df_var = pd.DataFrame({
+        'ID':                df_var['ID'],
+        'Ruta':              pd.Categorical.from_codes(var_caso, cat_rutas),
+        'Duracion_Total':    df_var['Duracion_Total'],
+        'Fecha_Inicio_Caso': df_var['Fecha_Inicio_Caso'],
+        'Nombre_Variante':   pd.Categorical.from_codes(var_caso, cat_nombres),
+        'Ruta_Tooltip':      pd.Categorical.from_codes(var_caso, cat_tooltips),
+        **{c: df_trans[c].array[inicios + 1] for c in atributos},     # primer evento del caso
+    })
+
+    hash_casos = np.empty((n_casos, 2), dtype=np.uint64)
+    hash_casos[pos_caso_q] = hash_var_p[cod_var_p[casos_q]]
+    hash_casos[pos_caso_n] = rutas_n['hash']
+
+    # ── Índice DFG y sketches ──
+    dfg = grafo.actualizar_indice_dfg(modelo['dfg'], df_trans, quitar, mapa_fila, mapa_var, mapa_est, pos_fila_n)
+    quitados = estadisticas.sketches_modelo(df_trans_p.iloc[filas_af], df_var_p.iloc[casos_af])
+    agregados = estadisticas.sketches_modelo(df_trans.iloc[pos_fila_n], df_var.iloc[pos_caso_n])
+    sketches = {k: estadisticas.combinar_sketches([estadisticas.restar_sketch(s, quitados[k]), agregados[k]])
+                for k, s in modelo['sketches'].items()}
+
+    fechas = pd.concat([df_log['FECHA_ESTADO'], pd.Series([df_trans['Fecha_Inicio'].min(), df_trans['Fecha_Inicio'].max()])])
+    return {
+        **modelo,
+        'df_transiciones': df_trans,
+        'df_variantes':    df_var,
+        'hash_casos':      hash_casos,
+        'inicios_casos':   inicios,
+        'dfg':             dfg,
+        'prefijos':        procesamiento.indice_prefijos(df_trans),
+        'sketches':        sketches,
+        'orden_estados':   procesamiento.orden_por_codigo(modelo['dict_orden'], cat_estados),
+        'periodo_fechas':  procesamiento.texto_periodo(fechas),
+        'filas_omitidas':  modelo['filas_omitidas'] + omitidas,
+    }
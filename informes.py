@@ -0,0 +1,314 @@
+import os
+import re
+import statistics
+
+import numpy as np
+import pandas as pd
+
+import estadisticas
+import grafo
+import procesamiento
+from procesamiento import INICIO, FIN
+from unidades import SEGUNDOS_DIA
+
+# ==========================================
+# RESULTADOS DE LAS PESTAÑAS (SIN STREAMLIT)
+# ==========================================
+# Cálculos que muestran las pestañas Mapa / Estadísticas / Diagnóstico / Pronóstico.
+# Los paneles solo agregan controles y formato; batch.py los usa sin interfaz.
+# Las duraciones llegan en la unidad de la vista (unidades.vista_modelo).
+P_TEAL   = "#84DCC6"
+P_SALMON = "#FFA69E"
+P_CORAL  = "#FF686B"
+P_HEAT   = ["#E1E1E1", "#fde8e7", P_SALMON, "#ff9292", P_CORAL]
+
+N_MIN_VALIDO     = 10       # Estadísticas: grupos con menos casos se marcan / excluyen
+N_MIN_RESUMEN    = 5        # Diagnóstico: variantes con menos casos no se pronostican
+N_MIN_PRON       = 10       # Pronóstico: variantes con menos casos no tienen tarjeta
+PERCENTILES_PRON = [10, 25, 50, 75, 90]
+
+
+def formato_latino(numero, decimales=1):
+    if pd.isna(numero): return "0"
+    if decimales == 0: formateado = f"{int(numero):,}"
+    else: formateado = f"{numero:,.{decimales}f}"
+    return formateado.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+# ==========================================
+# MAPA DE PROCESO
+# ==========================================
+# Bundle UMD de Mermaid versionado en static/ (obtener_mermaid.py lo actualiza). La app
+# lo sirve como archivo estático y batch.py lo copia junto a cada informe.html.
+MERMAID_LOCAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'mermaid.min.js')
+
+
+def ruta_mermaid():
+    if not os.path.exists(MERMAID_LOCAL):
+        raise FileNotFoundError(f"Falta {MERMAID_LOCAL}. Ejecutar `python obtener_mermaid.py` "
+                                "(o copiarlo según static/LEEME.txt) para dibujar el mapa.")
+    return MERMAID_LOCAL
+
+
+def resumen_mapa(dfg, orden_estados, variante=None):
+    # (edges_stats con Tipo_Reproceso, node_stats) desde el índice DFG precalculado;
+    # orden_estados alineado a los códigos de dfg['estados']
+    edges_stats, node_stats = grafo.componer_mapa(dfg, [variante] if variante else None)
+    if not edges_stats.empty:
+        edges_stats = grafo.clasificar_reprocesos(edges_stats, orden_estados, dfg['estados'])
+    return edges_stats, node_stats
+
+
+def frecuencia_variantes(df_var):
+    var_counts = (df_var
+                  .groupby(['Nombre_Variante', 'Ruta_Tooltip', 'Ruta'], observed=True)
+                  .size().reset_index(name='Frecuencia'))
+    var_counts['Orden'] = var_counts['Nombre_Variante'].str.replace('Var ', '').astype(int)
+    var_counts = var_counts.sort_values('Orden', ascending=False)
+    var_counts['Porcentaje'] = (var_counts['Frecuencia'] / var_counts['Frecuencia'].sum()) * 100
+    return var_counts
+
+
+def codigo_mermaid(edges_stats, node_stats, metrica_tiempo=False, resaltar_cuellos=False, tiene_est_orden=False,
+                   nombre_unidad='días'):
+    # Devuelve el flowchart Mermaid y los nodos dibujados (edges_stats ya clasificado)
+    min_t = rango_t = 0
+    if resaltar_cuellos:
+        tiempos_validos = [
+            v['Tiempo_Promedio'] for k, v in node_stats.items()
+            if v['Tiempo_Promedio'] > 0 and k not in [INICIO, FIN]
+        ]
+        if tiempos_validos:
+            min_t   = min(tiempos_validos)
+            rango_t = max(tiempos_validos) - min_t
+
+    nodos_unicos = list(dict.fromkeys(edges_stats['Origen'].tolist() + edges_stats['Destino'].tolist()))
+    mapa_nodos = {nodo: f"N{i}" for i, nodo in enumerate(nodos_unicos)}
+
+    mermaid_code = "flowchart TD\n"
+
+    def sort_nodes(item):
+        if item[0] == INICIO: return 0
+        if item[0] == FIN:    return 2
+        return 1
+
+    for nombre_real, nodo_id in sorted(mapa_nodos.items(), key=sort_nodes):
+        nombre_limpio = re.sub(
+            r'[^a-zA-Z0-9 áéíóúÁÉÍÓÚñÑ.,_-]', ' ', str(nombre_real)
+        ).strip() or "Etapa_Desconocida"
+
+        mermaid_code += f'    {nodo_id}(["{nombre_limpio}"])\n'
+
+        color_fondo, color_texto, color_borde, ancho_borde = "#e5e7eb", "#000", "#9ca3af", "1px"
+
+        if nombre_real == INICIO:
+            color_fondo, color_texto, color_borde, ancho_borde = "#ffffff", "#000000", P_TEAL, "2px"
+        elif nombre_real == FIN:
+            color_fondo, color_texto, color_borde, ancho_borde = "#ffffff", "#000000", P_CORAL, "2px"
+        elif resaltar_cuellos and nombre_real in node_stats and rango_t > 0:
+            t_prom = node_stats[nombre_real]['Tiempo_Promedio']
+            if t_prom > 0:
+                idx = int(round(4 * (t_prom - min_t) / rango_t))
+                idx = max(0, min(4, idx))
+                colores = [
+                    (P_HEAT[0], "#000"), (P_HEAT[1], "#000"),
+                    (P_HEAT[2], "#000"), (P_HEAT[3], "#000"),
+                    (P_HEAT[4], "#fff")
+                ]
+                color_fondo, color_texto = colores[idx]
+
+        mermaid_code += (
+            f'    style {nodo_id} fill:{color_fondo},'
+            f'stroke:{color_borde},stroke-width:{ancho_borde},color:{color_texto}\n'
+        )
+
+        # Mermaid solo crea el nodo clicable, sin tooltip: el JS del mapa se encarga del tooltip
+        if nombre_real in node_stats or nombre_real in [INICIO, FIN]:
+            mermaid_code += f'    click {nodo_id} call noAction()\n'
+
+    max_frecuencia = edges_stats['Frecuencia'].max() or 1
+    estilos_flechas = ""
+
+    for idx, (_, row) in enumerate(edges_stats.iterrows()):
+        freq   = row['Frecuencia']
+        tiempo = row['Tiempo_Promedio']
+
+        is_rework = row['Tipo_Reproceso'] != 'normal'
+        rework_confirmado = tiene_est_orden and row['Tipo_Reproceso'] in ('bucle', 'retroceso')
+
+        if is_rework:
+            color_linea = P_CORAL if rework_confirmado else "#aaaaaa"
+            dash_style  = ",stroke-dasharray: 5 5"
+        else:
+            color_linea = "slategray"
+            dash_style  = ""
+
+        label = f"{formato_latino(tiempo)} {nombre_unidad}" if metrica_tiempo else f"{formato_latino(freq, 0)} casos"
+        mermaid_code += f'    {mapa_nodos[row["Origen"]]} -->|"{label}"| {mapa_nodos[row["Destino"]]}\n'
+        grosor = int(round(2.0 + (freq / max_frecuencia) * 4.0))
+        estilos_flechas += (
+            f'    linkStyle {idx} '
+            f'stroke-width:{grosor}px,stroke:{color_linea}{dash_style}\n'
+        )
+
+    return mermaid_code + estilos_flechas, nodos_unicos
+
+
+# ==========================================
+# ESTADÍSTICAS DE TIEMPOS
+# ==========================================
+def grupos_estadisticas(df_trans, df_var):
+    # clave de sketch -> (datos, columna de agrupación, columna de valor, nombre de la tabla)
+    return {
+        'variante': (df_var, 'Nombre_Variante', 'Duracion_Total', 'Variante'),
+        'etapa':    (df_trans[(df_trans['Origen'] != INICIO) & (df_trans['Destino'] != FIN)], 'Origen', 'Duracion', 'Etapa'),
+        'recurso':  (df_trans[df_trans['Recurso_Origen'] != 'Sistema'], 'Recurso_Origen', 'Duracion', 'Recurso'),
+    }
+
+
+def texto_calidad(n, n_outliers, n_min=N_MIN_VALIDO):
+    pct_out = n_outliers / n * 100
+    return [
+        "⚠ Muestra insuficiente" if n_g < n_min
+        else f"⚠ {n_o} atípico{'s' if n_o != 1 else ''} ({formato_latino(pct, 1)}%)" if n_o > 0
+        else "✓ OK"
+        for n_g, n_o, pct in zip(n, n_outliers, pct_out)
+    ]
+
+
+def tabla_estadisticas(df_agrupado, col_agrupacion, col_valor, nombre, sketch=None, ic=None, n_min=N_MIN_VALIDO):
+    # Exacta o desde el sketch; `ic` (intervalos_bootstrap) se agrega si viene calculado
+    if sketch is not None: stats = estadisticas.estadisticas_sketch(sketch)
+    else: stats = estadisticas.estadisticas_agrupadas(df_agrupado, col_agrupacion, col_valor)
+    stats = stats.assign(Calidad=texto_calidad(stats['n'].to_numpy(), stats['Atipicos'].to_numpy(), n_min))
+    if ic is not None:
+        stats = stats.merge(ic, on='grupo', how='left')
+    return stats.rename(columns={'grupo': nombre})
+
+
+# ==========================================
+# DIAGNÓSTICO
+# ==========================================
+def cuellos_botella(df_trans):
+    df_etapas = df_trans[(df_trans['Origen'] != INICIO) & (df_trans['Destino'] != FIN)]
+    etapa_stats = (df_etapas.groupby('Origen', observed=True)
+                   .agg(Promedio=('Duracion', 'mean'), Casos=('ID', 'count'))
+                   .reset_index().rename(columns={'Origen': 'Etapa'}))
+    return etapa_stats[etapa_stats['Promedio'] > 0].sort_values('Promedio', ascending=False)
+
+
+def recursos_sobrecarga(df_trans):
+    df_recursos = df_trans[df_trans['Recurso_Origen'] != 'Sistema']
+    return (df_recursos.groupby('Recurso_Origen', observed=True)
+            .agg(Promedio=('Duracion', 'mean'), Casos=('ID', 'count'))
+            .reset_index().rename(columns={'Recurso_Origen': 'Recurso'}))
+
+
+def recurso_critico(recurso_stats):
+    # Promedio en el cuartil superior con volumen sobre la mediana; si no hay, el más lento
+    candidatos = recurso_stats[(recurso_stats['Promedio'] > recurso_stats['Promedio'].quantile(0.75))
+                               & (recurso_stats['Casos'] > recurso_stats['Casos'].median())]
+    if candidatos.empty: candidatos = recurso_stats
+    return candidatos.sort_values('Promedio', ascending=False).iloc[0]
+
+
+def prediccion_variantes(df_var, nivel=95, top=5):
+    # Intervalo de predicción normal para la duración total de un caso nuevo, por variante
+    z = statistics.NormalDist().inv_cdf((1 + nivel / 100) / 2)
+    rutas = procesamiento.rutas_por_variante(df_var)
+    filas = []
+    for var, grp in df_var.groupby('Nombre_Variante', observed=True):
+        valores = grp['Duracion_Total'].dropna().values
+        n = len(valores)
+        if n < N_MIN_RESUMEN: continue
+        media = np.mean(valores)
+        margen = z * (np.std(valores, ddof=1) if n > 1 else 0.0) * np.sqrt(1 + 1 / n)
+        filas.append({'Variante': var, 'Ruta': rutas.get(var, ''), 'Casos': n,
+                      'Promedio': media, 'Li95': max(0, media - margen), 'Ls95': media + margen})
+    if not filas: return pd.DataFrame()
+    return pd.DataFrame(filas).sort_values('Casos', ascending=False).head(top)
+
+
+# ==========================================
+# PRONÓSTICO POR VARIANTE
+# ==========================================
+def emp_percentil(valores, p):
+    sorted_v = np.sort(valores)
+    idx = (p / 100) * (len(sorted_v) - 1)
+    lo, hi = int(np.floor(idx)), int(np.ceil(idx))
+    return sorted_v[lo] + (sorted_v[hi] - sorted_v[lo]) * (idx - lo)
+
+
+def lognormal_fit_ok(valores):
+    if len(valores) < 8: return False
+    logs = np.log(np.maximum(0.01, valores))
+    s2 = logs.std()
+    return False if s2 == 0 else (np.abs(((logs - logs.mean()) ** 3).mean() / s2 ** 3) < 1.5)
+
+
+def calcular_stats_pronostico(valores, ps_sketch=None, segundos_unidad=None):
+    # Con segundos_unidad agrega el riesgo, calculado antes de redondear los percentiles
+    n = len(valores)
+    advertencia = None
+    if n >= 100 and ps_sketch is not None:
+        metodo = "sketch"
+        nota_metodo = f"Percentiles aproximados por sketch (n={n}, error relativo ≤ {formato_latino(estadisticas.ALFA_SKETCH * 100, 0)}%)."
+        ps = ps_sketch
+    elif n >= 100:
+        metodo = "empirico"
+        nota_metodo = f"Percentiles empíricos (n={n}). Muestra amplia."
+        ps = {p: emp_percentil(valores, p) for p in PERCENTILES_PRON}
+    elif n >= 30 and lognormal_fit_ok(valores):
+        metodo = "lognormal"
+        logs = np.log(np.maximum(0.01, valores))
+        mu, sigma = logs.mean(), logs.std(ddof=1)
+        from scipy.stats import norm as _norm
+        ps = {p: np.exp(mu + sigma * _norm.ppf(p / 100)) for p in PERCENTILES_PRON}
+        nota_metodo = f"Lognormal MLE (n={n}). Ajuste satisfactorio."
+    else:
+        metodo = "empirico"
+        nota_metodo = f"Percentiles empíricos (n={n})."
+        advertencia = "Muestra insuficiente o ajuste no satisfactorio."
+        ps = {p: emp_percentil(valores, p) for p in PERCENTILES_PRON}
+
+    if advertencia: nota_metodo += " — " + advertencia
+    stats = {'n': n, 'metodo': metodo, 'nota_metodo': nota_metodo, **{f'p{p}': round(ps[p]) for p in PERCENTILES_PRON}}
+    if segundos_unidad is not None:
+        stats['riesgo'] = riesgo_variante({f'p{p}': ps[p] for p in PERCENTILES_PRON}, segundos_unidad)
+    return stats
+
+
+def riesgo_variante(st_v, segundos_unidad=SEGUNDOS_DIA):
+    # Umbrales de la mediana en días, cualquiera sea la unidad de los percentiles;
+    # segundos_unidad: unidades.segundos_por_unidad (el día hábil vale una jornada)
+    cv = ((st_v['p90'] - st_v['p10']) / st_v['p50'] if st_v['p50'] > 0 else 99)
+    p50_dias = st_v['p50'] * segundos_unidad / SEGUNDOS_DIA
+    if p50_dias <= 10 and cv < 1.2: return "bajo"
+    if p50_dias <= 20 and cv < 1.8: return "medio"
+    return "alto"
+
+
+def percentiles_sketch_variantes(sketch):
+    # {ruta: {p: valor}} desde el sketch de variantes (indexado por ruta)
+    cuantiles = estadisticas.cuantiles_sketch(sketch, PERCENTILES_PRON).set_index('grupo')
+    return {ruta: {p: fila[f'P{p}'] for p in PERCENTILES_PRON} for ruta, fila in cuantiles.iterrows()}
+
+
+def pronostico_variantes(df_var, ps_sketch=None, segundos_unidad=SEGUNDOS_DIA):
+    # Devuelve (tarjetas ordenadas por casos, número de variantes excluidas por tamaño)
+    ps_sketch = ps_sketch or {}
+    rutas = procesamiento.rutas_por_variante(df_var)
+    total_casos = len(df_var)
+    variantes_stats, n_excluidas = [], 0
+    for var_nombre, grp in df_var.groupby('Nombre_Variante', observed=True):
+        vals = grp['Duracion_Total'].dropna().values
+        if len(vals) < N_MIN_PRON:
+            n_excluidas += 1
+            continue
+        st_v = calcular_stats_pronostico(vals, ps_sketch.get(rutas.get(var_nombre)), segundos_unidad)
+        st_v.update({'variante': var_nombre, 'ruta': rutas.get(var_nombre, ''), 'casos': len(vals),
+                     'pct': (len(vals) / total_casos) * 100})
+        st_v['riesgo'] = st_v.pop('riesgo')     # última columna de la tabla, como antes
+        variantes_stats.append(st_v)
+    variantes_stats.sort(key=lambda x: x['casos'], reverse=True)
+    return variantes_stats, n_excluidas
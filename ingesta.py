@@ -0,0 +1,281 @@
+import pandas as pd
+import csv
+import io
+import json
+import os
+import warnings
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+BYTES_MUESTRA = 16 * 1024        # el dialecto se detecta solo sobre los primeros KB
+SEPARADORES   = ';,\t|'
+
+COLUMNAS_LOG     = ['ID', 'ESTADO', 'FECHA_ESTADO', 'RECURSO']
+COLUMNAS_ESTADOS = ['ESTADO', 'EST_ORDEN']
+OBLIGATORIAS_LOG = ['ID', 'ESTADO', 'FECHA_ESTADO']
+DTYPES_LOG       = {'ESTADO': 'category', 'RECURSO': 'category', 'FECHA_ESTADO': 'str'}
+DTYPES_ESTADOS   = {'ESTADO': 'str', 'EST_ORDEN': 'str'}
+
+# Mapeo de columnas: nombres del archivo -> columnas internas. Sin mapeo recordado para
+# el encabezado se reconoce cada columna por estos nombres (sin distinguir mayúsculas,
+# espacios ni guiones). Los atributos adicionales se leen como categóricas PREFIJO_ATRIBUTO + nombre.
+ALIAS_COLUMNAS = {
+    'ID':           ('ID', 'CASO', 'ID_CASO', 'CASE', 'CASE_ID', 'CASE:CONCEPT:NAME'),
+    'ESTADO':       ('ESTADO', 'ACTIVIDAD', 'ETAPA', 'ACTIVITY', 'CONCEPT:NAME'),
+    'FECHA_ESTADO': ('FECHA_ESTADO', 'FECHA', 'TIMESTAMP', 'TIME:TIMESTAMP'),
+    'RECURSO':      ('RECURSO', 'RESPONSABLE', 'USUARIO', 'RESOURCE', 'ORG:RESOURCE'),
+    'EST_ORDEN':    ('EST_ORDEN', 'ORDEN', 'ORDER'),
+}
+PREFIJO_ATRIBUTO = 'Atr_'
+ARCHIVO_MAPEOS   = os.environ.get('MONITOR_MAPEOS')     # opcional: JSON con los mapeos confirmados
+
+# Formatos candidatos para FECHA_ESTADO (día primero, como el resto del sistema, o ISO)
+FORMATOS_FECHA = [
+    '%d-%m-%Y %H:%M:%S', '%d-%m-%Y %H:%M', '%d-%m-%Y',
+    '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y',
+    '%d.%m.%Y %H:%M:%S', '%d.%m.%Y',
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%d %H:%M', '%Y-%m-%d', '%Y/%m/%d %H:%M:%S', '%Y/%m/%d',
+]
+MUESTRA_FECHAS     = 2000       # valores usados para elegir el formato dominante
+MIN_COBERTURA      = 0.5        # fracción mínima de la muestra que debe calzar con el formato
+
+_formatos_por_encabezado = {}   # huella del encabezado -> formato detectado
+_mapeos_por_encabezado   = {}   # huella del encabezado -> mapeo de columnas confirmado
+
+try:
+    import pyarrow  # noqa: F401
+    MOTOR = 'pyarrow'
+except ImportError:
+    MOTOR = 'c'
+
+
+# ==========================================
+# DETECCIÓN DE DIALECTO SOBRE UNA MUESTRA
+# ==========================================
+def detectar_dialecto(datos):
+    muestra = datos[:BYTES_MUESTRA]
+    if len(datos) > BYTES_MUESTRA and b'\n' in muestra:
+        muestra = muestra[:muestra.rindex(b'\n')]     # no cortar un carácter multibyte
+
+    try:
+        texto, encoding = muestra.decode('utf-8-sig'), 'utf-8-sig'
+    except UnicodeDecodeError:
+        texto, encoding = muestra.decode('latin-1'), 'latin-1'
+
+    primera_linea = texto.split('\n', 1)[0]
+    try:
+        sep = csv.Sniffer().sniff(texto, delimiters=SEPARADORES).delimiter
+    except csv.Error:
+        sep = max(SEPARADORES, key=primera_linea.count)
+
+    encabezado = [c.strip('\r') for c in next(csv.reader([primera_linea], delimiter=sep), [])]
+    return encoding, sep, encabezado
+
+
+# ==========================================
+# LECTURA
+# ==========================================
+def leer_csv(datos, columnas=None, dtypes=None):
+    # Devuelve (DataFrame, filas_omitidas). Solo se leen las columnas pedidas que
+    # existan en el archivo; las líneas mal formadas se omiten y se cuentan.
+    encoding, sep, encabezado = detectar_dialecto(datos)
+    usecols = [c for c in encabezado if c in columnas] if columnas else None
+    dtypes  = {c: t for c, t in (dtypes or {}).items() if usecols is None or c in usecols}
+
+    if MOTOR == 'pyarrow':
+        omitidas = [0]
+        def _omitir(_fila):
+            omitidas[0] += 1
+            return 'skip'
+        df = pd.read_csv(
+            io.BytesIO(datos), sep=sep, engine='pyarrow', usecols=usecols, dtype=dtypes,
+            on_bad_lines=_omitir, encoding='utf-8' if encoding == 'utf-8-sig' else encoding
+        )
+        return df, omitidas[0]
+
+    with warnings.catch_warnings(record=True) as avisos:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        df = pd.read_csv(
+            io.BytesIO(datos), sep=sep, engine='c', usecols=usecols, dtype=dtypes,
+            on_bad_lines='warn', encoding=encoding
+        )
+    return df, _contar_omitidas(avisos)
+
+
+def _contar_omitidas(avisos):
+    return sum(str(a.message).count('Skipping line') for a in avisos
+               if issubclass(a.category, pd.errors.ParserWarning))
+
+
+def leer_muestra(archivo):
+    # Primeros bytes de una ruta o de un archivo binario (que queda al inicio). Un byte
+    # de más para que detectar_dialecto sepa que hay más datos y corte en una línea completa.
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, 'rb') as f: return f.read(BYTES_MUESTRA + 1)
+    archivo.seek(0)
+    muestra = archivo.read(BYTES_MUESTRA + 1)
+    archivo.seek(0)
+    return muestra
+
+
+def leer_csv_bloques(archivo, columnas=None, dtypes=None, filas_bloque=100_000):
+    # Como leer_csv, pero sobre una ruta o un archivo binario abierto y de a bloques de
+    # filas: genera (DataFrame, filas_omitidas) sin cargar el archivo completo. El
+    # dialecto se detecta con la muestra inicial; el motor C es el que lee por bloques.
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, 'rb') as f:
+            yield from leer_csv_bloques(f, columnas, dtypes, filas_bloque)
+        return
+
+    encoding, sep, encabezado = detectar_dialecto(leer_muestra(archivo))
+    usecols = [c for c in encabezado if c in columnas] if columnas else None
+    dtypes  = {c: t for c, t in (dtypes or {}).items() if usecols is None or c in usecols}
+
+    with pd.read_csv(archivo, sep=sep, engine='c', usecols=usecols, dtype=dtypes, on_bad_lines='warn',
+                     encoding=encoding, chunksize=filas_bloque) as lector:
+        while True:
+            with warnings.catch_warnings(record=True) as avisos:
+                warnings.simplefilter('always', pd.errors.ParserWarning)
+                df = next(lector, None)
+            if df is None: return
+            yield df, _contar_omitidas(avisos)
+
+
+def huella_encabezado(datos):
+    _, sep, encabezado = detectar_dialecto(datos)
+    return sep + sep.join(encabezado)
+
+
+# ==========================================
+# MAPEO DE COLUMNAS
+# ==========================================
+# Un mapeo es {columna interna: columna del archivo, 'atributos': [columnas del archivo]}.
+# Se aplica al leer: solo las columnas mapeadas llegan al parser (usecols) y se
+# renombran ya leídas, sin reescribir el archivo.
+def _normalizar(nombre):
+    return nombre.strip().upper().replace(' ', '_').replace('-', '_')
+
+
+def detectar_mapeo(encabezado, campos=COLUMNAS_LOG):
+    normalizados = {_normalizar(c): c for c in reversed(encabezado)}     # ante repetidos, la primera
+    mapeo = {}
+    for campo in campos:
+        columna = next((normalizados[a] for a in ALIAS_COLUMNAS[campo] if a in normalizados), None)
+        if columna is not None and columna not in mapeo.values():
+            mapeo[campo] = columna
+    return {**mapeo, 'atributos': []}
+
+
+def _muestra(datos):
+    return datos[:BYTES_MUESTRA + 1] if isinstance(datos, (bytes, bytearray, memoryview)) else leer_muestra(datos)
+
+
+def mapeo_columnas(datos, campos=COLUMNAS_LOG):
+    # Mapeo recordado para el encabezado de `datos` (bytes, ruta o archivo) o el detectado
+    muestra = _muestra(datos)
+    guardado = _mapeos_por_encabezado.get(huella_encabezado(muestra))
+    if guardado is not None and set(campos) & set(guardado):
+        return guardado
+    return detectar_mapeo(detectar_dialecto(muestra)[2], campos)
+
+
+def recordar_mapeo(datos, mapeo):
+    # Confirma el mapeo para este encabezado (y lo persiste si hay ARCHIVO_MAPEOS)
+    _mapeos_por_encabezado[huella_encabezado(_muestra(datos))] = mapeo
+    if not ARCHIVO_MAPEOS: return
+    tmp = ARCHIVO_MAPEOS + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f: json.dump(_mapeos_por_encabezado, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, ARCHIVO_MAPEOS)
+
+
+def _leer_mapeos():
+    if not ARCHIVO_MAPEOS or not os.path.exists(ARCHIVO_MAPEOS): return {}
+    try:
+        with open(ARCHIVO_MAPEOS, encoding='utf-8') as f: return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+_mapeos_por_encabezado.update(_leer_mapeos())
+
+
+def _proyeccion(mapeo, dtypes, obligatorias=()):
+    # (columnas del archivo a leer, dtypes por columna del archivo, renombres a internas)
+    faltan = [c for c in obligatorias if not mapeo.get(c)]
+    if faltan:
+        raise ValueError(f"Faltan columnas en el log: {', '.join(faltan)}. Revise el mapeo de columnas.")
+    renombres = {fuente: campo for campo, fuente in mapeo.items() if campo != 'atributos' and fuente}
+    for a in mapeo.get('atributos', []):
+        renombres.setdefault(a, PREFIJO_ATRIBUTO + a)
+    tipos = {fuente: dtypes.get(campo, 'category' if campo.startswith(PREFIJO_ATRIBUTO) else None)
+             for fuente, campo in renombres.items()}
+    return list(renombres), {f: t for f, t in tipos.items() if t}, renombres
+
+
+def leer_mapeado(datos, campos, dtypes, mapeo=None, obligatorias=()):
+    # leer_csv con el mapeo de columnas (por defecto el recordado o detectado)
+    columnas, tipos, renombres = _proyeccion(mapeo or mapeo_columnas(datos, campos), dtypes, obligatorias)
+    df, omitidas = leer_csv(datos, columnas, tipos)
+    return df.rename(columns=renombres), omitidas
+
+
+def leer_log_bloques(archivo, filas_bloque, mapeo=None):
+    # leer_csv_bloques del log con el mapeo de columnas; el ID se lee como texto
+    columnas, tipos, renombres = _proyeccion(mapeo or mapeo_columnas(archivo), {**DTYPES_LOG, 'ID': 'str'},
+                                             OBLIGATORIAS_LOG)
+    for df, omitidas in leer_csv_bloques(archivo, columnas, tipos, filas_bloque):
+        yield df.rename(columns=renombres), omitidas
+
+
+# ==========================================
+# FECHAS
+# ==========================================
+def _cobertura(muestra, formato):
+    return pd.to_datetime(muestra, format=formato, errors='coerce').notna().mean()
+
+
+def detectar_formato_fecha(serie):
+    muestra = serie.dropna()
+    muestra = muestra.sample(min(MUESTRA_FECHAS, len(muestra)), random_state=0) if len(muestra) else muestra
+    if muestra.empty: return None
+    cobertura = {f: _cobertura(muestra, f) for f in FORMATOS_FECHA}
+    mejor = max(cobertura, key=cobertura.get)
+    return mejor if cobertura[mejor] >= MIN_COBERTURA else None
+
+
+def parsear_fechas(serie, huella=None):
+    # El formato dominante se parsea en una sola llamada vectorizada; solo el resto que
+    # no calza pasa por el camino 'mixed' (elemento a elemento). El formato queda
+    # recordado para próximas cargas con el mismo encabezado.
+    formato = _formatos_por_encabezado.get(huella)
+    if formato is not None:
+        muestra = serie.dropna().head(MUESTRA_FECHAS)
+        if not muestra.empty and _cobertura(muestra, formato) < MIN_COBERTURA:
+            formato = None
+    if formato is None:
+        formato = detectar_formato_fecha(serie)
+        if formato is None:
+            return pd.to_datetime(serie, format='mixed', dayfirst=True, errors='coerce')
+        if huella is not None:
+            _formatos_por_encabezado[huella] = formato
+
+    fechas = pd.to_datetime(serie, format=formato, errors='coerce')
+    resto = fechas.isna() & serie.notna()
+    if resto.any():
+        fechas[resto] = pd.to_datetime(serie[resto], format='mixed', dayfirst=True, errors='coerce')
+    return fechas
+
+
+def leer_log(datos, mapeo=None):
+    return leer_mapeado(datos, COLUMNAS_LOG, DTYPES_LOG, mapeo, OBLIGATORIAS_LOG)
+
+
+def leer_estados(datos, mapeo=None):
+    # Un registro por estado (ante repetidos, el último, como procesamiento.orden_estados):
+    # el maestro se une al log y un estado repetido duplicaría sus eventos
+    df, omitidas = leer_mapeado(datos, COLUMNAS_ESTADOS, DTYPES_ESTADOS, mapeo)
+    if 'ESTADO' in df.columns:
+        df = df.drop_duplicates('ESTADO', keep='last')
+    return df, omitidas
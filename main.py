@@ -1,7 +1,12 @@
 import streamlit as st
-import pandas as pd
-import re
 
+import cache_modelo
+import calendario
+import formatos_log
+import ingesta
+import particiones
+import snapshot
+import unidades
 import panel1_header
 import panel2_tabs
 
@@ -59,92 +64,109 @@ st.markdown(f"""
 if 'datos_procesados' not in st.session_state: st.session_state.datos_procesados = False
 if 'df_transiciones'  not in st.session_state: st.session_state.df_transiciones  = None
 if 'df_variantes'     not in st.session_state: st.session_state.df_variantes      = None
+if 'dfg'              not in st.session_state: st.session_state.dfg               = None
+if 'prefijos'         not in st.session_state: st.session_state.prefijos          = None
+if 'sketches'         not in st.session_state: st.session_state.sketches          = None
 if 'dict_orden'       not in st.session_state: st.session_state.dict_orden        = {}
+if 'orden_estados'    not in st.session_state: st.session_state.orden_estados     = None
 if 'periodo_fechas'   not in st.session_state: st.session_state.periodo_fechas    = ""
 if 'tiene_est_orden'  not in st.session_state: st.session_state.tiene_est_orden   = False
+if 'filas_omitidas'   not in st.session_state: st.session_state.filas_omitidas    = 0
+if 'hash_casos'       not in st.session_state: st.session_state.hash_casos        = None
+if 'inicios_casos'    not in st.session_state: st.session_state.inicios_casos     = None
+if 'clave_modelo'     not in st.session_state: st.session_state.clave_modelo      = None
 if 'exp_etapa'        not in st.session_state: st.session_state.exp_etapa         = False
 if 'exp_rec'          not in st.session_state: st.session_state.exp_rec           = False
 if 'exp_metodo'       not in st.session_state: st.session_state.exp_metodo        = False
+if 'modo_sketch'      not in st.session_state: st.session_state.modo_sketch       = False
+if 'ic_bootstrap'     not in st.session_state: st.session_state.ic_bootstrap      = {}
+if 'unidad_tiempo'    not in st.session_state: st.session_state.unidad_tiempo     = unidades.UNIDAD_DEFECTO
+if 'vistas'           not in st.session_state: st.session_state.vistas            = {}
+if 'simulacion'       not in st.session_state: st.session_state.simulacion        = {}
+if 'calendario'       not in st.session_state: st.session_state.calendario        = calendario.calendario_defecto()
+if 'turno'            not in st.session_state: st.session_state.turno             = calendario.TURNO
+if 'feriados'         not in st.session_state: st.session_state.feriados          = "\n".join(st.session_state.calendario['feriados'])
 
 panel1_header.render()
 
 # ==========================================
 # 3. LÓGICA DE CARGA DE DATOS
 # ==========================================
+ETIQUETAS_MAPEO = {'ID': "ID de caso", 'ESTADO': "Estado / actividad", 'FECHA_ESTADO': "Fecha del estado",
+                   'RECURSO': "Recurso (opcional)"}
+
+def render_mapeo(muestra):
+    # Columnas del CSV -> columnas del modelo; parte del mapeo recordado para este
+    # encabezado o del detectado por nombre. Devuelve el mapeo elegido.
+    encabezado = ingesta.detectar_dialecto(muestra)[2]
+    mapeo = ingesta.mapeo_columnas(muestra)
+    completo = all(mapeo.get(c) in encabezado for c in ingesta.OBLIGATORIAS_LOG)
+    sufijo = abs(hash(ingesta.huella_encabezado(muestra)))       # otro encabezado, otros selectores
+    elegido = {}
+    with st.expander("Columnas del log", expanded=not completo):
+        opciones = [None] + encabezado
+        for campo, etiqueta in ETIQUETAS_MAPEO.items():
+            actual = mapeo.get(campo) if mapeo.get(campo) in encabezado else None
+            columna = st.selectbox(etiqueta, opciones, index=opciones.index(actual), key=f"mapeo_{campo}_{sufijo}",
+                                   format_func=lambda c: "—" if c is None else c)
+            if columna: elegido[campo] = columna
+        libres = [c for c in encabezado if c not in elegido.values()]
+        elegido['atributos'] = st.multiselect("Atributos adicionales", libres, key=f"mapeo_atributos_{sufijo}",
+                                              default=[a for a in mapeo.get('atributos', []) if a in libres])
+    return elegido
+
 if not st.session_state.datos_procesados:
     st.info("Sube los archivos CSV para comenzar el análisis.")
     col1, col2 = st.columns(2)
-    with col1: archivo_log = st.file_uploader("1. Log principal (eventos)", type=['csv'])
+    with col1: archivo_log = st.file_uploader("1. Log principal (eventos: CSV, XES u OCEL)", type=['csv', 'xes', 'json', 'jsonocel'])
     with col2: archivo_est = st.file_uploader("2. Maestro de estados", type=['csv'])
 
     if archivo_log and archivo_est:
+        muestra = ingesta.leer_muestra(archivo_log)
+        mapeo = render_mapeo(muestra) if formatos_log.formato_log(muestra) == 'csv' else None
+    if archivo_log and archivo_est and st.button("Procesar archivos", type="primary"):
         try:
             with st.spinner("Procesando datos y modelando procesos..."):
-                df_log = pd.read_csv(archivo_log, sep=None, engine='python', on_bad_lines='skip', encoding='utf-8-sig')
-                df_est = pd.read_csv(archivo_est, sep=None, engine='python', on_bad_lines='skip', encoding='utf-8-sig')
-
-                col_responsable = ('RECURSO' if 'RECURSO' in df_log.columns else 'RESPONSABLE' if 'RESPONSABLE' in df_log.columns else None)
-                tiene_est_orden = ('ESTADO' in df_est.columns and 'EST_ORDEN' in df_est.columns)
-                dict_orden = {'Inicio proceso': -9999, 'Fin proceso': 9999}
-                if tiene_est_orden:
-                    for _, r in df_est.dropna(subset=['ESTADO', 'EST_ORDEN']).iterrows():
-                        val_str = str(r['EST_ORDEN']).strip()
-                        try: orden_val = float(val_str)
-                        except ValueError:
-                            m = re.search(r'\d+', val_str)
-                            orden_val = float(m.group()) if m else 9999
-                        dict_orden[str(r['ESTADO']).strip()] = orden_val
-
-                st.session_state.dict_orden      = dict_orden
-                st.session_state.tiene_est_orden = tiene_est_orden
-
-                df_log['FECHA_ESTADO'] = pd.to_datetime(df_log['FECHA_ESTADO'], format='mixed', dayfirst=True, errors='coerce')
-                fechas_validas = df_log['FECHA_ESTADO'].dropna()
-                if not fechas_validas.empty:
-                    st.session_state.periodo_fechas = f"Período {fechas_validas.min().strftime('%d-%m-%Y')} – {fechas_validas.max().strftime('%d-%m-%Y')}"
+                if mapeo is not None: ingesta.recordar_mapeo(muestra, mapeo)
+                bytes_est = archivo_est.getvalue()
+                if particiones.usar_particiones(archivo_log):
+                    # XES / OCEL o un CSV que no entra en el presupuesto de memoria: lectura por bloques
+                    clave_modelo = cache_modelo.clave_modelo(archivo_log, bytes_est)
+                    modelo = cache_modelo.obtener_modelo_particionado(archivo_log, bytes_est, clave_modelo)
                 else:
-                    st.session_state.periodo_fechas = "Período no disponible"
-
-                cols_merge = ['ESTADO']
-                if tiene_est_orden: cols_merge.append('EST_ORDEN')
-                df = df_log.merge(df_est[cols_merge], on='ESTADO', how='left')
-                df = df.sort_values(['ID', 'FECHA_ESTADO'])
-
-                transiciones = []
-                for case_id, group in df.groupby('ID'):
-                    estados = ['Inicio proceso'] + group['ESTADO'].tolist() + ['Fin proceso']
-                    fechas  = ([group['FECHA_ESTADO'].min()] + group['FECHA_ESTADO'].tolist() + [group['FECHA_ESTADO'].max()])
-                    recursos_lista = (group[col_responsable].tolist() if col_responsable else ['Desconocido'] * len(group))
-                    recursos = ['Sistema'] + recursos_lista + ['Sistema']
-                    for i in range(len(estados) - 1):
-                        duracion = ((fechas[i+1] - fechas[i]).days if pd.notnull(fechas[i+1]) and pd.notnull(fechas[i]) else 0)
-                        transiciones.append({
-                            'ID': case_id, 'Origen': estados[i], 'Destino': estados[i+1],
-                            'Fecha_Inicio': fechas[i], 'Duracion': duracion, 'Recurso_Origen': recursos[i]
-                        })
-
-                df_trans = pd.DataFrame(transiciones)
-
-                df_var = df_trans.groupby('ID').agg(
-                    Ruta=('Destino', lambda x: ' -> '.join([s for s in x if s != 'Fin proceso'])),
-                    Duracion_Total=('Duracion', 'sum'),
-                    Fecha_Inicio_Caso=('Fecha_Inicio', 'min')
-                ).reset_index()
-
-                frecuencias = df_var['Ruta'].value_counts().reset_index()
-                frecuencias.columns = ['Ruta', 'Frecuencia']
-                mapeo_variantes = {row['Ruta']: f"Var {i+1}" for i, row in frecuencias.iterrows()}
-                df_var['Nombre_Variante'] = df_var['Ruta'].map(mapeo_variantes)
-                df_var['Ruta_Tooltip']    = df_var['Ruta'].apply(lambda x: x.replace(' -> ', '<br>&#8627; '))
-
-                df_trans = df_trans.merge(df_var[['ID', 'Nombre_Variante', 'Ruta']], on='ID', how='left')
-
-                st.session_state.df_transiciones = df_trans
-                st.session_state.df_variantes    = df_var
+                    bytes_log = archivo_log.getvalue()
+                    clave_modelo = cache_modelo.clave_modelo(bytes_log, bytes_est)
+                    modelo = cache_modelo.obtener_modelo(bytes_log, bytes_est, clave_modelo)
+                for clave, valor in modelo.items():
+                    st.session_state[clave] = valor
+                st.session_state.clave_modelo = clave_modelo
                 st.session_state.datos_procesados = True
                 st.rerun()
 
         except Exception as e:
             st.error(f"Error al procesar: {e}")
+
+    # ── Modelos guardados (snapshot.py): se abren sin volver a procesar el log ──
+    guardados = snapshot.listar_snapshots()
+    if guardados:
+        st.markdown("---")
+        etiquetas = {nombre: f"{meta['periodo_fechas']} · {meta['n_casos']:,} casos · guardado {meta['guardado']}"
+                     for nombre, meta in guardados}
+        col1, col2 = st.columns([4, 1])
+        with col1: elegido = st.selectbox("O abrir un modelo guardado", list(etiquetas), format_func=etiquetas.get)
+        with col2:
+            st.markdown(f"<div style='height:28px'></div>", unsafe_allow_html=True)
+            abrir = st.button("Abrir", use_container_width=True)
+        if abrir:
+            try:
+                with st.spinner("Abriendo modelo guardado..."):
+                    clave_modelo, modelo = snapshot.cargar_snapshot(elegido)
+                    for clave, valor in modelo.items():
+                        st.session_state[clave] = valor
+                    st.session_state.clave_modelo = clave_modelo
+                    st.session_state.datos_procesados = True
+                    st.rerun()
+            except Exception as e:
+                st.error(f"Error al abrir el modelo guardado: {e}")
 else:
     panel2_tabs.render()
\ No newline at end of file
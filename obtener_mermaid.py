@@ -0,0 +1,64 @@
+import argparse
+import io
+import os
+import sys
+import tarfile
+import urllib.request
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+# Reemplaza el bundle UMD de Mermaid versionado en static/mermaid.min.js (la app lo sirve
+# como archivo estático y batch.py lo copia junto a los informes). Con acceso a Internet
+# lo baja del registro de npm:
+#   python obtener_mermaid.py
+# En un equipo sin Internet se copia desde el paquete npm o el archivo ya descargados:
+#   python obtener_mermaid.py --desde mermaid-11.12.0.tgz
+# Termina con error (código 1) si no consigue un bundle válido.
+VERSION_MERMAID = '11.12.0'
+URL_PAQUETE     = f"https://registry.npmjs.org/mermaid/-/mermaid-{VERSION_MERMAID}.tgz"
+MIEMBRO_BUNDLE  = 'package/dist/mermaid.min.js'
+DESTINO         = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'mermaid.min.js')
+MIN_BYTES       = 500_000      # el bundle completo pesa ~3 MB; menos es una descarga cortada
+
+
+def leer_origen(origen):
+    # Bytes del bundle desde una URL o ruta a un .tgz de npm o al propio .js
+    if origen.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(origen, timeout=60) as r: datos = r.read()
+    else:
+        with open(origen, 'rb') as f: datos = f.read()
+    if datos[:2] == b'\x1f\x8b':
+        with tarfile.open(fileobj=io.BytesIO(datos), mode='r:gz') as tgz:
+            miembro = tgz.extractfile(MIEMBRO_BUNDLE)
+            if miembro is None: raise ValueError(f"el paquete no contiene {MIEMBRO_BUNDLE}")
+            datos = miembro.read()
+    return datos
+
+
+def validar(datos):
+    if len(datos) < MIN_BYTES or b'mermaid' not in datos[-200_000:]:
+        raise ValueError(f"no parece el bundle UMD de Mermaid ({len(datos):,} bytes)")
+    datos.decode('utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Descarga o copia el bundle de Mermaid usado por el mapa de proceso.")
+    parser.add_argument('--desde', default=URL_PAQUETE, help="URL o ruta a mermaid-<versión>.tgz o a mermaid.min.js")
+    args = parser.parse_args(argv)
+    try:
+        datos = leer_origen(args.desde)
+        validar(datos)
+    except Exception as e:
+        print(f"ERROR  no se pudo obtener Mermaid desde {args.desde}: {e}", file=sys.stderr)
+        return 1
+    os.makedirs(os.path.dirname(DESTINO), exist_ok=True)
+    tmp = DESTINO + '.tmp'
+    with open(tmp, 'wb') as f: f.write(datos)
+    os.replace(tmp, DESTINO)
+    print(f"OK     {DESTINO}: {len(datos):,} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,12 @@
+import time
+
 import streamlit as st
 
+import cache_modelo
+import calendario
+import snapshot
+import unidades
+
 import panel3_mapa
 import panel3_estadisticas
 import panel3_diagnostico
@@ -14,6 +21,54 @@ P_DARK   = "#1f2937"
 # Espaciado parametrizable
 DISTANCIA_BOTONES_TITULO = 25 
 
+# Claves del modelo que viven en la sesión (ver procesamiento.procesar_archivos)
+CLAVES_MODELO = ['df_transiciones', 'df_variantes', 'hash_casos', 'inicios_casos', 'dfg', 'prefijos', 'sketches',
+                 'dict_orden', 'orden_estados', 'periodo_fechas', 'tiene_est_orden', 'filas_omitidas']
+
+def render_anexar():
+    # Eventos nuevos (mismo formato que el log principal) sobre el modelo ya cargado
+    n_anexos = st.session_state.setdefault('n_anexos', 0)
+    archivo = st.sidebar.file_uploader("Anexar eventos al log", type=['csv'], key=f"archivo_anexo_{n_anexos}")
+    if archivo is None or not st.sidebar.button("Anexar eventos", use_container_width=True):
+        return
+    try:
+        with st.spinner("Incorporando eventos nuevos..."):
+            modelo_base = {c: st.session_state[c] for c in CLAVES_MODELO}
+            clave, modelo = cache_modelo.anexar_modelo(st.session_state.clave_modelo, modelo_base, archivo.getvalue())
+    except Exception as e:
+        st.sidebar.error(f"Error al anexar: {e}")
+        return
+    for c, valor in modelo.items():
+        st.session_state[c] = valor
+    st.session_state.clave_modelo = clave
+    st.session_state.ic_bootstrap = {}
+    st.session_state.n_anexos = n_anexos + 1       # vacía el selector: el mismo archivo no se anexa dos veces
+    st.rerun()
+
+
+def render_calendario():
+    # Turno y feriados de las unidades hábiles; si no son válidos se mantiene el calendario anterior
+    with st.sidebar.expander("Calendario laboral"):
+        turno = st.text_input("Turno (HH:MM-HH:MM)", key="turno")
+        feriados = st.text_area("Feriados (una fecha por línea)", key="feriados", height=100)
+        try:
+            st.session_state.calendario = calendario.crear_calendario(turno, calendario.leer_feriados(feriados))
+        except ValueError as e:
+            st.error(str(e))
+
+
+def vista_sesion(unidad):
+    # Vista del modelo en la unidad elegida; solo se recalcula al cambiar de modelo, unidad o calendario
+    cal = st.session_state.calendario if unidades.UNIDADES[unidad].get('habiles') else None
+    clave = (st.session_state.clave_modelo, id(st.session_state.df_transiciones), unidad,
+             cal and calendario.clave_calendario(cal))
+    vistas = st.session_state.vistas
+    if clave not in vistas:
+        vistas.clear()
+        vistas[clave] = unidades.vista_modelo({c: st.session_state[c] for c in CLAVES_MODELO}, unidad, cal)
+    return vistas[clave]
+
+
 def render():
     # ── Sidebar ───────────────────────────────────────────────────────────
     st.sidebar.markdown(
@@ -21,7 +76,20 @@ def render():
         f"font-family:Arial;'>{st.session_state.periodo_fechas}</div>",
         unsafe_allow_html=True,
     )
+    unidad = st.sidebar.selectbox("Unidad de tiempo", list(unidades.UNIDADES), key="unidad_tiempo")
+    if unidades.UNIDADES[unidad].get('habiles'): render_calendario()
+    st.session_state.vista = vista_sesion(unidad)
+    if st.session_state.filas_omitidas:
+        st.sidebar.caption(f"⚠ {st.session_state.filas_omitidas} fila(s) omitida(s) por formato inválido.")
     st.sidebar.markdown("---")
+    render_anexar()
+    if st.sidebar.button("Guardar modelo", use_container_width=True):
+        nombre = (st.session_state.clave_modelo or time.strftime('%Y%m%d-%H%M%S'))[:16]
+        try:
+            snapshot.guardar_snapshot({c: st.session_state[c] for c in CLAVES_MODELO}, nombre, st.session_state.clave_modelo)
+            st.sidebar.success("Modelo guardado: se puede abrir sin volver a procesar los archivos.")
+        except Exception as e:
+            st.sidebar.error(f"Error al guardar: {e}")
     if st.sidebar.button("Cargar nuevos archivos", use_container_width=True):
         st.session_state.datos_procesados = False
         st.rerun()
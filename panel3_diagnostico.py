@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
-import statistics
+
+import informes
+import procesamiento
+import simulacion
+import unidades
 
 # ==========================================
 # PALETA
@@ -32,34 +35,17 @@ def bloque_info(color_borde, bg_rgba, texto_html):
     )
 
 def render():
-    df_trans = st.session_state.df_transiciones
-    df_var   = st.session_state.df_variantes
+    vista    = st.session_state.vista
+    df_trans = vista['df_transiciones']
+    df_var   = vista['df_variantes']
+    unidad   = unidades.UNIDADES[vista['unidad']]['nombre']
 
     st.markdown("### Diagnóstico")
     st.caption("Diagnóstico at-a-glance para la toma de decisiones. Basado en el universo completo de casos cargados.")
 
-    N_MIN_RESUMEN = 5
-    z_resumen = statistics.NormalDist().inv_cdf((1 + 95 / 100) / 2)
-
-    df_etapas_res = df_trans[(df_trans['Origen'] != 'Inicio proceso') & (df_trans['Destino'] != 'Fin proceso')]
-    etapa_stats = df_etapas_res.groupby('Origen').agg(Promedio=('Duracion', 'mean'), Casos=('ID', 'count')).reset_index().rename(columns={'Origen': 'Etapa'})
-    etapa_stats = etapa_stats[etapa_stats['Promedio'] > 0].sort_values('Promedio', ascending=False)
-
-    def pred_variante(valores, z):
-        n = len(valores)
-        if n < N_MIN_RESUMEN: return None, None, None
-        media = np.mean(valores)
-        margen = z * (np.std(valores, ddof=1) if n > 1 else 0.0) * np.sqrt(1 + 1 / n)
-        return media, max(0, media - margen), media + margen
-
-    pronostico_rows = []
-    diccionario_rutas_res = df_var.set_index('Nombre_Variante')['Ruta'].to_dict()
-    for var, grp in df_var.groupby('Nombre_Variante'):
-        vals = grp['Duracion_Total'].dropna().values
-        media, li, ls = pred_variante(vals, z_resumen)
-        if media is not None:
-            pronostico_rows.append({'Variante': var, 'Ruta': diccionario_rutas_res.get(var, ''), 'Casos': len(vals), 'Promedio': media, 'Li95': li, 'Ls95': ls})
-    df_pronostico = pd.DataFrame(pronostico_rows).sort_values('Casos', ascending=False).head(5) if pronostico_rows else pd.DataFrame()
+    etapa_stats = informes.cuellos_botella(df_trans)
+    df_pronostico = informes.prediccion_variantes(df_var, nivel=95, top=5)
+    diccionario_rutas_res = procesamiento.rutas_por_variante(df_var)
 
     col_cb, col_rec = st.columns(2)
 
@@ -74,29 +60,28 @@ def render():
             fig_cb = px.bar(
                 etapa_stats, x='Promedio', y='Etapa', orientation='h', color='Promedio',
                 color_continuous_scale=["#E1E1E1", P_SALMON, P_CORAL],
-                text=etapa_stats['Promedio'].apply(lambda x: f"{formato_latino(x)} días"),
-                custom_data=['Casos_txt', 'Promedio_txt'], labels={'Promedio': 'Días promedio', 'Etapa': ''},
+                text=etapa_stats['Promedio'].apply(lambda x: f"{formato_latino(x)} {unidad}"),
+                custom_data=['Casos_txt', 'Promedio_txt'], labels={'Promedio': f"{unidad.capitalize()} promedio", 'Etapa': ''},
             )
-            fig_cb.update_traces(textposition='outside', cliponaxis=False, hovertemplate="<b>%{y}</b><br>Promedio: %{customdata[1]} días<br>Casos: %{customdata[0]}<extra></extra>")
+            fig_cb.update_traces(textposition='outside', cliponaxis=False, hovertemplate=f"<b>%{{y}}</b><br>Promedio: %{{customdata[1]}} {unidad}<br>Casos: %{{customdata[0]}}<extra></extra>")
             fig_cb.update_layout(
                 height=380, font=dict(family="Arial", size=13), coloraxis_showscale=False,
                 margin=dict(l=10, r=60, t=10, b=40), yaxis=dict(categoryorder='total ascending'),
-                xaxis_title="Días promedio de permanencia", xaxis=dict(rangemode='tozero'),
+                xaxis_title=f"{unidad.capitalize()} promedio de permanencia", xaxis=dict(rangemode='tozero'),
                 plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)' # 👈 Transparente
             )
             st.plotly_chart(fig_cb, use_container_width=True)
 
             peor = etapa_stats.iloc[0]
             # Usamos RGBA para el fondo del bloque
-            bloque_info(P_CORAL, "rgba(255, 104, 107, 0.1)", f"<b>⚠ Mayor cuello de botella:</b> {peor['Etapa']}<br>Promedio de <b>{formato_latino(peor['Promedio'])} días</b> · {formato_latino(peor['Casos'], 0)} casos")
+            bloque_info(P_CORAL, "rgba(255, 104, 107, 0.1)", f"<b>⚠ Mayor cuello de botella:</b> {peor['Etapa']}<br>Promedio de <b>{formato_latino(peor['Promedio'])} {unidad}</b> · {formato_latino(peor['Casos'], 0)} casos")
         else: st.info("Sin datos suficientes.")
 
     with col_rec:
         st.markdown("#### ② Recursos con sobrecarga")
         st.caption("Eje Y: tiempo promedio. Tamaño: volumen de casos.")
 
-        df_recursos_res = df_trans[df_trans['Recurso_Origen'] != 'Sistema']
-        recurso_stats = df_recursos_res.groupby('Recurso_Origen').agg(Promedio=('Duracion', 'mean'), Casos=('ID', 'count')).reset_index().rename(columns={'Recurso_Origen': 'Recurso'})
+        recurso_stats = informes.recursos_sobrecarga(df_trans)
 
         if not recurso_stats.empty:
             recurso_stats['Promedio_txt'] = recurso_stats['Promedio'].apply(lambda x: formato_latino(x, 1))
@@ -107,20 +92,19 @@ def render():
                 color_continuous_scale=[P_MINT, P_TEAL, "#5aab9a"], size_max=60, text='Recurso',
                 custom_data=['Casos_txt', 'Promedio_txt'], labels={'Promedio': 'Tiempo promedio', 'Recurso': ''},
             )
-            fig_rec.update_traces(textposition='top center', hovertemplate="<b>%{x}</b><br>Tiempo promedio: %{customdata[1]} días<br>Etapas: %{customdata[0]}<extra></extra>")
+            fig_rec.update_traces(textposition='top center', hovertemplate=f"<b>%{{x}}</b><br>Tiempo promedio: %{{customdata[1]}} {unidad}<br>Etapas: %{{customdata[0]}}<extra></extra>")
             fig_rec.update_layout(
                 height=380, font=dict(family="Arial", size=13), coloraxis_showscale=False,
                 margin=dict(l=10, r=30, t=10, b=60), xaxis=dict(showticklabels=False),
-                yaxis_title="Tiempo promedio de procesamiento (días)", yaxis=dict(rangemode='tozero'),
+                yaxis_title=f"Tiempo promedio de procesamiento ({unidad})", yaxis=dict(rangemode='tozero'),
                 plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)' # 👈 Transparente
             )
             st.plotly_chart(fig_rec, use_container_width=True)
 
-            candidatos = recurso_stats[(recurso_stats['Promedio'] > recurso_stats['Promedio'].quantile(0.75)) & (recurso_stats['Casos'] > recurso_stats['Casos'].median())]
-            peor_r = candidatos.sort_values('Promedio', ascending=False).iloc[0] if not candidatos.empty else recurso_stats.sort_values('Promedio', ascending=False).iloc[0]
-            
+            peor_r = informes.recurso_critico(recurso_stats)
+
             # Usamos RGBA para el fondo del bloque
-            bloque_info(P_TEAL, "rgba(132, 220, 198, 0.15)", f"<b>⚠ Recurso más crítico:</b> {peor_r['Recurso']}<br>Promedio de <b>{formato_latino(peor_r['Promedio'])} días</b> · {formato_latino(peor_r['Casos'], 0)} etapas")
+            bloque_info(P_TEAL, "rgba(132, 220, 198, 0.15)", f"<b>⚠ Recurso más crítico:</b> {peor_r['Recurso']}<br>Promedio de <b>{formato_latino(peor_r['Promedio'])} {unidad}</b> · {formato_latino(peor_r['Casos'], 0)} etapas")
         else: st.info("Sin datos de recursos.")
 
     st.markdown("#### ③ Pronóstico para casos futuros (Top 5 variantes)")
@@ -134,15 +118,15 @@ def render():
             df_pronostico, x='Variante', y='Promedio', error_y=df_pronostico['Ls95'] - df_pronostico['Promedio'], error_y_minus=df_pronostico['Promedio'] - df_pronostico['Li95'],
             text='Label_Casos', size='Casos', size_max=30, color_discrete_sequence=[P_TEAL],
             custom_data=[df_pronostico['Li95'].apply(lambda x: formato_latino(x, 1)), df_pronostico['Ls95'].apply(lambda x: formato_latino(x, 1)), df_pronostico['Casos'].apply(lambda x: formato_latino(x, 0)), df_pronostico['Promedio'].apply(lambda x: formato_latino(x, 1))],
-            labels={'Promedio': 'Días (promedio)', 'Variante': ''},
+            labels={'Promedio': f"{unidad.capitalize()} (promedio)", 'Variante': ''},
         )
-        fig_pron.update_traces(textposition='middle right', hovertemplate="<b>%{x}</b><br>Promedio: %{customdata[3]} días<br>Intervalo 95%: %{customdata[0]} – %{customdata[1]} días<br>Casos: %{customdata[2]}<extra></extra>")
+        fig_pron.update_traces(textposition='middle right', hovertemplate=f"<b>%{{x}}</b><br>Promedio: %{{customdata[3]}} {unidad}<br>Intervalo 95%: %{{customdata[0]}} – %{{customdata[1]}} {unidad}<br>Casos: %{{customdata[2]}}<extra></extra>")
         for _, row in df_pronostico.iterrows():
             for y_val, txt in [(row['Ls95'], formato_latino(row['Ls95'], 1)), (row['Li95'], formato_latino(row['Li95'], 1))]:
                 fig_pron.add_annotation(x=row['Variante'], y=y_val, text=txt, showarrow=False, xanchor='left', yanchor='middle', xshift=8, font=dict(size=11, color=P_TEAL))
         fig_pron.update_layout(
             height=350, font=dict(family="Arial", size=13), margin=dict(l=10, r=80, t=20, b=60),
-            yaxis_title="Duración estimada (días)", yaxis=dict(rangemode='tozero'),
+            yaxis_title=f"Duración estimada ({unidad})", yaxis=dict(rangemode='tozero'),
             plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)' # 👈 Transparente
         )
         st.plotly_chart(fig_pron, use_container_width=True)
@@ -150,5 +134,70 @@ def render():
         tabla_pron = df_pronostico[['Variante', 'Casos', 'Promedio', 'Li95', 'Ls95']].copy()
         tabla_pron.columns = ['Variante', 'Casos', 'Promedio', 'Límite Inf. (95%)', 'Límite Sup. (95%)']
         tabla_pron['Variante'] = tabla_pron['Variante'].apply(lambda v: f'<span title="{diccionario_rutas_res.get(v, "")}" style="cursor:help;border-bottom:1px dotted #888;">{v}</span>')
-        fmt_pron = {'Promedio': lambda x: formato_latino(x) + " días", 'Límite Inf. (95%)': lambda x: formato_latino(x) + " días", 'Límite Sup. (95%)': lambda x: formato_latino(x) + " días", 'Casos': lambda x: formato_latino(x, 0)}
-        mostrar_tabla_html(tabla_pron.style.hide(axis="index").format(fmt_pron))
\ No newline at end of file
+        fmt_pron = {'Promedio': lambda x: f"{formato_latino(x)} {unidad}", 'Límite Inf. (95%)': lambda x: f"{formato_latino(x)} {unidad}", 'Límite Sup. (95%)': lambda x: f"{formato_latino(x)} {unidad}", 'Casos': lambda x: formato_latino(x, 0)}
+        mostrar_tabla_html(tabla_pron.style.hide(axis="index").format(fmt_pron))
+
+    render_simulacion(vista, etapa_stats.iloc[0]['Etapa'] if not etapa_stats.empty else None)
+
+
+# ==========================================
+# SIMULACIÓN DE ESCENARIOS (WHAT-IF)
+# ==========================================
+def modelo_simulacion_sesion():
+    # Se arma una vez por modelo (tiempo calendario, no depende de la unidad elegida)
+    clave = (st.session_state.clave_modelo, id(st.session_state.df_transiciones))
+    cache = st.session_state.simulacion
+    if cache.get('clave') != clave:
+        cache.clear()
+        cache.update(clave=clave, resultados={},
+                     modelo=simulacion.modelo_simulacion(st.session_state.df_transiciones, st.session_state.df_variantes))
+    return cache
+
+
+def render_simulacion(vista, etapa_defecto=None):
+    st.markdown("#### ④ Simulación de escenarios")
+    st.caption("Qué pasaría con el tiempo de ciclo si una etapa tuviera más (o menos) recursos. Simulación de eventos "
+               "discretos con las rutas, tiempos y llegadas del historial; base y escenario comparten los números aleatorios.")
+
+    cache = modelo_simulacion_sesion()
+    ms = cache['modelo']
+    etapas = [str(e) for e, c in zip(ms['estados'], ms['servidores']) if c > 0]
+    if not etapas:
+        st.info("Sin datos suficientes para simular.")
+        return
+
+    # La simulación corre en tiempo calendario: las unidades hábiles se informan en su equivalente lineal
+    segundos = unidades.UNIDADES[vista['unidad']]['segundos']
+    unidad = next(c['nombre'] for c in unidades.UNIDADES.values() if c['segundos'] == segundos and not c.get('habiles'))
+
+    col_etapa, col_delta, col_rep, col_btn = st.columns([3, 2, 2, 1.3])
+    with col_etapa:
+        etapa = st.selectbox("Etapa", etapas, index=etapas.index(etapa_defecto) if etapa_defecto in etapas else 0, key="sim_etapa")
+    recursos = int(ms['recursos'][ms['estados'].get_loc(etapa)])
+    with col_delta:
+        delta = st.number_input(f"Recursos a sumar (hoy {recursos})", min_value=1 - recursos, max_value=50, value=1, step=1, key="sim_delta")
+    with col_rep:
+        n_replicas = st.number_input("Réplicas", min_value=50, max_value=5000, value=simulacion.N_REPLICAS_SIM, step=50, key="sim_replicas")
+    with col_btn:
+        st.markdown("<div style='height:28px'></div>", unsafe_allow_html=True)
+        simular = st.button("Simular", use_container_width=True)
+
+    clave = (etapa, int(delta), int(n_replicas))
+    if simular and clave not in cache['resultados']:
+        with st.spinner(f"Simulando {formato_latino(n_replicas, 0)} réplicas de {simulacion.N_CASOS_SIM} casos..."):
+            cache['resultados'][clave] = simulacion.simular_escenario(ms, {etapa: int(delta)}, int(n_replicas))
+    if clave not in cache['resultados']: return
+
+    tabla_ciclo, tabla_espera = simulacion.resumen_escenario(ms, *cache['resultados'][clave], segundos_unidad=segundos)
+    fmt_tiempo = lambda x: f"{formato_latino(x)} {unidad}"
+    fmt_pct = lambda x: "—" if pd.isna(x) else ("+" if x > 0 else "") + formato_latino(x) + "%"
+    col_ciclo, col_espera = st.columns(2)
+    with col_ciclo:
+        st.caption(f"Tiempo de ciclo por caso ({etapa}: {recursos} → {recursos + int(delta)} recursos). IC 95% del cambio entre réplicas.")
+        mostrar_tabla_html(tabla_ciclo.style.hide(axis="index").format(
+            {'Base': fmt_tiempo, 'Escenario': fmt_tiempo, 'Cambio %': fmt_pct, 'IC inf. %': fmt_pct, 'IC sup. %': fmt_pct}))
+    with col_espera:
+        st.caption("Espera media en cola por etapa (servidores = casos simultáneos que atiende la etapa).")
+        mostrar_tabla_html(tabla_espera.style.hide(axis="index").format(
+            {'Espera base': fmt_tiempo, 'Espera escenario': fmt_tiempo,
+             'Recursos': lambda x: formato_latino(x, 0), 'Servidores': lambda x: formato_latino(x, 0)}))
@@ -2,6 +2,11 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 
+import estadisticas
+import informes
+import procesamiento
+import unidades
+
 # ==========================================
 # PALETA
 # ==========================================
@@ -28,49 +33,59 @@ def mostrar_nota_outliers():
     )
 
 def render():
-    df_trans       = st.session_state.df_transiciones
-    df_var         = st.session_state.df_variantes
+    vista          = st.session_state.vista
+    df_trans       = vista['df_transiciones']
+    df_var         = vista['df_variantes']
     periodo_fechas = st.session_state.periodo_fechas
+    sketches       = vista['sketches'] or {}
+    sufijo         = " " + unidades.UNIDADES[vista['unidad']]['sufijo']
 
     st.subheader("Análisis Estadístico de Tiempos")
     st.caption(f"Distribución de duraciones históricas por recurso, etapa y variante. {periodo_fechas}.")
 
-    _, col_conf = st.columns([4, 1])
+    col_modo, col_conf = st.columns([4, 1])
+    with col_modo:
+        if sketches:
+            st.session_state.modo_sketch = st.checkbox(
+                f"Modo aproximado (sketches, error ≤ {formato_latino(estadisticas.ALFA_SKETCH * 100, 0)}%)",
+                value=st.session_state.modo_sketch,
+                help="Percentiles calculados desde sketches mergeables construidos al cargar el log, sin recorrer todas las duraciones."
+            )
+    modo_sketch = bool(sketches) and st.session_state.modo_sketch
     with col_conf:
-        st.number_input("Nivel de confianza (%)", min_value=50, max_value=99, value=95, step=1)
-
-    N_MIN_VALIDO = 10
-
-    def calcular_estadisticas(df_agrupado, col_agrupacion, col_valor, rename_col):
-        resultados = []
-        for grupo, datos in df_agrupado.groupby(col_agrupacion):
-            valores = datos[col_valor].dropna().values
-            n = len(valores)
-            if n == 0: continue
-            media, mediana = np.mean(valores), np.median(valores)
-            ps = {}
-            for p in [5, 25, 75, 95]:
-                sorted_v = np.sort(valores)
-                idx_f    = (p / 100) * (len(sorted_v) - 1)
-                lo, hi   = int(np.floor(idx_f)), int(np.ceil(idx_f))
-                ps[p]    = sorted_v[lo] + (sorted_v[hi] - sorted_v[lo]) * (idx_f - lo)
-
-            q1, q3 = ps[25], ps[75]
-            iqr = q3 - q1
-            n_outliers = int(np.sum((valores > q3 + 1.5 * iqr) | (valores < q1 - 1.5 * iqr)))
-            pct_out = (n_outliers / n * 100) if n > 0 else 0.0
-
-            if n < N_MIN_VALIDO: fiabilidad = "⚠ Muestra insuficiente"
-            elif n_outliers > 0: fiabilidad = f"⚠ {n_outliers} atípico{'s' if n_outliers != 1 else ''} ({formato_latino(pct_out, 1)}%)"
-            else: fiabilidad = "✓ OK"
-
-            resultados.append({rename_col: grupo, "n": n, "Mediana": mediana, "Media": media, "P5": ps[5], "P25": ps[25], "P75": ps[75], "P95": ps[95], "Calidad": fiabilidad})
-        return pd.DataFrame(resultados)
+        nivel_confianza = st.number_input("Nivel de confianza (%)", min_value=50, max_value=99, value=95, step=1)
+
+    N_MIN_VALIDO = informes.N_MIN_VALIDO
+    col_ic_mediana = f"IC {nivel_confianza}% Mediana"
+    col_ic_p95     = f"IC {nivel_confianza}% P95"
+
+    def intervalos_confianza(df_agrupado, col_agrupacion, col_valor, rename_col):
+        # Los IC bootstrap se guardan por (vista, tabla, nivel) para no recalcularlos en cada rerun
+        clave = (id(df_trans), rename_col, nivel_confianza)
+        cache_ic = st.session_state.ic_bootstrap
+        if clave not in cache_ic:
+            if any(k[0] != clave[0] for k in cache_ic): cache_ic.clear()
+            cache_ic[clave] = estadisticas.intervalos_bootstrap(df_agrupado, col_agrupacion, col_valor, nivel_confianza / 100, n_min=N_MIN_VALIDO)
+        return cache_ic[clave]
+
+    def texto_intervalo(inf, sup):
+        return "—" if pd.isna(inf) else f"{formato_latino(inf)} – {formato_latino(sup)}{sufijo}"
+
+    def calcular_estadisticas(df_agrupado, col_agrupacion, col_valor, rename_col, sketch=None):
+        sketch = sketch if modo_sketch else None
+        ic = None if sketch is not None else intervalos_confianza(df_agrupado, col_agrupacion, col_valor, rename_col)
+        stats = informes.tabla_estadisticas(df_agrupado, col_agrupacion, col_valor, rename_col, sketch, ic, N_MIN_VALIDO)
+        columnas = [rename_col, "n", "Mediana", "Media", "P5", "P25", "P75", "P95"]
+        if ic is not None:
+            stats[col_ic_mediana] = [texto_intervalo(a, b) for a, b in zip(stats['IC_Mediana_Inf'], stats['IC_Mediana_Sup'])]
+            stats[col_ic_p95]     = [texto_intervalo(a, b) for a, b in zip(stats['IC_P95_Inf'], stats['IC_P95_Sup'])]
+            columnas += [col_ic_mediana, col_ic_p95]
+        return stats[columnas + ["Calidad"]]
 
     fmt_tabla = {
-        "Mediana": lambda x: formato_latino(x) + " d", "Media": lambda x: formato_latino(x) + " d",
-        "P5": lambda x: formato_latino(x) + " d", "P25": lambda x: formato_latino(x) + " d",
-        "P75": lambda x: formato_latino(x) + " d", "P95": lambda x: formato_latino(x) + " d",
+        "Mediana": lambda x: formato_latino(x) + sufijo, "Media": lambda x: formato_latino(x) + sufijo,
+        "P5": lambda x: formato_latino(x) + sufijo, "P25": lambda x: formato_latino(x) + sufijo,
+        "P75": lambda x: formato_latino(x) + sufijo, "P95": lambda x: formato_latino(x) + sufijo,
         "n": lambda x: formato_latino(x, 0),
     }
 
@@ -86,13 +101,18 @@ def render():
     st.markdown("#### Tiempos totales por variante de proceso")
     st.caption(f"Duración total por caso, agrupada por variante. Solo variantes con ≥ {N_MIN_VALIDO} casos.")
 
-    stats_var = calcular_estadisticas(df_var, 'Nombre_Variante', 'Duracion_Total', 'Variante')
+    grupos = informes.grupos_estadisticas(df_trans, df_var)
+    stats_var = calcular_estadisticas(*grupos['variante'], sketches.get('variante'))
+    if modo_sketch:
+        # El sketch de variantes está indexado por ruta para poder combinar logs distintos
+        variante_por_ruta = {ruta: var for var, ruta in procesamiento.rutas_por_variante(df_var).items()}
+        stats_var['Variante'] = stats_var['Variante'].map(variante_por_ruta)
     stats_var_validas = stats_var[stats_var['n'] >= N_MIN_VALIDO].sort_values('n', ascending=False)
     if (n_excl := len(stats_var) - len(stats_var_validas)) > 0:
         st.caption(f"ℹ {n_excl} variante(s) excluida(s) por tener menos de {N_MIN_VALIDO} casos.")
 
     if not stats_var_validas.empty:
-        diccionario_rutas_t2 = df_var.set_index('Nombre_Variante')['Ruta'].to_dict()
+        diccionario_rutas_t2 = procesamiento.rutas_por_variante(df_var)
         dict_cal_v = stats_var_validas.set_index('Variante')['Calidad'].to_dict()
         stats_var_validas['Variante'] = stats_var_validas['Variante'].apply(
             lambda v: f'<span title="Ruta: {diccionario_rutas_t2.get(v,"")} — {dict_cal_v.get(v,"")}" style="cursor:help;border-bottom:1px dotted {P_CORAL};color:{P_CORAL};">{v}</span>' if str(dict_cal_v.get(v, "")).startswith("⚠") else f'<span title="Ruta: {diccionario_rutas_t2.get(v,"")}" style="cursor:help;border-bottom:1px dotted #aaa;">{v}</span>'
@@ -107,8 +127,8 @@ def render():
     if st.button("▼ Tiempos por etapa" if st.session_state.exp_etapa else "▶ Tiempos por etapa", use_container_width=True):
         st.session_state.exp_etapa = not st.session_state.exp_etapa; st.rerun()
     if st.session_state.exp_etapa:
-        st.caption("Días de permanencia en cada etapa.")
-        stats_etapas = calcular_estadisticas(df_trans[(df_trans['Origen'] != 'Inicio proceso') & (df_trans['Destino'] != 'Fin proceso')], 'Origen', 'Duracion', 'Etapa')
+        st.caption(f"Tiempo de permanencia en cada etapa ({unidades.UNIDADES[vista['unidad']]['nombre']}).")
+        stats_etapas = calcular_estadisticas(*grupos['etapa'], sketches.get('etapa'))
         if not stats_etapas.empty: render_tabla_con_calidad(stats_etapas, 'Etapa')
         else: st.info("Sin datos de etapas.")
 
@@ -116,7 +136,7 @@ def render():
         st.session_state.exp_rec = not st.session_state.exp_rec; st.rerun()
     if st.session_state.exp_rec:
         st.caption("Tiempo promedio que cada recurso demora en completar las etapas asignadas.")
-        stats_rec = calcular_estadisticas(df_trans[df_trans['Recurso_Origen'] != 'Sistema'], 'Recurso_Origen', 'Duracion', 'Recurso')
+        stats_rec = calcular_estadisticas(*grupos['recurso'], sketches.get('recurso'))
         if not stats_rec.empty: render_tabla_con_calidad(stats_rec, 'Recurso')
         else: st.info("No se encontraron recursos.")
 
@@ -132,5 +152,7 @@ def render():
             • <b>P5 / P25 / P75 / P95</b>: percentiles empíricos calculados de los datos históricos.<br>
             • <b>Detección de atípicos</b>: método IQR (1,5 × rango intercuartílico).<br>
             • <b>Umbral mínimo</b>: grupos con menos de {N_MIN_VALIDO} casos se excluyen o marcan como poco fiables.<br>
+            • <b>Intervalos de confianza</b>: bootstrap percentil ({estadisticas.N_REPLICAS} réplicas, semilla fija) para la mediana y el P95 al {nivel_confianza}%; "—" si el grupo tiene menos de {N_MIN_VALIDO} casos, si se agotó el tiempo de cálculo o en modo aproximado.<br>
+            • <b>Modo aproximado</b>: cada percentil tiene error relativo ≤ {formato_latino(estadisticas.ALFA_SKETCH * 100, 0)}% (sketch logarítmico mergeable); la media y n son exactas y el conteo de atípicos es estimado.<br>
             </div>
         """, unsafe_allow_html=True)
\ No newline at end of file
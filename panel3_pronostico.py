@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import streamlit.components.v1 as components
 
+import informes
+import prediccion
+import unidades
+
 # ==========================================
 # PALETA
 # ==========================================
@@ -19,74 +22,32 @@ def formato_latino(numero, decimales=1):
     return formateado.replace(',', 'X').replace('.', ',').replace('X', '.')
 
 def render():
-    df_var = st.session_state.df_variantes
+    vista  = st.session_state.vista
+    df_var = vista['df_variantes']
+    unidad = unidades.UNIDADES[vista['unidad']]
+    nombre, sufijo = unidad['nombre'], unidad['sufijo']
 
     st.subheader("Pronóstico por variante de proceso")
     st.caption("Estimaciones basadas en el historial de casos. Haz clic en una tarjeta para ver el detalle.")
 
-    def emp_percentil(valores, p):
-        sorted_v = np.sort(valores)
-        idx = (p / 100) * (len(sorted_v) - 1)
-        lo, hi = int(np.floor(idx)), int(np.ceil(idx))
-        return sorted_v[lo] + (sorted_v[hi] - sorted_v[lo]) * (idx - lo)
-
-    def lognormal_fit_ok(valores):
-        if len(valores) < 8: return False
-        logs = np.log(np.maximum(0.01, valores))
-        s2 = logs.std()
-        return False if s2 == 0 else (np.abs(((logs - logs.mean()) ** 3).mean() / s2 ** 3) < 1.5)
-
-    def calcular_stats_pronostico(valores):
-        n = len(valores)
-        advertencia = None
-        if n >= 100:
-            metodo = "empirico"
-            nota_metodo = f"Percentiles empíricos (n={n}). Muestra amplia."
-            ps = {p: emp_percentil(valores, p) for p in [10, 25, 50, 75, 90]}
-        elif n >= 30 and lognormal_fit_ok(valores):
-            metodo = "lognormal"
-            logs = np.log(np.maximum(0.01, valores))
-            mu, sigma = logs.mean(), logs.std(ddof=1)
-            from scipy.stats import norm as _norm
-            ps = {p: np.exp(mu + sigma * _norm.ppf(p / 100)) for p in [10, 25, 50, 75, 90]}
-            nota_metodo = f"Lognormal MLE (n={n}). Ajuste satisfactorio."
-        else:
-            metodo = "empirico"
-            nota_metodo = f"Percentiles empíricos (n={n})."
-            advertencia = "Muestra insuficiente o ajuste no satisfactorio."
-            ps = {p: emp_percentil(valores, p) for p in [10, 25, 50, 75, 90]}
-
-        if advertencia: nota_metodo += " — " + advertencia
-        return {'n': n, 'metodo': metodo, 'nota_metodo': nota_metodo, 'p10': round(ps[10]), 'p25': round(ps[25]), 'p50': round(ps[50]), 'p75': round(ps[75]), 'p90': round(ps[90])}
-
-    N_MIN_PRON = 10
-    variantes_stats = []
-    diccionario_rutas_pron = df_var.set_index('Nombre_Variante')['Ruta'].to_dict()
-    total_casos_pron = len(df_var)
-
-    for var_nombre, grp in df_var.groupby('Nombre_Variante'):
-        vals = grp['Duracion_Total'].dropna().values
-        if len(vals) < N_MIN_PRON: continue
-        st_v = calcular_stats_pronostico(vals)
-        st_v.update({'variante': var_nombre, 'ruta': diccionario_rutas_pron.get(var_nombre, ''), 'casos': len(vals), 'pct': (len(vals) / total_casos_pron) * 100})
-        variantes_stats.append(st_v)
-
-    variantes_stats.sort(key=lambda x: x['casos'], reverse=True)
-
-    if (n_excl_pron := sum(1 for _, g in df_var.groupby('Nombre_Variante') if len(g['Duracion_Total'].dropna()) < N_MIN_PRON)) > 0:
-        st.caption(f"ℹ {n_excl_pron} variante(s) excluida(s) por tener menos de {N_MIN_PRON} casos.")
+    # Modo aproximado (pestaña Estadísticas): percentiles de variantes grandes desde el sketch por ruta
+    ps_sketch = None
+    if st.session_state.modo_sketch and vista['sketches']:
+        ps_sketch = informes.percentiles_sketch_variantes(vista['sketches']['variante'])
+
+    # Días hábiles: la jornada del turno, así el riesgo no cambia con la unidad elegida
+    segundos_unidad = unidades.segundos_por_unidad(vista['unidad'], vista['calendario'])
+    variantes_stats, n_excl_pron = informes.pronostico_variantes(df_var, ps_sketch, segundos_unidad)
+    if n_excl_pron > 0:
+        st.caption(f"ℹ {n_excl_pron} variante(s) excluida(s) por tener menos de {informes.N_MIN_PRON} casos.")
 
     if not variantes_stats:
-        st.info(f"No hay variantes con al menos {N_MIN_PRON} casos.")
+        st.info(f"No hay variantes con al menos {informes.N_MIN_PRON} casos.")
+        render_en_curso(vista)
         return
 
-    max_dias_pron = max(v['p90'] for v in variantes_stats) * 1.10
-
-    def riesgo_variante(st_v):
-        cv = ((st_v['p90'] - st_v['p10']) / st_v['p50'] if st_v['p50'] > 0 else 99)
-        if st_v['p50'] <= 10 and cv < 1.2: return "bajo"
-        if st_v['p50'] <= 20 and cv < 1.8: return "medio"
-        return "alto"
+    # Escala común de las barras (todas las variantes pueden tener P90 = 0)
+    max_pron = max(v['p90'] for v in variantes_stats) * 1.10 or 1
 
     RIESGO_CFG = {
         "bajo":  {"label": "Predecible",        "border": P_TEAL,   "text": "#1a6b5a", "text_dark": P_MINT},
@@ -96,11 +57,11 @@ def render():
 
     cards_inner = ""
     for i_v, st_v in enumerate(variantes_stats):
-        cfg, var = RIESGO_CFG[riesgo_variante(st_v)], st_v['variante']
+        cfg, var = RIESGO_CFG[st_v['riesgo']], st_v['variante']
         p10, p25, p50, p75, p90 = st_v['p10'], st_v['p25'], st_v['p50'], st_v['p75'], st_v['p90']
         cid = f"card_{i_v}"
 
-        pb10, pb25, pb50, pb75, pb90 = [min(100, (px / max_dias_pron) * 100) for px in (p10, p25, p50, p75, p90)]
+        pb10, pb25, pb50, pb75, pb90 = [min(100, (px / max_pron) * 100) for px in (p10, p25, p50, p75, p90)]
         
         # Aplicamos P_TEAL_STRONG a la barra del 50% y colores correspondientes a las viñetas narrativas
         cards_inner += f"""
@@ -118,7 +79,7 @@ def render():
                 </div>
                 <div style="display:flex;align-items:flex-start;gap:8px;flex-shrink:0;">
                     <div style="text-align:right;">
-                        <div class="median-num" style="color:{cfg['border']};">{p50}<span style="font-size:13px;color:inherit;opacity:0.7;"> d&#237;as</span></div>
+                        <div class="median-num" style="color:{cfg['border']};">{p50}<span style="font-size:13px;color:inherit;opacity:0.7;"> {nombre}</span></div>
                         <div class="median-label">duraci&#243;n t&#237;pica</div>
                     </div>
                     <div class="chevron">&#9660;</div>
@@ -129,23 +90,23 @@ def render():
                 <div style="position:absolute;top:20px;left:{pb10:.1f}%;width:{max(0, pb90 - pb10):.1f}%;height:8px;background:{P_MINT};border-radius:4px;"></div>
                 <div style="position:absolute;top:20px;left:{pb25:.1f}%;width:{max(0, pb75 - pb25):.1f}%;height:8px;background:{P_TEAL_STRONG};border-radius:4px;"></div>
                 <div style="position:absolute;top:16px;left:{pb50:.1f}%;transform:translateX(-50%);width:3px;height:16px;background:#1a6b5a;border-radius:2px;"></div>
-                <div class="b-mediana" style="left:{pb50:.1f}%;">{p50}d</div>
+                <div class="b-mediana" style="left:{pb50:.1f}%;">{p50}{sufijo}</div>
             </div>
             <div class="b-labels">
-                <span>P10: {p10}d</span>
+                <span>P10: {p10}{sufijo}</span>
                 <span class="leyenda-inline">
-                    <b style="color:{P_TEAL_STRONG};">&#9632;</b> 50% entre {p25}&#8211;{p75}d &nbsp;
-                    <b style="color:{P_MINT};">&#9632;</b> 80% entre {p10}&#8211;{p90}d
+                    <b style="color:{P_TEAL_STRONG};">&#9632;</b> 50% entre {p25}&#8211;{p75}{sufijo} &nbsp;
+                    <b style="color:{P_MINT};">&#9632;</b> 80% entre {p10}&#8211;{p90}{sufijo}
                 </span>
-                <span>P90: {p90}d</span>
+                <span>P90: {p90}{sufijo}</span>
             </div>
             <div class="detail" onclick="event.stopPropagation()">
                 <hr class="divisor">
                 <div class="narrativa-titulo">Estimaci&#243;n para un caso futuro de este tipo</div>
                 <div class="narrativa">
-                    <div><span class="dot" style="background:{P_TEAL_STRONG};"></span><b>En la mitad de los casos</b>, el proceso se resuelve en <b>{p50} d&#237;as o menos</b>.</div>
-                    <div><span class="dot" style="background:{P_MINT};"></span><b>8 de cada 10 casos</b> se resuelven entre <b>{p10} y {p90} d&#237;as</b>.</div>
-                    <div><span class="dot" style="background:{P_CORAL};"></span><b>1 de cada 10 casos</b> supera los <b style="color:{P_CORAL};">{p90} d&#237;as</b>.</div>
+                    <div><span class="dot" style="background:{P_TEAL_STRONG};"></span><b>En la mitad de los casos</b>, el proceso se resuelve en <b>{p50} {nombre} o menos</b>.</div>
+                    <div><span class="dot" style="background:{P_MINT};"></span><b>8 de cada 10 casos</b> se resuelven entre <b>{p10} y {p90} {nombre}</b>.</div>
+                    <div><span class="dot" style="background:{P_CORAL};"></span><b>1 de cada 10 casos</b> supera los <b style="color:{P_CORAL};">{p90} {nombre}</b>.</div>
                 </div>
                 <div class="nota-wrap">
                     <span class="nota-label">Nota metodol&#243;gica</span>
@@ -237,4 +198,55 @@ def render():
     </script>
     </body></html>"""
 
-    components.html(all_cards_html, height=len(variantes_stats) * 135 + 60, scrolling=True)
\ No newline at end of file
+    components.html(all_cards_html, height=len(variantes_stats) * 135 + 60, scrolling=True)
+
+    render_en_curso(vista)
+
+
+# ==========================================
+# CASOS EN CURSO (TIEMPO RESTANTE)
+# ==========================================
+MAX_FILAS_EN_CURSO = 500
+
+def render_en_curso(vista):
+    st.markdown("#### Casos en curso")
+    st.caption("Tiempo restante estimado para casos abiertos a partir de la ruta que llevan hasta ahora. "
+               "Sube sus eventos con el mismo formato del log.")
+    archivo = st.file_uploader("Eventos de casos en curso", type=['csv'], key="archivo_en_curso", label_visibility="collapsed")
+    if archivo is None: return
+
+    try:
+        eventos, omitidas = prediccion.leer_casos_en_curso(archivo.getvalue())
+    except Exception as e:
+        st.error(f"No se pudo leer el archivo: {e}")
+        return
+    # Índice de prefijos armado al cargar el log (vista: ya en la unidad elegida)
+    restante = prediccion.predecir_restante(vista['prefijos'], eventos,
+                                            unidad=vista['unidad'], calendario=vista['calendario'])
+    if restante.empty:
+        st.info("El archivo no tiene eventos válidos.")
+        return
+
+    unidad = unidades.UNIDADES[vista['unidad']]
+    sin_ref = int(restante['P50'].isna().sum())
+    corte = pd.Series(restante['Ultima_Fecha']).max()
+    st.caption(f"{formato_latino(len(restante), 0)} casos · fecha de corte {corte:%d-%m-%Y %H:%M} · "
+               f"restante en {unidad['nombre']}, descontado el tiempo transcurrido desde la última etapa reconocida"
+               + (f" · {sin_ref} sin historial suficiente (≥ {prediccion.N_MIN_NODO} casos)" if sin_ref else "")
+               + (f" · {omitidas} fila(s) omitida(s)" if omitidas else ""))
+
+    tabla = restante.sort_values('P90', ascending=False, na_position='last').head(MAX_FILAS_EN_CURSO)
+    sufijo = " " + unidad['sufijo']
+    tabla = pd.DataFrame({
+        'ID Caso':         tabla['ID'],
+        'Última etapa':    tabla['Ultimo_Estado'],
+        'Último evento':   tabla['Ultima_Fecha'].dt.strftime('%d-%m-%Y').fillna('—'),
+        'Etapas':          tabla['Eventos'],
+        'Referencia':      [f"{c}/{e} etapas · {formato_latino(n, 0)} casos" if c > 0 else "—"
+                            for c, e, n in zip(tabla['Eventos_Coincidentes'], tabla['Eventos'], tabla['Casos_Referencia'])],
+        **{f'Restante P{p}': tabla[f'P{p}'].map(lambda x: "—" if pd.isna(x) else formato_latino(x) + sufijo)
+           for p in prediccion.PERCENTILES_RESTANTE},
+    })
+    st.dataframe(tabla, hide_index=True, use_container_width=True)
+    st.download_button("Descargar predicciones (CSV)", restante.to_csv(index=False).encode('utf-8'),
+                       file_name="tiempo_restante.csv", mime="text/csv")
@@ -0,0 +1,348 @@
+import contextlib
+import math
+import os
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+import estadisticas
+import formatos_log
+import grafo
+import ingesta
+import procesamiento
+from procesamiento import INICIO, FIN, COLUMNAS_TRANSICIONES
+
+# ==========================================
+# LECTURA POR PARTICIONES (LOGS MAYORES QUE LA MEMORIA)
+# ==========================================
+# El log se lee de a bloques de filas y cada evento se escribe en una partición en
+# disco según el hash de su ID: todos los eventos de un caso caen en la misma. Cada
+# partición se ordena y se convierte a transiciones por separado, con los catálogos de
+# estados y recursos de todo el log (reunidos al particionar), y deja solo agregados
+# compactos: transiciones en códigos, hash de ruta y texto por variante, sketches.
+# Al final los casos se intercalan en orden de ID y las variantes se numeran igual
+# que en procesar_archivos. El presupuesto acota la lectura (bloque y partición más
+# grande); lo único que crece con el log es el modelo final: códigos e índice DFG.
+PRESUPUESTO_MB   = float(os.environ.get('MONITOR_PRESUPUESTO_MB', 1024))
+DIR_TEMPORAL     = os.environ.get('MONITOR_DIR_TEMPORAL')     # por defecto, el temporal del sistema
+FACTOR_MEMORIA   = 18       # bytes de memoria por byte de CSV al procesarlo de una vez (medido)
+FILAS_BLOQUE_MIN = 10_000
+
+# Las particiones son independientes: con varios núcleos se procesan en un pool. Cada
+# proceso deja sus arreglos en bloques de memoria compartida y solo devuelve sus
+# nombres; la unión no depende del reparto, así que el modelo es el mismo que en serie.
+MAX_PROCESOS         = int(os.environ.get('MONITOR_PARTICIONES_PROCESOS', min(4, os.cpu_count() or 1)))
+MIN_BYTES_PARALELO   = 8 * 1024 ** 2   # logs en memoria más chicos se procesan en serie
+
+_pool = None
+
+
+def _pool_particiones():
+    global _pool
+    if _pool is None:
+        # Los procesos heredan el registro de bloques compartidos del principal: así
+        # un bloque creado en el pool y liberado aquí no figura como perdido al salir
+        resource_tracker.ensure_running()
+        _pool = ProcessPoolExecutor(max_workers=MAX_PROCESOS)
+    return _pool
+
+
+def tamano_archivo(archivo):
+    if isinstance(archivo, (str, os.PathLike)): return os.path.getsize(archivo)
+    archivo.seek(0, os.SEEK_END)
+    tam = archivo.tell()
+    archivo.seek(0)
+    return tam
+
+
+def n_particiones(tam_bytes, presupuesto_mb=PRESUPUESTO_MB, procesos=1):
+    # Las particiones en curso (una por proceso) usan a lo sumo la mitad del presupuesto;
+    # la otra mitad queda para el modelo que se va armando. 1 = el log entra entero.
+    return max(1, math.ceil(tam_bytes * FACTOR_MEMORIA / (presupuesto_mb * 1024 ** 2 / 2 / procesos)))
+
+
+def filas_bloque(largo_linea, presupuesto_mb=PRESUPUESTO_MB):
+    # Filas por bloque de lectura según el largo medio de una línea de CSV
+    return max(FILAS_BLOQUE_MIN, int(presupuesto_mb * 1024 ** 2 / 2 / (FACTOR_MEMORIA * largo_linea)))
+
+
+def _dimensiones(archivo_log, presupuesto_mb, procesos):
+    # (n_particiones, filas_bloque); XES y OCEL se miden como su CSV equivalente
+    muestra = ingesta.leer_muestra(archivo_log)
+    formato = formatos_log.formato_log(muestra)
+    tam = tamano_archivo(archivo_log) / formatos_log.EXPANSION[formato]
+    largo_linea = (max(len(muestra) / max(muestra.count(b'\n'), 1), 1) if formato == 'csv'
+                   else formatos_log.LARGO_EVENTO)
+    return n_particiones(tam, presupuesto_mb, procesos), filas_bloque(largo_linea, presupuesto_mb)
+
+
+def usar_particiones(archivo_log, presupuesto_mb=PRESUPUESTO_MB):
+    # Van por particiones los logs que no entran en el presupuesto y los que no son CSV
+    return (formatos_log.formato_log(ingesta.leer_muestra(archivo_log)) != 'csv'
+            or _dimensiones(archivo_log, presupuesto_mb, 1)[0] > 1)
+
+
+# ==========================================
+# PRIMERA PASADA: BLOQUES -> PARTICIONES EN DISCO
+# ==========================================
+def particionar_log(archivo_log, carpeta, n_part, n_filas_bloque):
+    # Escribe cada bloque (fechas ya parseadas) repartido en n_part archivos de la
+    # carpeta y devuelve lo necesario para procesarlos con catálogos comunes.
+    huella = formatos_log.huella_log(ingesta.leer_muestra(archivo_log))
+    rutas = [os.path.join(carpeta, f"particion_{p:04d}.pkl") for p in range(n_part)]
+    estados, recursos, atributos = set(), set(), {}
+    col_responsable, fecha_min, fecha_max, omitidas = None, pd.NaT, pd.NaT, 0
+
+    with contextlib.ExitStack() as pila:
+        archivos = [pila.enter_context(open(r, 'wb')) for r in rutas]
+        for df, omitidas_bloque in formatos_log.leer_bloques(archivo_log, n_filas_bloque):
+            omitidas += omitidas_bloque
+            col_responsable = procesamiento.columna_responsable(df)
+            df = df[df['ID'].notna()]
+            if df.empty: continue
+
+            df = df.assign(FECHA_ESTADO=ingesta.parsear_fechas(df['FECHA_ESTADO'], huella))
+            fecha_min = min(fecha_min, df['FECHA_ESTADO'].min()) if pd.notna(fecha_min) else df['FECHA_ESTADO'].min()
+            fecha_max = max(fecha_max, df['FECHA_ESTADO'].max()) if pd.notna(fecha_max) else df['FECHA_ESTADO'].max()
+            estados.update(df['ESTADO'].dropna().unique())
+            if col_responsable: recursos.update(df[col_responsable].dropna().unique())
+            for c in procesamiento.columnas_atributo(df):
+                atributos.setdefault(c, set()).update(df[c].dropna().unique())
+
+            particion = pd.util.hash_pandas_object(df['ID'], index=False).to_numpy() % np.uint64(n_part)
+            for p, parte in df.groupby(particion, sort=False):
+                pickle.dump(parte, archivos[p], protocol=pickle.HIGHEST_PROTOCOL)
+
+    return {
+        'rutas':             rutas,
+        'col_responsable':   col_responsable,
+        'catalogo_estados':  procesamiento.catalogo(estados, {INICIO, FIN}),
+        'catalogo_recursos': procesamiento.catalogo(recursos if col_responsable else {'Desconocido'}, {'Sistema'}),
+        'catalogos_atributos': {c: procesamiento.catalogo(v) for c, v in atributos.items()},
+        'fechas':            (fecha_min, fecha_max),
+        'filas_omitidas':    omitidas,
+    }
+
+
+# ==========================================
+# SEGUNDA PASADA: UNA PARTICIÓN -> AGREGADOS
+# ==========================================
+def procesar_particion(ruta, col_responsable, catalogo_estados, catalogo_recursos, catalogos_atributos=None):
+    # Agregados de los casos de una partición en disco (None si está vacía)
+    piezas = []
+    with open(ruta, 'rb') as f:
+        while True:
+            try: piezas.append(pickle.load(f))
+            except EOFError: break
+    if not piezas: return None
+    df = pd.concat(piezas, ignore_index=True)
+    del piezas
+    return procesar_eventos(df, col_responsable, catalogo_estados, catalogo_recursos, catalogos_atributos)
+
+
+def procesar_eventos(df, col_responsable, catalogo_estados, catalogo_recursos, catalogos_atributos=None):
+    # Transiciones, hashes y sketches de un conjunto de casos completos
+    trans = procesamiento.construir_transiciones(df, col_responsable, catalogo_estados, catalogo_recursos,
+                                                 catalogos_atributos)
+    del df
+    rutas = procesamiento.hash_rutas(trans)
+    trans, var = procesamiento.construir_variantes(trans, rutas)
+
+    inicios = rutas['inicios']
+    unicos, rep = np.unique(rutas['hash'], axis=0, return_index=True)
+    textos = dict(zip(map(tuple, unicos.tolist()), var['Ruta'].astype(str).to_numpy()[rep]))
+    # Columnas como arreglos (categóricas: solo los códigos del catálogo común)
+    columnas = {c: (trans[c].cat.codes if isinstance(trans[c].dtype, pd.CategoricalDtype) else trans[c]).to_numpy()
+                for c in COLUMNAS_TRANSICIONES[1:] + procesamiento.columnas_atributo(trans)}
+    return {
+        'ids':          trans['ID'].to_numpy()[inicios],
+        'largos':       np.diff(np.r_[inicios, len(trans)]),
+        'hash':         rutas['hash'],
+        'transiciones': columnas,
+        'textos':       textos,
+        'sketches':     estadisticas.sketches_modelo(trans, var),
+    }
+
+
+# ==========================================
+# RESULTADOS EN MEMORIA COMPARTIDA
+# ==========================================
+def _a_memoria_compartida(parte):
+    # En el proceso del pool: los arreglos numéricos pasan a bloques compartidos y la
+    # parte solo lleva (nombre, tipo, forma); los ID, textos y sketches van serializados
+    if parte is None: return None
+    arreglos = {'largos': parte['largos'], 'hash': parte['hash'],
+                **{f"transiciones.{c}": a for c, a in parte['transiciones'].items()}}
+    bloques = {}
+    for clave, arreglo in arreglos.items():
+        shm = shared_memory.SharedMemory(create=True, size=max(arreglo.nbytes, 1))
+        np.ndarray(arreglo.shape, arreglo.dtype, buffer=shm.buf)[...] = arreglo
+        bloques[clave] = (shm.name, arreglo.dtype.str, arreglo.shape)
+        shm.close()
+    return {'ids': parte['ids'], 'textos': parte['textos'], 'sketches': parte['sketches'], 'bloques': bloques}
+
+
+def _de_memoria_compartida(parte):
+    # En el proceso principal: copia cada bloque a un arreglo propio y lo libera
+    if parte is None: return None
+    arreglos = {}
+    for clave, (nombre, tipo, forma) in parte.pop('bloques').items():
+        shm = shared_memory.SharedMemory(name=nombre)
+        arreglos[clave] = np.ndarray(forma, np.dtype(tipo), buffer=shm.buf).copy()
+        shm.close()
+        shm.unlink()
+    return {**parte, 'largos': arreglos.pop('largos'), 'hash': arreglos.pop('hash'),
+            'transiciones': {c.split('.', 1)[1]: a for c, a in arreglos.items()}}
+
+
+def _tarea_particion(ruta, *catalogos):
+    return _a_memoria_compartida(procesar_particion(ruta, *catalogos))
+
+
+def _tarea_eventos(df, *catalogos):
+    return _a_memoria_compartida(procesar_eventos(df, *catalogos))
+
+
+def _mapear(tarea, directa, entradas, argumentos, procesos):
+    # Resultados en el orden de `entradas`; en serie si hay un solo proceso
+    if procesos <= 1 or len(entradas) <= 1:
+        for entrada in entradas:
+            yield directa(entrada, *argumentos)
+        return
+    futuros = [_pool_particiones().submit(tarea, entrada, *argumentos) for entrada in entradas]
+    recibidos = 0
+    try:
+        for futuro in futuros:
+            parte = _de_memoria_compartida(futuro.result())
+            recibidos += 1
+            yield parte
+    finally:
+        # Si se interrumpe (error o generador cerrado) se liberan los bloques pendientes
+        for futuro in futuros[recibidos:]:
+            if not futuro.cancel() and futuro.exception() is None:
+                _de_memoria_compartida(futuro.result())
+
+
+# ==========================================
+# UNIÓN DE PARTICIONES
+# ==========================================
+def _ids_tipados(ids):
+    # Las particiones leen el ID como texto; si todos son números se usa el mismo tipo
+    # (y el mismo orden) que infiere la lectura completa del log
+    try:
+        return pd.to_numeric(ids)
+    except (ValueError, TypeError):
+        return ids
+
+
+def _columna(partes, col, filas):
+    # Columna final en orden de ID; se suelta de cada partición a medida que se arma
+    return np.concatenate([p['transiciones'].pop(col) for p in partes])[filas]
+
+
+def unir_particiones(partes, catalogo_estados, catalogo_recursos, catalogos_atributos=None):
+    # (df_transiciones, df_variantes, hash_casos, inicios_casos, sketches) con los casos
+    # de todas las particiones en orden de ID
+    partes = [p for p in partes if p is not None]
+    if not partes:
+        vacio = pd.DataFrame({c: pd.Series(dtype=object) for c in ['ID', 'ESTADO', 'FECHA_ESTADO']})
+        df_trans, df_var = procesamiento.construir_variantes(procesamiento.construir_transiciones(vacio))
+        return (df_trans, df_var, np.zeros((0, 2), dtype=np.uint64), np.zeros(0, dtype=np.int64),
+                estadisticas.sketches_modelo(df_trans, df_var))
+
+    ids = _ids_tipados(np.concatenate([p['ids'] for p in partes]))
+    largos = np.concatenate([p['largos'] for p in partes])
+    orden = np.argsort(ids, kind='stable')
+    inicios_concat = np.r_[0, np.cumsum(largos)[:-1]]
+    filas = procesamiento.rangos(inicios_concat[orden], largos[orden])
+
+    largos = largos[orden]
+    df_trans = pd.DataFrame({
+        'ID':             np.repeat(ids[orden], largos),
+        'Origen':         pd.Categorical.from_codes(_columna(partes, 'Origen', filas), catalogo_estados),
+        'Destino':        pd.Categorical.from_codes(_columna(partes, 'Destino', filas), catalogo_estados),
+        'Fecha_Inicio':   _columna(partes, 'Fecha_Inicio', filas),
+        'Duracion':       _columna(partes, 'Duracion', filas),
+        'Recurso_Origen': pd.Categorical.from_codes(_columna(partes, 'Recurso_Origen', filas), catalogo_recursos),
+        **{c: pd.Categorical.from_codes(_columna(partes, c, filas), cat) for c, cat in (catalogos_atributos or {}).items()},
+    })
+    del filas
+
+    inicios = np.r_[0, np.cumsum(largos)[:-1]].astype(np.int64)
+    rutas = {'inicios': inicios, 'caso': np.repeat(np.arange(len(largos)), largos),
+             'hash': np.concatenate([p['hash'] for p in partes])[orden]}
+    textos = {}
+    for p in partes: textos.update(p['textos'])
+    df_trans, df_var = procesamiento.construir_variantes(df_trans, rutas, textos)
+
+    sketches = {k: estadisticas.combinar_sketches(p['sketches'][k] for p in partes) for k in partes[0]['sketches']}
+    return df_trans, df_var, rutas['hash'], inicios, sketches
+
+
+# ==========================================
+# MODELO COMPLETO
+# ==========================================
+def _modelo(partes, catalogos, df_est, fechas, omitidas):
+    df_trans, df_var, hash_casos, inicios_casos, sketches = unir_particiones(partes, *catalogos)
+    dict_orden, tiene_est_orden = procesamiento.orden_estados(df_est)
+    return {
+        'df_transiciones': df_trans,
+        'df_variantes':    df_var,
+        'hash_casos':      hash_casos,
+        'inicios_casos':   inicios_casos,
+        'dfg':             grafo.construir_indice_dfg(df_trans),
+        'prefijos':        procesamiento.indice_prefijos(df_trans),
+        'sketches':        sketches,
+        'dict_orden':      dict_orden,
+        'orden_estados':   procesamiento.orden_por_codigo(dict_orden, df_trans['Origen'].cat.categories),
+        'periodo_fechas':  procesamiento.texto_periodo(fechas),
+        'tiene_est_orden': tiene_est_orden,
+        'filas_omitidas':  omitidas,
+    }
+
+
+def procesar_en_particiones(archivo_log, bytes_est, presupuesto_mb=PRESUPUESTO_MB):
+    # Mismo modelo que procesamiento.procesar_archivos, leyendo el log (ruta o archivo
+    # binario; CSV, XES u OCEL) de a bloques y procesándolo por particiones en disco
+    df_est, omitidas_est = ingesta.leer_estados(bytes_est)
+    n_part, n_filas_bloque = _dimensiones(archivo_log, presupuesto_mb, MAX_PROCESOS)
+    with tempfile.TemporaryDirectory(prefix='monitor_', dir=DIR_TEMPORAL) as carpeta:
+        lectura = particionar_log(archivo_log, carpeta, n_part, n_filas_bloque)
+        catalogos = (lectura['catalogo_estados'], lectura['catalogo_recursos'], lectura['catalogos_atributos'])
+        partes = []
+        for ruta, parte in zip(lectura['rutas'], _mapear(_tarea_particion, procesar_particion, lectura['rutas'],
+                                                          (lectura['col_responsable'], *catalogos), MAX_PROCESOS)):
+            partes.append(parte)
+            os.remove(ruta)                      # el disco también se libera partición a partición
+
+    return _modelo(partes, catalogos, df_est, pd.Series(lectura['fechas']), lectura['filas_omitidas'] + omitidas_est)
+
+
+def procesar_en_paralelo(bytes_log, bytes_est):
+    # Mismo modelo que procesamiento.procesar_archivos (que se usa si hay un solo
+    # proceso o el log es chico): tras la lectura, los casos se reparten por hash de
+    # ID entre MAX_PROCESOS particiones en memoria que se procesan en el pool
+    if MAX_PROCESOS <= 1 or len(bytes_log) < MIN_BYTES_PARALELO:
+        return procesamiento.procesar_archivos(bytes_log, bytes_est)
+    df_log, omitidas_log = ingesta.leer_log(bytes_log)
+    df_est, omitidas_est = ingesta.leer_estados(bytes_est)
+
+    col_responsable = procesamiento.columna_responsable(df_log)
+    df_log = df_log[df_log['ID'].notna()]
+    df_log = df_log.assign(FECHA_ESTADO=ingesta.parsear_fechas(df_log['FECHA_ESTADO'], ingesta.huella_encabezado(bytes_log)))
+    recursos = df_log[col_responsable].dropna().unique() if col_responsable else ['Desconocido']
+    catalogos = (procesamiento.catalogo(df_log['ESTADO'].dropna().unique(), {INICIO, FIN}),
+                 procesamiento.catalogo(recursos, {'Sistema'}),
+                 {c: procesamiento.catalogo(df_log[c].dropna().unique()) for c in procesamiento.columnas_atributo(df_log)})
+
+    particion = pd.util.hash_pandas_object(df_log['ID'], index=False).to_numpy() % np.uint64(MAX_PROCESOS)
+    grupos = [parte for _, parte in df_log.groupby(particion, sort=False)]
+    fechas = df_log['FECHA_ESTADO']
+    del df_log
+    partes = list(_mapear(_tarea_eventos, procesar_eventos, grupos, (col_responsable, *catalogos), MAX_PROCESOS))
+    del grupos
+    return _modelo(partes, catalogos, df_est, fechas, omitidas_log + omitidas_est)
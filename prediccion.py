@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+import ingesta
+import procesamiento
+import unidades
+from procesamiento import FIN
+
+# ==========================================
+# TIEMPO RESTANTE DE CASOS EN CURSO
+# ==========================================
+# Usa el índice de prefijos del modelo (procesamiento.indice_prefijos, armado al cargar
+# el log y escalado a la unidad de la vista): cada prefijo de un caso abierto se busca
+# por su hash, todos a la vez. Un caso en curso usa su prefijo más largo con al menos
+# N_MIN_NODO casos; al tiempo restante se le descuenta lo ya transcurrido desde ese
+# evento hasta la fecha de corte.
+PERCENTILES_RESTANTE = procesamiento.PERCENTILES_PREFIJOS
+N_MIN_NODO           = 10
+COLUMNAS_RESTANTE    = ['ID', 'Eventos', 'Ultimo_Estado', 'Ultima_Fecha', 'Eventos_Coincidentes',
+                        'Casos_Referencia', 'Transcurrido'] + [f'P{p}' for p in PERCENTILES_RESTANTE]
+
+
+# ==========================================
+# PREDICCIÓN PARA CASOS EN CURSO
+# ==========================================
+def leer_casos_en_curso(bytes_log):
+    # Mismo formato que el log principal; devuelve (eventos ID/ESTADO/FECHA_ESTADO, filas omitidas)
+    df, omitidas = ingesta.leer_log(bytes_log)
+    df['FECHA_ESTADO'] = ingesta.parsear_fechas(df['FECHA_ESTADO'], ingesta.huella_encabezado(bytes_log))
+    return df[['ID', 'ESTADO', 'FECHA_ESTADO']], omitidas
+
+
+def predecir_restante(indice, eventos, corte=None, unidad=unidades.UNIDAD_DEFECTO, calendario=None,
+                      n_min=N_MIN_NODO):
+    # Una fila por caso abierto (COLUMNAS_RESTANTE); percentiles NaN si ni su primer
+    # estado tiene historial suficiente. `corte` por defecto: última fecha de `eventos`.
+    eventos = eventos[eventos['ID'].notna()].sort_values(['ID', 'FECHA_ESTADO'], kind='stable')
+    if eventos.empty:
+        return pd.DataFrame({c: pd.Series(dtype=object) for c in COLUMNAS_RESTANTE})
+
+    inicios, caso = procesamiento.bloques_casos(eventos['ID'].to_numpy())
+    codigos = indice['estados'].get_indexer(eventos['ESTADO'].astype(str))      # -1: estado sin historial
+    hashes = procesamiento.hash_prefijos(codigos, caso, inicios)
+    nodo = indice['claves'].get_indexer(pd.MultiIndex.from_arrays([hashes[:, 0], hashes[:, 1]]))
+    valido = nodo >= 0
+    valido[valido] = indice['n'][nodo[valido]] >= n_min
+
+    # Los prefijos válidos de un caso son contiguos desde su primer evento (un prefijo
+    # tiene al menos tantos casos como cualquiera de sus extensiones): basta el más largo
+    pos = np.arange(len(eventos)) - inicios[caso]
+    profundidad = np.maximum.reduceat(np.where(valido, pos, -1), inicios)
+    con_ref = profundidad >= 0
+    fila_ref = inicios + np.maximum(profundidad, 0)
+    nodo_ref = nodo[fila_ref[con_ref]]
+
+    fechas = eventos['FECHA_ESTADO'].to_numpy()
+    corte = pd.Timestamp(corte if corte is not None else pd.Series(fechas).max()).to_datetime64().astype('datetime64[s]')
+    transcurrido = unidades.duracion_en_unidad(fechas[fila_ref].astype('datetime64[s]'),
+                                               np.full(len(inicios), corte), unidad, calendario)
+    transcurrido = np.maximum(np.nan_to_num(transcurrido), 0)
+
+    finales = np.r_[inicios[1:], len(eventos)] - 1
+    resultado = pd.DataFrame({
+        'ID':                   eventos['ID'].to_numpy()[inicios],
+        'Eventos':              finales - inicios + 1,
+        'Ultimo_Estado':        eventos['ESTADO'].astype(str).to_numpy()[finales],
+        'Ultima_Fecha':         fechas[finales],
+        'Eventos_Coincidentes': profundidad + 1,
+        'Casos_Referencia':     0,
+        'Transcurrido':         transcurrido,
+    })
+    resultado.loc[con_ref, 'Casos_Referencia'] = indice['n'][nodo_ref]
+    for p in PERCENTILES_RESTANTE:
+        valores = np.full(len(inicios), np.nan)
+        valores[con_ref] = indice['percentiles'][p][nodo_ref]
+        resultado[f'P{p}'] = np.maximum(valores - transcurrido, 0)
+    return resultado
@@ -0,0 +1,387 @@
+import pandas as pd
+import numpy as np
+
+import estadisticas
+import grafo
+import ingesta
+
+# ==========================================
+# CONSTANTES DEL MODELO
+# ==========================================
+INICIO = 'Inicio proceso'
+FIN    = 'Fin proceso'
+COLUMNAS_TRANSICIONES = ['ID', 'Origen', 'Destino', 'Fecha_Inicio', 'Duracion', 'Recurso_Origen']
+COLUMNAS_VARIANTES    = ['ID', 'Ruta', 'Duracion_Total', 'Fecha_Inicio_Caso', 'Nombre_Variante', 'Ruta_Tooltip']
+VERSION_MODELO = 4     # sube al cambiar el contenido del modelo (2: duraciones en segundos, 3: orden_estados, 4: prefijos)
+PERCENTILES_PREFIJOS = (10, 50, 90)     # tiempo restante desde cada prefijo de ruta
+
+# Hash polinomial doble (módulo 2^64) para identificar secuencias de estados
+BASES_HASH = (np.uint64(0x100000001B3), np.uint64(0x9E3779B97F4A7C15))
+MEZCLA_LARGO = np.uint64(0xC2B2AE3D27D4EB4F)
+
+
+# ==========================================
+# CONSTRUCCIÓN VECTORIZADA DE TRANSICIONES
+# ==========================================
+def catalogo(valores, extra=()):
+    # Catálogo ordenado de una columna categórica del modelo
+    return pd.Index(sorted(set(valores) | set(extra), key=str))
+
+
+def en_catalogo(categorico, cat):
+    # Códigos de un Categorical traducidos a otro catálogo (-1 = sin valor)
+    return np.where(categorico.codes >= 0, cat.get_indexer(categorico.categories)[categorico.codes], -1)
+
+
+def columnas_atributo(df):
+    # Atributos adicionales del mapeo de columnas (ver ingesta.ALIAS_COLUMNAS)
+    return [c for c in df.columns if c.startswith(ingesta.PREFIJO_ATRIBUTO)]
+
+
+def construir_transiciones(df, col_responsable=None, catalogo_estados=None, catalogo_recursos=None,
+                           catalogos_atributos=None):
+    # df: eventos con ID, ESTADO, FECHA_ESTADO (y opcionalmente el recurso).
+    # Origen/Destino comparten un catálogo de estados y Recurso_Origen tiene el suyo:
+    # columnas categóricas (códigos enteros + tabla de búsqueda) en vez de strings.
+    # Los catálogos se pueden fijar de antemano (deben incluir los bordes y 'Sistema')
+    # para que partes distintas de un log compartan los códigos. Los atributos
+    # adicionales (Atr_*) se copian del evento de origen, también como categóricas.
+    # Cada caso de m eventos produce m + 1 transiciones:
+    #   Inicio proceso -> e1 -> ... -> em -> Fin proceso
+    # Se arma una secuencia "extendida" de largo n + 2k (k casos) con los bordes
+    # insertados por aritmética de índices; Origen descarta las posiciones de
+    # "Fin" y Destino las de "Inicio", quedando ambas alineadas (n + k filas).
+    df = df[df['ID'].notna()].sort_values(['ID', 'FECHA_ESTADO'])
+    n = len(df)
+    if n == 0:
+        return pd.DataFrame({c: pd.Series(dtype=object) for c in COLUMNAS_TRANSICIONES + columnas_atributo(df)})
+
+    ids = df['ID'].to_numpy()
+    inicio_bloque = np.r_[True, ids[1:] != ids[:-1]]
+    caso = np.cumsum(inicio_bloque) - 1                 # nº de caso de cada evento
+    inicios = np.flatnonzero(inicio_bloque)             # primer evento de cada caso
+    finales = np.r_[inicios[1:], n]                     # fin (exclusivo) de cada caso
+    k = len(inicios)
+
+    pos_evento = np.arange(n) + 2 * caso + 1
+    pos_inicio = inicios + 2 * np.arange(k)
+    pos_fin    = finales + 2 * np.arange(k) + 1
+    largo_ext  = n + 2 * k
+
+    # Estados (códigos enteros sobre un catálogo ordenado que incluye los bordes)
+    estados = pd.Categorical(df['ESTADO'])
+    if catalogo_estados is None:
+        catalogo_estados = catalogo(estados.categories, {INICIO, FIN})
+    estados_ext = np.empty(largo_ext, dtype=np.int32)
+    estados_ext[pos_evento] = en_catalogo(estados, catalogo_estados)
+    estados_ext[pos_inicio] = catalogo_estados.get_loc(INICIO)
+    estados_ext[pos_fin]    = catalogo_estados.get_loc(FIN)
+
+    # Fechas (los bordes toman el mínimo / máximo válido del caso)
+    fechas = df['FECHA_ESTADO']
+    extremos = fechas.groupby(caso).agg(['min', 'max'])
+    fechas_ext = np.empty(largo_ext, dtype=fechas.dtype)
+    fechas_ext[pos_evento] = fechas.to_numpy()
+    fechas_ext[pos_inicio] = extremos['min'].to_numpy()
+    fechas_ext[pos_fin]    = extremos['max'].to_numpy()
+
+    # Recursos
+    recursos = pd.Categorical(df[col_responsable] if col_responsable else np.full(n, 'Desconocido', dtype=object))
+    if catalogo_recursos is None:
+        catalogo_recursos = catalogo(recursos.categories, {'Sistema'})
+    recursos_ext = np.empty(largo_ext, dtype=np.int32)
+    recursos_ext[pos_evento] = en_catalogo(recursos, catalogo_recursos)
+    recursos_ext[pos_inicio] = catalogo_recursos.get_loc('Sistema')
+    recursos_ext[pos_fin]    = catalogo_recursos.get_loc('Sistema')
+
+    es_fin    = np.zeros(largo_ext, dtype=bool); es_fin[pos_fin] = True
+    es_inicio = np.zeros(largo_ext, dtype=bool); es_inicio[pos_inicio] = True
+    sel_origen, sel_destino = ~es_fin, ~es_inicio
+
+    # Atributos adicionales (las filas de "Inicio proceso" quedan sin valor)
+    atributos = {}
+    for c in columnas_atributo(df):
+        valores = pd.Categorical(df[c])
+        cat = (catalogos_atributos or {}).get(c)
+        if cat is None: cat = catalogo(valores.categories)
+        atributo_ext = np.full(largo_ext, -1, dtype=np.int32)
+        atributo_ext[pos_evento] = en_catalogo(valores, cat)
+        atributos[c] = pd.Categorical.from_codes(atributo_ext[sel_origen], cat)
+
+    f_origen  = fechas_ext[sel_origen]
+    f_destino = fechas_ext[sel_destino]
+    validas   = ~(np.isnat(f_origen) | np.isnat(f_destino))
+    duracion  = np.zeros(n + k, dtype=np.int64)
+    duracion[validas] = (f_destino[validas] - f_origen[validas]) // np.timedelta64(1, 's')
+
+    return pd.DataFrame({
+        'ID':             np.repeat(ids[inicios], finales - inicios + 1),
+        'Origen':         pd.Categorical.from_codes(estados_ext[sel_origen], catalogo_estados),
+        'Destino':        pd.Categorical.from_codes(estados_ext[sel_destino], catalogo_estados),
+        'Fecha_Inicio':   f_origen,
+        'Duracion':       duracion,
+        'Recurso_Origen': pd.Categorical.from_codes(recursos_ext[sel_origen], catalogo_recursos),
+        **atributos,
+    })
+
+
+# ==========================================
+# VARIANTES POR HASH DE SECUENCIA
+# ==========================================
+def bloques_casos(ids):
+    # Posición de inicio de cada caso en un arreglo ordenado por ID y nº de caso por fila
+    ids = np.asarray(ids)
+    inicio_bloque = np.r_[True, ids[1:] != ids[:-1]] if len(ids) else np.zeros(0, dtype=bool)
+    return np.flatnonzero(inicio_bloque), np.cumsum(inicio_bloque) - 1
+
+
+def rangos(inicios, largos):
+    # Concatena arange(inicio, inicio + largo) para cada par, sin bucles
+    desplaz = np.repeat(inicios - np.r_[0, np.cumsum(largos)[:-1]], largos)
+    return np.arange(int(largos.sum())) + desplaz
+
+
+def hash_prefijos(codigos, caso, inicios):
+    # Para cada posición k de cada caso: hash de la secuencia codigos[inicio..k]
+    #   h_k = sum_{i<=k} (c_i + 1) * B^i   (mod 2^64), con dos bases independientes
+    # Se calcula con una suma acumulada global menos el acumulado previo al caso,
+    # sin bucles en Python. El hash del último elemento identifica la secuencia completa.
+    pos = np.arange(len(codigos)) - inicios[caso]
+    valores = codigos.astype(np.int64).astype(np.uint64) + np.uint64(1)
+    largo_max = int(pos.max()) + 1 if len(pos) else 0
+    hashes = []
+    with np.errstate(over='ignore'):
+        for base in BASES_HASH:
+            potencias = np.cumprod(np.r_[np.uint64(1), np.full(max(largo_max - 1, 0), base, dtype=np.uint64)])
+            acumulado = np.cumsum(valores * potencias[pos], dtype=np.uint64)
+            previo = np.r_[np.uint64(0), acumulado][inicios[caso]]
+            hashes.append(acumulado - previo + (pos + 1).astype(np.uint64) * MEZCLA_LARGO)
+    return np.stack(hashes, axis=1)
+
+
+def hash_rutas(df_trans):
+    # Por caso: hash (n_casos x 2) de su secuencia de estados sin Fin proceso, más lo
+    # necesario para reconstruir el texto de la ruta de cualquier caso.
+    inicios, caso = bloques_casos(df_trans['ID'].to_numpy())
+    n_casos = len(inicios)
+    destino = df_trans['Destino'].cat
+    en_ruta = destino.codes.to_numpy() != destino.categories.get_loc(FIN)
+
+    cod_ruta = destino.codes.to_numpy()[en_ruta]
+    caso_ruta = caso[en_ruta]
+    largo_ruta = np.bincount(caso_ruta, minlength=n_casos)
+    inicios_ruta = np.r_[0, np.cumsum(largo_ruta)[:-1]].astype(np.int64)
+
+    hash_caso = np.zeros((n_casos, 2), dtype=np.uint64)
+    if len(cod_ruta):
+        prefijos = hash_prefijos(cod_ruta, caso_ruta, inicios_ruta)
+        con_ruta = largo_ruta > 0
+        hash_caso[con_ruta] = prefijos[inicios_ruta[con_ruta] + largo_ruta[con_ruta] - 1]
+    return {'inicios': inicios, 'caso': caso, 'hash': hash_caso,
+            'cod_ruta': cod_ruta, 'inicios_ruta': inicios_ruta, 'largo_ruta': largo_ruta}
+
+
+def textos_ruta(rutas, casos, categorias):
+    # Texto "A -> B -> C" de la ruta de cada caso indicado (uno por variante distinta)
+    nombres_estado = np.append(categorias.astype(str).to_numpy(dtype=object), 'nan')
+    textos = []
+    for rep in casos:
+        ini = rutas['inicios_ruta'][rep]
+        textos.append(' -> '.join(nombres_estado[rutas['cod_ruta'][ini:ini + rutas['largo_ruta'][rep]]]))
+    return textos
+
+
+def categorias_variantes(textos):
+    # Catálogos alineados por código: nombre, ruta y tooltip de cada variante
+    return (pd.Index([f"Var {i+1}" for i in range(len(textos))]), pd.Index(textos),
+            pd.Index([r.replace(' -> ', '<br>&#8627; ') for r in textos]))
+
+
+def construir_variantes(df_trans, rutas=None, textos_hash=None):
+    # Identifica cada variante por el hash de su secuencia de estados (sin Fin proceso),
+    # numera Var 1..N por frecuencia (empates: primera aparición en orden de ID) y
+    # arma el texto de la ruta una sola vez por variante distinta. Con `textos_hash`
+    # ({(h1, h2): texto}) basta que `rutas` traiga 'inicios', 'caso' y 'hash'.
+    if df_trans.empty:
+        return df_trans.assign(Nombre_Variante=pd.Series(dtype=object), Ruta=pd.Series(dtype=object)), \
+               pd.DataFrame({c: pd.Series(dtype=object) for c in COLUMNAS_VARIANTES})
+
+    rutas = rutas or hash_rutas(df_trans)
+    inicios, caso = rutas['inicios'], rutas['caso']
+
+    unicos, primera, inversa, frecuencia = np.unique(rutas['hash'], axis=0, return_index=True, return_inverse=True, return_counts=True)
+    orden = np.lexsort((primera, -frecuencia))            # más frecuente primero
+    rango = np.empty_like(orden); rango[orden] = np.arange(len(orden))
+    var_caso = rango[inversa.ravel()]
+
+    if textos_hash is None:
+        textos = textos_ruta(rutas, primera[orden], df_trans['Destino'].cat.categories)
+    else:
+        textos = [textos_hash[(int(a), int(b))] for a, b in unicos[orden]]
+    cat_nombres, cat_rutas, cat_tooltips = categorias_variantes(textos)
+
+    fechas = df_trans['Fecha_Inicio'].to_numpy()
+    df_var = pd.DataFrame({
+        'ID':                df_trans['ID'].to_numpy()[inicios],
+        'Ruta':              pd.Categorical.from_codes(var_caso, cat_rutas),
+        'Duracion_Total':    np.add.reduceat(df_trans['Duracion'].to_numpy(), inicios),
+        'Fecha_Inicio_Caso': fechas[inicios],            # fila "Inicio proceso" = mínimo del caso
+        'Nombre_Variante':   pd.Categorical.from_codes(var_caso, cat_nombres),
+        'Ruta_Tooltip':      pd.Categorical.from_codes(var_caso, cat_tooltips),
+        **{c: df_trans[c].array[inicios + 1] for c in columnas_atributo(df_trans)},   # primer evento del caso
+    })
+
+    var_fila = var_caso[caso]
+    df_trans = df_trans.assign(
+        Nombre_Variante=pd.Categorical.from_codes(var_fila, cat_nombres),
+        Ruta=pd.Categorical.from_codes(var_fila, cat_rutas),
+    )
+    return df_trans, df_var
+
+
+def rutas_por_variante(df_var):
+    # Nombre_Variante y Ruta comparten códigos: Var i <-> i-ésima ruta
+    return dict(zip(df_var['Nombre_Variante'].cat.categories, df_var['Ruta'].cat.categories))
+
+# ==========================================
+# ÍNDICE DE PREFIJOS (TIEMPO RESTANTE)
+# ==========================================
+# Índice de prefijos (un trie aplanado): cada nodo es un prefijo de ruta e1 -> ... -> ek
+# visto en el historial y se identifica con el mismo hash polinomial de las variantes
+# (hash_prefijos). Cada nodo guarda cuántos casos pasaron por él y los percentiles del
+# tiempo que les faltaba desde ek hasta su último evento (prediccion.predecir_restante).
+# Se arma al cargar el log, como el índice DFG, en segundos; las vistas lo escalan.
+def percentiles_grupos(valores, grupo, n_grupos, percentiles):
+    # Percentiles (interpolación lineal, como np.percentile) de cada grupo en una sola pasada
+    orden = np.lexsort((valores, grupo))
+    ordenados = valores[orden]
+    n = np.bincount(grupo, minlength=n_grupos)
+    inicio = np.r_[0, np.cumsum(n)[:-1]]
+    resultado = {}
+    for p in percentiles:
+        pos = p / 100 * np.maximum(n - 1, 0)
+        bajo = np.floor(pos).astype(np.int64)
+        alto = np.minimum(bajo + 1, np.maximum(n - 1, 0))
+        v_bajo, v_alto = ordenados[inicio + bajo], ordenados[inicio + alto]
+        resultado[p] = v_bajo + (v_alto - v_bajo) * (pos - bajo)
+    return n, resultado
+
+
+def indice_prefijos(df_trans):
+    # Índice de nodos con los percentiles en la unidad de las duraciones de df_trans
+    estados = df_trans['Destino'].cat.categories
+    if df_trans.empty:
+        return {'claves': pd.MultiIndex.from_arrays([np.zeros(0, np.uint64)] * 2), 'n': np.zeros(0, np.int64),
+                'percentiles': {p: np.zeros(0) for p in PERCENTILES_PREFIJOS}, 'estados': estados}
+
+    inicios, caso = bloques_casos(df_trans['ID'].to_numpy())
+    duracion = df_trans['Duracion'].to_numpy(dtype=np.float64)
+    acumulado = np.cumsum(duracion)
+    transcurrido = acumulado - np.r_[0.0, acumulado][inicios[caso]]
+    restante = np.add.reduceat(duracion, inicios)[caso] - transcurrido
+
+    # Una posición por estado de la ruta (la fila cuyo Destino es ese estado)
+    codigos = df_trans['Destino'].cat.codes.to_numpy()
+    en_ruta = codigos != estados.get_loc(FIN)
+    caso_ruta = caso[en_ruta]
+    inicios_ruta = np.r_[0, np.cumsum(np.bincount(caso_ruta, minlength=len(inicios)))[:-1]].astype(np.int64)
+    hashes = hash_prefijos(codigos[en_ruta], caso_ruta, inicios_ruta)
+
+    claves, nodo = np.unique(hashes, axis=0, return_inverse=True)
+    n, percentiles = percentiles_grupos(restante[en_ruta], nodo.ravel(), len(claves), PERCENTILES_PREFIJOS)
+    return {'claves': pd.MultiIndex.from_arrays([claves[:, 0], claves[:, 1]]), 'n': n,
+            'percentiles': percentiles, 'estados': estados}
+
+
+def escalar_prefijos(indice, factor):
+    # El mismo índice en otra unidad lineal: los percentiles escalan, los nodos no cambian
+    return {**indice, 'percentiles': {p: v * factor for p, v in indice['percentiles'].items()}}
+
+
+# ==========================================
+# MODELO COMPLETO (LOG + MAESTRO DE ESTADOS)
+# ==========================================
+def columna_responsable(df_log):
+    return 'RECURSO' if 'RECURSO' in df_log.columns else 'RESPONSABLE' if 'RESPONSABLE' in df_log.columns else None
+
+
+def texto_periodo(fechas):
+    fechas_validas = pd.Series(fechas).dropna()
+    if fechas_validas.empty: return "Período no disponible"
+    return f"Período {fechas_validas.min().strftime('%d-%m-%Y')} – {fechas_validas.max().strftime('%d-%m-%Y')}"
+
+
+def orden_estados(df_est):
+    # (dict_orden, tiene_est_orden) del maestro de estados. EST_ORDEN numérico o, si
+    # no, el primer número del texto (9999 si no tiene); ante estados repetidos, el último.
+    tiene_est_orden = ('ESTADO' in df_est.columns and 'EST_ORDEN' in df_est.columns)
+    dict_orden = {INICIO: -9999, FIN: 9999}
+    if tiene_est_orden:
+        df = df_est.dropna(subset=['ESTADO', 'EST_ORDEN'])
+        texto = df['EST_ORDEN'].astype(str).str.strip()
+        orden = pd.to_numeric(texto, errors='coerce')
+        orden = orden.fillna(pd.to_numeric(texto.str.extract(r'(\d+)', expand=False), errors='coerce')).fillna(9999)
+        dict_orden.update(zip(df['ESTADO'].astype(str).str.strip(), orden.astype(float)))
+    return dict_orden, tiene_est_orden
+
+
+def orden_por_codigo(dict_orden, estados):
+    # Orden de cada estado alineado a los códigos del catálogo (NaN: sin orden), para
+    # consultar el de muchas aristas indexando un arreglo
+    return pd.Series(dict_orden, dtype=float).reindex(pd.Index(estados).astype(str).str.strip()).to_numpy()
+
+
+def procesar_archivos(bytes_log, bytes_est):
+    # Función pura: mismos bytes de entrada -> mismo modelo. No toca st.session_state
+    # para poder cachearse y compartirse entre sesiones.
+    df_log, omitidas_log = ingesta.leer_log(bytes_log)
+    df_est, omitidas_est = ingesta.leer_estados(bytes_est)
+
+    col_responsable = columna_responsable(df_log)
+    dict_orden, tiene_est_orden = orden_estados(df_est)
+
+    df_log['FECHA_ESTADO'] = ingesta.parsear_fechas(df_log['FECHA_ESTADO'], ingesta.huella_encabezado(bytes_log))
+    periodo_fechas = texto_periodo(df_log['FECHA_ESTADO'])
+
+    cols_merge = ['ESTADO']
+    if tiene_est_orden: cols_merge.append('EST_ORDEN')
+    df = df_log.merge(df_est[cols_merge], on='ESTADO', how='left')
+    df = df.sort_values(['ID', 'FECHA_ESTADO'])
+
+    df_trans = construir_transiciones(df, col_responsable)
+
+    rutas = hash_rutas(df_trans) if len(df_trans) else {'hash': np.zeros((0, 2), dtype=np.uint64)}
+    df_trans, df_var = construir_variantes(df_trans, rutas)
+
+    return {
+        'df_transiciones': df_trans,
+        'df_variantes':    df_var,
+        'hash_casos':      rutas['hash'],
+        'inicios_casos':   rutas.get('inicios', np.zeros(0, dtype=np.int64)),
+        'dfg':             grafo.construir_indice_dfg(df_trans),
+        'prefijos':        indice_prefijos(df_trans),
+        'sketches':        estadisticas.sketches_modelo(df_trans, df_var),
+        'dict_orden':      dict_orden,
+        'orden_estados':   orden_por_codigo(dict_orden, df_trans['Origen'].cat.categories),
+        'periodo_fechas':  periodo_fechas,
+        'tiene_est_orden': tiene_est_orden,
+        'filas_omitidas':  omitidas_log + omitidas_est,
+    }
+
+
+# ==========================================
+# REPORTE DE MEMORIA
+# ==========================================
+def reporte_memoria(df):
+    # Bytes por columna tal como está almacenada vs. la misma columna como strings de Python
+    filas = []
+    for col in df.columns:
+        actual = int(df[col].memory_usage(deep=True, index=False))
+        como_objeto = (int(df[col].astype(object).memory_usage(deep=True, index=False))
+                       if isinstance(df[col].dtype, pd.CategoricalDtype) else actual)
+        filas.append({'Columna': col, 'Bytes_objeto': como_objeto, 'Bytes_modelo': actual})
+    reporte = pd.DataFrame(filas)
+    total = reporte[['Bytes_objeto', 'Bytes_modelo']].sum()
+    reporte.loc[len(reporte)] = {'Columna': 'TOTAL', 'Bytes_objeto': total['Bytes_objeto'], 'Bytes_modelo': total['Bytes_modelo']}
+    reporte['Ahorro_%'] = (1 - reporte['Bytes_modelo'] / reporte['Bytes_objeto'].where(reporte['Bytes_objeto'] > 0)) * 100
+    return reporte
@@ -0,0 +1,233 @@
+import heapq
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from procesamiento import INICIO, FIN
+
+# ==========================================
+# SIMULACIÓN DE ESCENARIOS (WHAT-IF DE CAPACIDAD)
+# ==========================================
+# Simulación de eventos discretos sembrada desde el modelo (tiempo calendario, en segundos):
+#   • ruteo: cadena de Markov con las probabilidades Origen -> Destino del DFG
+#   • tiempo en cada etapa: remuestreo de las duraciones observadas con ese Origen
+#   • llegadas: remuestreo de los intervalos observados entre inicios de caso
+#   • capacidad: cada etapa es una cola FIFO con c servidores, c = P90 de los casos que
+#     estuvieron a la vez en la etapa (con esa capacidad el historial casi no hace cola),
+#     repartidos en partes iguales entre los recursos que la atendieron. El escenario suma
+#     o resta recursos a una etapa y con ellos servidores.
+# Base y escenario usan los mismos números aleatorios (rutas, tiempos, llegadas): la
+# diferencia entre ambos se debe solo a la capacidad. Las réplicas se reparten por lotes
+# en un pool de procesos y cada una usa su semilla derivada de SEMILLA_SIMULACION, así el
+# resultado no depende del reparto.
+N_REPLICAS_SIM      = 500
+N_CASOS_SIM         = 500         # casos por réplica
+CALENTAMIENTO       = 0.1         # fracción inicial de casos descartada (arrancan con el sistema vacío)
+MAX_PASOS           = 200         # tope de etapas por caso (reprocesos muy largos)
+PERCENTIL_CAPACIDAD = 90
+PERCENTILES_SIM     = [50, 90]
+SEMILLA_SIMULACION  = 20240601
+REPLICAS_LOTE       = 25
+MAX_PROCESOS        = int(os.environ.get('MONITOR_SIMULACION_PROCESOS', min(4, os.cpu_count() or 1)))
+
+_pool = None
+
+
+def _pool_simulacion():
+    global _pool
+    if _pool is None: _pool = ProcessPoolExecutor(max_workers=MAX_PROCESOS)
+    return _pool
+
+
+# ==========================================
+# MODELO DE SIMULACIÓN (DESDE EL LOG)
+# ==========================================
+def concurrencia_percentil(inicio, fin, percentil=PERCENTIL_CAPACIDAD):
+    # Percentil, ponderado por tiempo, del número de intervalos [inicio, fin) abiertos a la vez
+    if len(inicio) == 0: return 0.0
+    tiempos = np.concatenate((inicio, fin))
+    cambio = np.concatenate((np.ones(len(inicio)), -np.ones(len(fin))))
+    orden = np.lexsort((cambio, tiempos))                  # a igual tiempo, cierres antes que aperturas
+    nivel = np.cumsum(cambio[orden])[:-1]
+    peso = np.diff(tiempos[orden])
+    if peso.sum() <= 0: return float(nivel.max(initial=1))
+    por_nivel = np.argsort(nivel, kind='stable')
+    acumulado = np.cumsum(peso[por_nivel])
+    return float(nivel[por_nivel][np.searchsorted(acumulado, percentil / 100 * acumulado[-1])])
+
+
+def modelo_simulacion(df_trans, df_var):
+    # Del modelo (duraciones en segundos): arreglos por código de estado del catálogo común
+    estados = df_trans['Origen'].cat.categories
+    k = len(estados)
+    origen = df_trans['Origen'].cat.codes.to_numpy().astype(np.int64)
+    destino = df_trans['Destino'].cat.codes.to_numpy().astype(np.int64)
+    duracion = df_trans['Duracion'].to_numpy(dtype=np.float64)
+    validas = (origen >= 0) & (destino >= 0)
+
+    conteos = np.bincount(origen[validas] * k + destino[validas], minlength=k * k).reshape(k, k)
+    probabilidad = np.cumsum(conteos / np.maximum(conteos.sum(axis=1, keepdims=True), 1), axis=1)
+    probabilidad[:, -1] = 1.0                                       # redondeo de la suma acumulada
+    cod_inicio, cod_fin = estados.get_loc(INICIO), estados.get_loc(FIN)
+    probabilidad[conteos.sum(axis=1) == 0] = np.arange(k) >= cod_fin   # sin salidas observadas: a Fin
+
+    # Duraciones por etapa: ordenadas por Origen, con desplazamiento y conteo por estado
+    orden = np.argsort(origen[validas], kind='stable')
+    duraciones = duracion[validas][orden]
+    conteo = np.bincount(origen[validas], minlength=k)
+    desplazamiento = np.r_[0, np.cumsum(conteo)[:-1]]
+
+    # Capacidad: servidores (P90 de casos simultáneos) y recursos distintos por etapa
+    fechas = df_trans['Fecha_Inicio'].to_numpy()
+    con_fecha = validas & ~np.isnat(fechas)
+    inicio = fechas.astype('datetime64[s]').astype(np.int64).astype(np.float64)
+    recurso = df_trans['Recurso_Origen'].cat.codes.to_numpy()
+    servidores = np.zeros(k, dtype=np.int64)
+    recursos = np.zeros(k, dtype=np.int64)
+    for s in range(k):
+        if s in (cod_inicio, cod_fin) or conteo[s] == 0: continue
+        filas = con_fecha & (origen == s)
+        servidores[s] = max(1, math.ceil(concurrencia_percentil(inicio[filas], inicio[filas] + duracion[filas])))
+        recursos[s] = max(1, len(np.unique(recurso[origen == s])))
+
+    llegadas = np.sort(df_var['Fecha_Inicio_Caso'].dropna().to_numpy().astype('datetime64[s]').astype(np.int64))
+    intervalos = np.diff(llegadas).astype(np.float64)
+    return {
+        'estados':        estados,
+        'probabilidad':   probabilidad,
+        'duraciones':     duraciones,
+        'desplazamiento': desplazamiento,
+        'conteo':         conteo,
+        'servidores':     servidores,
+        'recursos':       recursos,
+        'intervalos':     intervalos if len(intervalos) else np.zeros(1),
+        'inicio':         cod_inicio,
+        'fin':            cod_fin,
+    }
+
+
+def servidores_escenario(ms, cambios):
+    # cambios: {etapa: recursos que se suman (o restan)}; cada recurso aporta servidores/recursos
+    servidores = ms['servidores'].copy()
+    for etapa, delta in cambios.items():
+        s = ms['estados'].get_loc(etapa)
+        recursos = ms['recursos'][s]
+        if recursos + delta < 1:
+            raise ValueError(f"La etapa '{etapa}' debe conservar al menos un recurso.")
+        servidores[s] = max(1, math.ceil(ms['servidores'][s] * (recursos + delta) / recursos))
+    return servidores
+
+
+# ==========================================
+# RÉPLICAS
+# ==========================================
+def muestrear_casos(ms, rng, n_casos):
+    # Llegadas, rutas y tiempos de servicio de una réplica (vectorizado por paso de la ruta).
+    # Devuelve llegadas, inicio de cada caso en las visitas (CSR), etapa y servicio por visita.
+    llegadas = np.r_[0.0, np.cumsum(rng.choice(ms['intervalos'], n_casos - 1))]
+    actual = np.full(n_casos, ms['inicio'])
+    casos_paso, etapas_paso = [], []
+    activos = np.arange(n_casos)
+    for _ in range(MAX_PASOS):
+        u = rng.random(len(activos))
+        siguiente = (ms['probabilidad'][actual[activos]] < u[:, None]).sum(axis=1)
+        actual[activos] = siguiente
+        activos = activos[siguiente != ms['fin']]
+        if not len(activos): break
+        casos_paso.append(activos)
+        etapas_paso.append(actual[activos])
+
+    caso = np.concatenate(casos_paso) if casos_paso else np.zeros(0, dtype=np.int64)
+    etapa = np.concatenate(etapas_paso) if etapas_paso else np.zeros(0, dtype=np.int64)
+    orden = np.argsort(caso, kind='stable')                 # por caso, en orden de paso
+    caso, etapa = caso[orden], etapa[orden]
+    indice = ms['desplazamiento'][etapa] + (rng.random(len(etapa)) * ms['conteo'][etapa]).astype(np.int64)
+    servicio = ms['duraciones'][indice]
+    inicio_caso = np.r_[0, np.cumsum(np.bincount(caso, minlength=n_casos))]
+    return llegadas, inicio_caso, etapa, servicio
+
+
+def simular_colas(llegadas, inicio_caso, etapa, servicio, servidores):
+    # Red de colas FIFO multiservidor. Las llegadas a cualquier etapa se atienden en orden
+    # global de tiempo, así cada una toma el servidor que se libera primero en su etapa.
+    # Devuelve (fin de cada caso, espera de cada visita).
+    etapa, servicio, inicio_caso = etapa.tolist(), servicio.tolist(), inicio_caso.tolist()
+    libres = [[0.0] * c for c in servidores.tolist()]
+    fin_caso = [0.0] * len(llegadas)
+    espera = [0.0] * len(etapa)
+    eventos = [(t, i, inicio_caso[i]) for i, t in enumerate(llegadas.tolist())]
+    heapq.heapify(eventos)
+    while eventos:
+        t, i, j = heapq.heappop(eventos)
+        if j == inicio_caso[i + 1]:
+            fin_caso[i] = t
+            continue
+        cola = libres[etapa[j]]
+        comienzo = max(t, cola[0])
+        heapq.heapreplace(cola, comienzo + servicio[j])
+        espera[j] = comienzo - t
+        heapq.heappush(eventos, (comienzo + servicio[j], i, j + 1))
+    return np.array(fin_caso), np.array(espera)
+
+
+def simular_lote(ms, escenarios, semillas, n_casos=N_CASOS_SIM):
+    # Para cada réplica y escenario: [P50, P90, media] del tiempo de ciclo y espera media por etapa
+    k = len(ms['estados'])
+    ciclo = np.empty((len(semillas), len(escenarios), len(PERCENTILES_SIM) + 1))
+    espera = np.empty((len(semillas), len(escenarios), k))
+    descarte = int(n_casos * CALENTAMIENTO)
+    for r, semilla in enumerate(semillas):
+        llegadas, inicio_caso, etapa, servicio = muestrear_casos(ms, np.random.default_rng(semilla), n_casos)
+        visitas_validas = np.repeat(np.arange(n_casos), np.diff(inicio_caso)) >= descarte
+        n_visitas = np.maximum(np.bincount(etapa[visitas_validas], minlength=k), 1)
+        for e, servidores in enumerate(escenarios):
+            fin_caso, espera_visita = simular_colas(llegadas, inicio_caso, etapa, servicio, servidores)
+            tiempos = (fin_caso - llegadas)[descarte:]
+            ciclo[r, e] = np.r_[np.percentile(tiempos, PERCENTILES_SIM), tiempos.mean()]
+            espera[r, e] = np.bincount(etapa[visitas_validas], weights=espera_visita[visitas_validas], minlength=k) / n_visitas
+    return ciclo, espera
+
+
+def simular_escenario(ms, cambios, n_replicas=N_REPLICAS_SIM, n_casos=N_CASOS_SIM, semilla=SEMILLA_SIMULACION):
+    # Devuelve (ciclo, espera): réplicas x [base, escenario] x métricas, en segundos
+    escenarios = [ms['servidores'], servidores_escenario(ms, cambios)]
+    semillas = [np.random.SeedSequence([semilla, r]) for r in range(n_replicas)]
+    lotes = [semillas[i:i + REPLICAS_LOTE] for i in range(0, n_replicas, REPLICAS_LOTE)]
+    if MAX_PROCESOS > 1 and len(lotes) > 1:
+        pool = _pool_simulacion()
+        resultados = list(pool.map(simular_lote, [ms] * len(lotes), [escenarios] * len(lotes), lotes, [n_casos] * len(lotes)))
+    else:
+        resultados = [simular_lote(ms, escenarios, lote, n_casos) for lote in lotes]
+    return np.concatenate([c for c, _ in resultados]), np.concatenate([e for _, e in resultados])
+
+
+# ==========================================
+# RESUMEN BASE VS. ESCENARIO
+# ==========================================
+def resumen_escenario(ms, ciclo, espera, segundos_unidad=86_400, nivel=95):
+    # Tablas (tiempo de ciclo, espera por etapa) con base, escenario, cambio % e intervalo
+    # percentil del cambio entre réplicas (pareadas: mismos números aleatorios)
+    alfa = (100 - nivel) / 2
+    metricas = [f'P{p} ciclo' for p in PERCENTILES_SIM] + ['Media ciclo']
+    base, esc = ciclo[:, 0] / segundos_unidad, ciclo[:, 1] / segundos_unidad
+    cambio = (esc - base) / np.where(base > 0, base, np.nan) * 100
+    tabla_ciclo = pd.DataFrame({
+        'Métrica':    metricas,
+        'Base':       base.mean(axis=0),
+        'Escenario':  esc.mean(axis=0),
+        'Cambio %':   (esc.mean(axis=0) - base.mean(axis=0)) / np.where(base.mean(axis=0) > 0, base.mean(axis=0), np.nan) * 100,
+        'IC inf. %':  np.nanpercentile(cambio, alfa, axis=0),
+        'IC sup. %':  np.nanpercentile(cambio, 100 - alfa, axis=0),
+    })
+    etapas = np.flatnonzero(ms['servidores'] > 0)
+    tabla_espera = pd.DataFrame({
+        'Etapa':               ms['estados'][etapas].astype(str),
+        'Recursos':            ms['recursos'][etapas],
+        'Servidores':          ms['servidores'][etapas],
+        'Espera base':         espera[:, 0, etapas].mean(axis=0) / segundos_unidad,
+        'Espera escenario':    espera[:, 1, etapas].mean(axis=0) / segundos_unidad,
+    }).sort_values('Espera base', ascending=False)
+    return tabla_ciclo, tabla_espera
@@ -0,0 +1,185 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import scipy.sparse as sp
+
+import estadisticas
+import procesamiento
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+# Snapshot del modelo procesado en un directorio:
+#   meta.json           dict_orden, periodo, forma de las matrices, etc.
+#   *.arrow             DataFrames en formato Arrow IPC (columnar, categorías como diccionario)
+#   arrays/*.npy        hashes, inicios de caso, índice DFG e índice de prefijos (memmap)
+# Sin compresión las tablas Arrow se mapean en memoria sin copiar (10M transiciones
+# abren en ~0.6 s); con lz4/zstd ocupan menos en disco pero hay que descomprimirlas.
+# Los sketches (sketch_*.arrow) se pueden leer solos: combinar_snapshots arma la vista
+# de varios períodos (p. ej. meses -> año) sin abrir las tablas de eventos.
+DIR_SNAPSHOTS = os.environ.get('MONITOR_SNAPSHOT_DIR', 'snapshots')
+COMPRESION    = os.environ.get('MONITOR_SNAPSHOT_COMPRESION', 'uncompressed')
+FORMATO       = 2       # 2: duraciones en segundos (procesamiento.VERSION_MODELO)
+
+TABLAS = {'df_transiciones': 'transiciones', 'df_variantes': 'variantes'}
+META   = ['dict_orden', 'periodo_fechas', 'tiene_est_orden', 'filas_omitidas']
+
+
+# ==========================================
+# ESCRITURA
+# ==========================================
+def _escribir_tabla(df, ruta):
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    feather.write_feather(tabla, ruta, compression=COMPRESION)
+
+
+def _escribir_arrays(arrays, dir_arrays):
+    os.makedirs(dir_arrays)
+    for nombre, arr in arrays.items():
+        np.save(os.path.join(dir_arrays, f"{nombre}.npy"), np.ascontiguousarray(arr))
+
+
+def guardar_snapshot(modelo, nombre, clave=None):
+    # Escribe en un directorio temporal y lo renombra al final: un snapshot a medias
+    # nunca queda visible y las sesiones que tienen abierto el anterior no se ven afectadas.
+    destino = os.path.join(DIR_SNAPSHOTS, nombre)
+    tmp = f"{destino}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    for clave_tabla, archivo in TABLAS.items():
+        _escribir_tabla(modelo[clave_tabla], os.path.join(tmp, f"{archivo}.arrow"))
+
+    arrays = {'hash_casos': modelo['hash_casos'], 'inicios_casos': modelo['inicios_casos']}
+    formas, ordenes = {}, []
+    for k, v in modelo['dfg'].items():
+        if sp.issparse(v):
+            v = v.tocsr()
+            formas[k] = list(v.shape)
+            arrays.update({f"dfg_{k}_data": v.data, f"dfg_{k}_indices": v.indices, f"dfg_{k}_indptr": v.indptr})
+        elif isinstance(v, np.ndarray):
+            arrays[f"dfg_{k}"] = v
+            ordenes.append(k)
+    prefijos = modelo['prefijos']
+    arrays['prefijos_claves'] = np.column_stack([prefijos['claves'].get_level_values(i).to_numpy(np.uint64) for i in (0, 1)])
+    arrays['prefijos_n'] = prefijos['n']
+    arrays.update({f"prefijos_p{p}": v for p, v in prefijos['percentiles'].items()})
+    _escribir_arrays(arrays, os.path.join(tmp, 'arrays'))
+
+    alfas = {}
+    for k, sketch in (modelo.get('sketches') or {}).items():
+        alfas[k] = sketch['alfa']
+        for parte in ('cubetas', 'resumen'):
+            _escribir_tabla(sketch[parte], os.path.join(tmp, f"sketch_{k}_{parte}.arrow"))
+
+    meta = {c: modelo[c] for c in META}
+    meta.update({'formato': FORMATO, 'clave': clave, 'guardado': time.strftime('%Y-%m-%d %H:%M'),
+                 'n_transiciones': len(modelo['df_transiciones']), 'n_casos': len(modelo['df_variantes']),
+                 'formas_dfg': formas, 'ordenes_dfg': ordenes, 'alfas_sketch': alfas})
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(tmp, destino)
+    return destino
+
+
+# ==========================================
+# LECTURA
+# ==========================================
+def _leer_tabla(ruta):
+    # memory_map: sin compresión los buffers apuntan directamente al archivo
+    with pa.memory_map(ruta) as fuente:
+        tabla = pa.ipc.open_file(fuente).read_all()
+    return tabla.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _leer_array(dir_arrays, nombre):
+    return np.load(os.path.join(dir_arrays, f"{nombre}.npy"), mmap_mode='r')
+
+
+def _leer_prefijos(dir_arrays, df_trans):
+    # Snapshots guardados antes del índice de prefijos: se arma desde las transiciones
+    if not os.path.exists(os.path.join(dir_arrays, 'prefijos_claves.npy')):
+        return procesamiento.indice_prefijos(df_trans)
+    claves = _leer_array(dir_arrays, 'prefijos_claves')
+    return {'claves': pd.MultiIndex.from_arrays([claves[:, 0], claves[:, 1]]),
+            'n': _leer_array(dir_arrays, 'prefijos_n'),
+            'percentiles': {p: _leer_array(dir_arrays, f"prefijos_p{p}") for p in procesamiento.PERCENTILES_PREFIJOS},
+            'estados': df_trans['Destino'].cat.categories}
+
+
+def leer_meta(nombre):
+    with open(os.path.join(DIR_SNAPSHOTS, nombre, 'meta.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def cargar_snapshot(nombre):
+    # Devuelve (clave, modelo) con las mismas claves que procesamiento.procesar_archivos
+    ruta = os.path.join(DIR_SNAPSHOTS, nombre)
+    meta = leer_meta(nombre)
+    if meta.get('formato') != FORMATO:
+        raise ValueError(f"El snapshot '{nombre}' tiene un formato no compatible.")
+    modelo = {c: _leer_tabla(os.path.join(ruta, f"{archivo}.arrow")) for c, archivo in TABLAS.items()}
+
+    dir_arrays = os.path.join(ruta, 'arrays')
+    df_trans = modelo['df_transiciones']
+    dfg = {'estados': df_trans['Origen'].cat.categories, 'variantes': df_trans['Nombre_Variante'].cat.categories}
+    for k, forma in meta['formas_dfg'].items():
+        partes = [_leer_array(dir_arrays, f"dfg_{k}_{p}") for p in ('data', 'indices', 'indptr')]
+        dfg[k] = sp.csr_matrix(tuple(partes), shape=tuple(forma))
+    for k in meta['ordenes_dfg']:
+        dfg[k] = _leer_array(dir_arrays, f"dfg_{k}")
+    modelo['dfg'] = dfg
+    modelo['orden_estados'] = procesamiento.orden_por_codigo(meta['dict_orden'], dfg['estados'])
+    modelo['prefijos'] = _leer_prefijos(dir_arrays, df_trans)
+    modelo['hash_casos'] = _leer_array(dir_arrays, 'hash_casos')
+    modelo['inicios_casos'] = _leer_array(dir_arrays, 'inicios_casos')
+
+    modelo['sketches'] = leer_sketches(nombre, meta) or None
+    modelo.update({c: meta[c] for c in META})
+    return meta.get('clave'), modelo
+
+
+def leer_sketches(nombre, meta=None):
+    # {clave: sketch} del snapshot, sin leer transiciones ni variantes
+    ruta = os.path.join(DIR_SNAPSHOTS, nombre)
+    meta = meta or leer_meta(nombre)
+    return {
+        k: {'alfa': alfa, **{p: _leer_tabla(os.path.join(ruta, f"sketch_{k}_{p}.arrow")) for p in ('cubetas', 'resumen')}}
+        for k, alfa in meta['alfas_sketch'].items()
+    }
+
+
+def combinar_snapshots(nombres):
+    # Sketches de varios snapshots combinados (mismo alfa): la memoria depende del número
+    # de grupos y cubetas, no de los eventos. Solo claves presentes en todos los snapshots.
+    por_snapshot = []
+    for nombre in nombres:
+        meta = leer_meta(nombre)
+        if meta.get('formato') != FORMATO:
+            raise ValueError(f"El snapshot '{nombre}' tiene un formato no compatible.")
+        if not meta.get('alfas_sketch'):
+            raise ValueError(f"El snapshot '{nombre}' no tiene sketches.")
+        por_snapshot.append(leer_sketches(nombre, meta))
+    claves = set.intersection(*(set(s) for s in por_snapshot)) if por_snapshot else set()
+    return {k: estadisticas.combinar_sketches(s[k] for s in por_snapshot) for k in sorted(claves)}
+
+
+def listar_snapshots():
+    # [(nombre, meta)] del más reciente al más antiguo
+    if not os.path.isdir(DIR_SNAPSHOTS): return []
+    snapshots = []
+    for nombre in os.listdir(DIR_SNAPSHOTS):
+        if '.tmp-' in nombre or not os.path.exists(os.path.join(DIR_SNAPSHOTS, nombre, 'meta.json')): continue
+        try:
+            snapshots.append((nombre, leer_meta(nombre)))
+        except (OSError, ValueError):
+            continue
+    return sorted(snapshots, key=lambda s: s[1].get('guardado', ''), reverse=True)
@@ -0,0 +1,43 @@
+import pandas as pd
+
+import batch
+import informes
+import procesamiento
+from test_procesamiento import generar_log
+
+
+def test_expandir_logs_nombres_unicos(tmp_path):
+    # Mismo nombre en una carpeta (distinta extensión), en carpetas distintas y repetido
+    for ruta in ['log.xes', 'log.jsonocel', 'a/log.csv', 'b/log.csv', 'a/x.csv']:
+        (tmp_path / ruta).parent.mkdir(exist_ok=True)
+        (tmp_path / ruta).touch()
+    logs = batch.expandir_logs([str(tmp_path / 'log.xes'), str(tmp_path / 'log.jsonocel'),
+                                str(tmp_path / 'a'), str(tmp_path / 'b'), str(tmp_path / 'a' / 'x.csv')])
+    nombres = [n for _, n in logs]
+    assert len(logs) == 6
+    assert len({n.lower() for n in nombres}) == len(nombres)
+    assert nombres[:2] == [f"{tmp_path.name}_log_xes", f"{tmp_path.name}_log_jsonocel"]
+    assert 'a_log' in nombres and 'b_log' in nombres
+
+
+def test_informe_html_usa_mermaid_local(tmp_path):
+    nombres = ['mapa_nodos', 'mapa_aristas', 'variantes', 'estadisticas_variante', 'estadisticas_etapa',
+               'estadisticas_recurso', 'diagnostico_etapas', 'diagnostico_recursos', 'diagnostico_prediccion', 'pronostico']
+    tablas = {n: pd.DataFrame() for n in nombres}
+    tablas['variantes'] = pd.DataFrame({'Variante': ['Var 1'], 'Frecuencia': [3]})
+    resumen = {'periodo': 'ene 2024', 'casos': 3}
+    batch.escribir_resultados(str(tmp_path), 'log', tablas, resumen, 'flowchart TD\n    A --> B', formatos=('html',))
+    informe = (tmp_path / 'informe.html').read_text(encoding='utf-8')
+    assert '<script src="mermaid.min.js"></script>' in informe and 'http' not in informe
+    assert (tmp_path / 'mermaid.min.js').read_bytes() == open(informes.MERMAID_LOCAL, 'rb').read()
+
+
+def test_memoria_csv(tmp_path):
+    df = generar_log(n_casos=100)
+    df_trans, df_var = procesamiento.construir_variantes(procesamiento.construir_transiciones(df, 'RECURSO'))
+    modelo = {'df_transiciones': df_trans, 'df_variantes': df_var}
+    batch.escribir_memoria(str(tmp_path), modelo)
+    reporte = pd.read_csv(tmp_path / 'memoria.csv')
+    totales = reporte[reporte['Columna'] == 'TOTAL'].set_index('Tabla')
+    assert list(totales.index) == ['df_transiciones', 'df_variantes']
+    assert (totales['Bytes_modelo'] < totales['Bytes_objeto']).all()
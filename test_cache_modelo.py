@@ -0,0 +1,21 @@
+import pickle
+
+import pandas as pd
+
+import cache_modelo
+import procesamiento
+from test_procesamiento import ESTADOS, generar_log
+
+
+def test_tamano_modelo_cuenta_arreglos_y_dfg():
+    df = generar_log(n_casos=2000, seed=4)
+    df['FECHA_ESTADO'] = df['FECHA_ESTADO'].dt.strftime('%d-%m-%Y %H:%M:%S')
+    bytes_est = pd.DataFrame({'ESTADO': ESTADOS, 'EST_ORDEN': range(1, len(ESTADOS) + 1)}).to_csv(index=False, sep=';').encode()
+    modelo = procesamiento.procesar_archivos(df.to_csv(index=False, sep=';').encode(), bytes_est)
+
+    tablas = sum(int(v.memory_usage(deep=True).sum()) for v in modelo.values() if isinstance(v, pd.DataFrame))
+    tam = cache_modelo.tamano_modelo(modelo)
+    assert tam == tablas + sum(cache_modelo.tamano_modelo(modelo[k]) for k in ('hash_casos', 'inicios_casos', 'dfg', 'prefijos', 'sketches', 'orden_estados'))
+    assert cache_modelo.tamano_modelo(modelo['dfg']) > 0 and cache_modelo.tamano_modelo(modelo['sketches']) > 0
+    # Del orden del modelo serializado (lo que ocupa en la caché en disco)
+    assert tam >= 0.8 * len(pickle.dumps(modelo, protocol=pickle.HIGHEST_PROTOCOL))
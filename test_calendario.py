@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import calendario as cal
+
+
+def referencia(inicio, fin, calendario):
+    # Día por día: intersección de [inicio, fin) con el turno de cada día hábil
+    if pd.isna(inicio) or pd.isna(fin) or fin <= inicio: return 0
+    t_ini, t_fin = (pd.Timedelta(seconds=s) for s in calendario['turno'])
+    total = pd.Timedelta(0)
+    for dia in pd.date_range(inicio.normalize(), fin.normalize()):
+        if not np.is_busday(np.datetime64(dia.date()), weekmask=calendario['dias_habiles'],
+                            holidays=np.array(calendario['feriados'], dtype='datetime64[D]')):
+            continue
+        desde, hasta = max(inicio, dia + t_ini), min(fin, dia + t_fin)
+        total += max(hasta - desde, pd.Timedelta(0))
+    return int(total.total_seconds())
+
+
+@pytest.mark.parametrize('turno', ['08:30-17:30', '00:00-24:00'])
+def test_segundos_habiles_igual_que_dia_por_dia(turno):
+    calendario = cal.crear_calendario(turno, cal.leer_feriados('01-05-2024\n2024-05-21, 18-09-2024  # fiestas'))
+    rng = np.random.default_rng(0)
+    inicio = pd.Timestamp('2024-04-20') + pd.to_timedelta(rng.integers(0, 200 * 86400, 2000), unit='s')
+    fin = inicio + pd.to_timedelta(rng.exponential(4 * 86400, 2000).astype(np.int64) - 86400, unit='s')
+    inicio, fin = inicio.to_numpy().copy(), fin.to_numpy()
+    inicio[:20] = np.datetime64('NaT')
+
+    res = cal.segundos_habiles(inicio, fin, calendario)
+    esperado = [referencia(pd.Timestamp(a), pd.Timestamp(b), calendario) for a, b in zip(inicio, fin)]
+    np.testing.assert_array_equal(res, esperado)
+
+
+def test_fin_de_semana_y_feriado_no_cuentan():
+    calendario = cal.crear_calendario('08:30-17:30', ['2024-05-20'])
+    viernes = np.array(['2024-05-17T16:00'], dtype='datetime64[s]')
+    martes = np.array(['2024-05-21T10:00'], dtype='datetime64[s]')
+    assert cal.segundos_habiles(viernes, martes, calendario)[0] == 3 * 3600     # 1,5 h + 1,5 h
+
+
+@pytest.mark.parametrize('texto', ['17:00-08:00', '8-17', '08:00-25:00'])
+def test_turno_invalido(texto):
+    with pytest.raises(ValueError):
+        cal.leer_turno(texto)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import estadisticas
+
+
+def datos_grupos(n=5000, seed=0):
+    # Grupos de tamaños muy distintos (uno de un solo valor), duraciones con empates y NaN
+    rng = np.random.default_rng(seed)
+    grupos = rng.choice(['Aprobacion', 'Archivo', 'Ingreso', 'Pago', 'Revision'], n, p=[0.5, 0.3, 0.15, 0.0498, 0.0002])
+    valores = np.round(rng.exponential(3, n), 1)
+    valores[rng.random(n) < 0.03] = np.nan
+    df = pd.DataFrame({'Etapa': grupos, 'Duracion': valores})
+    df.loc[df.index[-1], ['Etapa', 'Duracion']] = ['Unico', 7.5]
+    return df
+
+
+def referencia(df, col_agrupacion, col_valor):
+    # Un groupby con np.percentile por grupo y los atípicos contra los límites del grupo
+    filas = []
+    for grupo, v in df.dropna(subset=[col_valor]).groupby(col_agrupacion, observed=True)[col_valor]:
+        v = v.to_numpy(dtype=np.float64)
+        p = dict(zip(estadisticas.PERCENTILES, np.percentile(v, estadisticas.PERCENTILES)))
+        iqr = p[75] - p[25]
+        atipicos = ((v < p[25] - estadisticas.FACTOR_IQR * iqr) | (v > p[75] + estadisticas.FACTOR_IQR * iqr)).sum()
+        filas.append({'grupo': grupo, 'n': len(v), 'Media': v.mean(), 'Mediana': np.median(v),
+                      **{f'P{q}': p[q] for q in estadisticas.PERCENTILES}, 'Atipicos': atipicos})
+    return pd.DataFrame(filas)
+
+
+@pytest.mark.parametrize('categorica', [False, True])
+def test_estadisticas_agrupadas_igual_que_groupby(categorica):
+    df = datos_grupos()
+    if categorica:
+        df['Etapa'] = df['Etapa'].astype('category')
+    res = estadisticas.estadisticas_agrupadas(df, 'Etapa', 'Duracion')
+    esperado = referencia(df, 'Etapa', 'Duracion')
+    assert list(res['grupo'].astype(str)) == list(esperado['grupo'].astype(str))
+    for c in esperado.columns[1:]:
+        np.testing.assert_allclose(res[c].to_numpy(dtype=np.float64), esperado[c].to_numpy(dtype=np.float64), err_msg=c)
+
+
+def test_intervalos_bootstrap_reproducibles_y_anidados(monkeypatch):
+    # Misma semilla por grupo: igual resultado en serie y repartiendo grupos en el pool;
+    # a mayor nivel, intervalo más ancho, y la mediana muestral queda dentro
+    df = datos_grupos(n=3000, seed=1)
+    serie = estadisticas.intervalos_bootstrap(df, 'Etapa', 'Duracion', 0.95, presupuesto_s=60)
+    monkeypatch.setattr(estadisticas, 'MIN_N_PARALELO', 500)
+    monkeypatch.setattr(estadisticas, 'MAX_PROCESOS', 2)
+    paralelo = estadisticas.intervalos_bootstrap(df, 'Etapa', 'Duracion', 0.95, presupuesto_s=60)
+    pd.testing.assert_frame_equal(serie, paralelo)
+
+    angosto = estadisticas.intervalos_bootstrap(df, 'Etapa', 'Duracion', 0.5, presupuesto_s=60)
+    con_ic = serie['IC_Mediana_Inf'].notna()
+    assert list(con_ic) == list(serie['grupo'] != 'Unico')      # 'Unico' tiene un solo valor
+    assert (serie['IC_Mediana_Inf'] <= angosto['IC_Mediana_Inf'])[con_ic].all()
+    assert (serie['IC_Mediana_Sup'] >= angosto['IC_Mediana_Sup'])[con_ic].all()
+    mediana = estadisticas.estadisticas_agrupadas(df, 'Etapa', 'Duracion')['Mediana']
+    assert ((serie['IC_Mediana_Inf'] <= mediana) & (mediana <= serie['IC_Mediana_Sup']))[con_ic].all()
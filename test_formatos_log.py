@@ -0,0 +1,87 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+import formatos_log
+import particiones
+import procesamiento
+from test_particiones import bytes_estados, comparar_modelos
+from test_procesamiento import generar_log
+
+
+def log_eventos(n_casos=300, seed=13):
+    # Eventos del log de prueba ordenados por caso (XES y OCEL los agrupan así)
+    return generar_log(n_casos=n_casos, seed=seed).sort_values(['ID', 'FECHA_ESTADO'], kind='stable')
+
+
+def a_csv(df):
+    df = df.assign(FECHA_ESTADO=df['FECHA_ESTADO'].dt.strftime('%d-%m-%Y %H:%M:%S'))
+    return df.to_csv(index=False, sep=';').encode()
+
+
+def fecha_iso(fecha):
+    # Hora local con desfase, como la registran los sistemas de origen
+    return fecha.strftime('%Y-%m-%dT%H:%M:%S.000+02:00')
+
+
+def a_xes(df):
+    # Con namespace; cada evento lleva además un 'start' que se debe ignorar
+    lineas = ['<?xml version="1.0" encoding="UTF-8"?>', '<log xmlns="http://www.xes-standard.org/">',
+              '<string key="concept:name" value="log de prueba"/>']
+    for caso, eventos in df.groupby('ID', sort=False, observed=True):
+        lineas += ['<trace>', f'<string key="concept:name" value="{caso}"/>']
+        for e in eventos.itertuples():
+            atributos = [f'<string key="concept:name" value="{e.ESTADO}"/>']
+            if pd.notna(e.FECHA_ESTADO): atributos.append(f'<date key="time:timestamp" value="{fecha_iso(e.FECHA_ESTADO)}"/>')
+            if pd.notna(e.RECURSO): atributos.append(f'<string key="org:resource" value="{e.RECURSO}"/>')
+            for ciclo in ('start', 'complete'):
+                lineas += ['<event>', *atributos, f'<string key="lifecycle:transition" value="{ciclo}"/>', '</event>']
+        lineas.append('</trace>')
+    lineas.append('</log>')
+    return '\n'.join(lineas).encode()
+
+
+def a_ocel(df, version):
+    # Cada evento se relaciona con su caso ('pedido') y con un 'cliente', menos frecuente
+    casos = list(df['ID'].unique())
+    clientes = {c: f'cli{i % 3}' for i, c in enumerate(casos)}
+    eventos = []
+    for i, e in enumerate(df.itertuples()):
+        fecha = fecha_iso(e.FECHA_ESTADO) if pd.notna(e.FECHA_ESTADO) else None
+        if version == 1:
+            eventos.append((f'e{i}', {'ocel:activity': e.ESTADO, 'ocel:timestamp': fecha, 'ocel:omap': [e.ID, clientes[e.ID]],
+                                      'ocel:vmap': {'org:resource': e.RECURSO} if pd.notna(e.RECURSO) else {}}))
+        else:
+            eventos.append({'id': f'e{i}', 'type': e.ESTADO, 'time': fecha,
+                            'relationships': [{'objectId': e.ID, 'qualifier': ''}, {'objectId': clientes[e.ID], 'qualifier': ''}],
+                            'attributes': [{'name': 'org:resource', 'value': e.RECURSO}] if pd.notna(e.RECURSO) else []})
+    if version == 1:
+        objetos = {**{c: {'ocel:type': 'pedido'} for c in casos}, **{c: {'ocel:type': 'cliente'} for c in set(clientes.values())}}
+        doc = {'ocel:global-log': {'ocel:version': '1.0'}, 'ocel:events': dict(eventos), 'ocel:objects': objetos}
+    else:
+        objetos = [{'id': c, 'type': 'pedido'} for c in casos] + [{'id': c, 'type': 'cliente'} for c in set(clientes.values())]
+        doc = {'objectTypes': [{'name': 'pedido'}, {'name': 'cliente'}], 'events': eventos, 'objects': objetos}
+    return json.dumps(doc, ensure_ascii=False, indent=1).encode()
+
+
+@pytest.mark.parametrize('formato', ['xes', 'ocel1', 'ocel2'])
+def test_xes_y_ocel_igual_que_csv(tmp_path, monkeypatch, formato):
+    # Mismo modelo que el CSV equivalente; el OCEL se lee en trozos mínimos para cortar
+    # valores JSON a mitad de un bloque
+    monkeypatch.setattr(particiones, 'MAX_PROCESOS', 1)
+    monkeypatch.setattr(formatos_log, 'BLOQUE_JSON', 7)
+    df = log_eventos()
+    contenido = a_xes(df) if formato == 'xes' else a_ocel(df, int(formato[-1]))
+    ruta = tmp_path / f'log.{formato}'
+    ruta.write_bytes(contenido)
+
+    assert formatos_log.formato_log(contenido[:100]) == formato[:4]
+    est = bytes_estados()
+    comparar_modelos(particiones.procesar_en_particiones(str(ruta), est), procesamiento.procesar_archivos(a_csv(df), est))
+
+
+def test_ocel_invalido():
+    with pytest.raises(ValueError):
+        list(formatos_log.filas_ocel(io.BytesIO(b'{"ocel:events": {"e1": {"ocel:activity": ')))
@@ -0,0 +1,14 @@
+import grafo
+import procesamiento
+from bench_reprocesos import generar_grafo, clasificar_por_mascara
+
+
+def test_clasificar_reprocesos_igual_que_mascara():
+    # Grafo completo de ~2.000 aristas, con estados sin orden (heurística) y bucles
+    edges_stats, dict_orden, estados = generar_grafo(45, seed=1)
+    orden = procesamiento.orden_por_codigo(dict_orden, estados)
+    tipos = grafo.clasificar_reprocesos(edges_stats, orden, estados)['Tipo_Reproceso']
+    referencia = clasificar_por_mascara(edges_stats, dict_orden)
+    assert len(edges_stats) == 2025
+    assert set(referencia) == {'normal', 'bucle', 'retroceso', 'heuristico'}
+    assert (tipos.to_numpy(dtype=object) == referencia).all()
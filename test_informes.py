@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+import calendario as cal
+import informes
+import procesamiento
+import unidades
+
+ESTADOS = ['Ingreso', 'Revision', 'Aprobacion', 'Pago']
+
+
+def modelo_variantes(seed=0):
+    # Cuatro variantes de 40 casos con duraciones de escala distinta (riesgos distintos)
+    rng = np.random.default_rng(seed)
+    filas = []
+    for v, (ruta, escala_dias) in enumerate([(ESTADOS, 2), (ESTADOS[:3], 8), (ESTADOS[::-1], 25), (ESTADOS[:2], 60)]):
+        for c in range(40):
+            t = pd.Timestamp('2024-01-01 09:00') + pd.Timedelta(days=int(rng.integers(0, 200)))
+            for estado in ruta:
+                filas.append({'ID': f'V{v}C{c:03d}', 'ESTADO': estado, 'FECHA_ESTADO': t.strftime('%d-%m-%Y %H:%M:%S'),
+                              'RECURSO': f'R{rng.integers(0, 4)}'})
+                t = t + pd.Timedelta(seconds=int(rng.exponential(escala_dias * 86400 / len(ruta))))
+    bytes_log = pd.DataFrame(filas).to_csv(index=False, sep=';').encode()
+    bytes_est = pd.DataFrame({'ESTADO': ESTADOS, 'EST_ORDEN': range(1, 5)}).to_csv(index=False, sep=';').encode()
+    return procesamiento.procesar_archivos(bytes_log, bytes_est)
+
+
+def riesgos(modelo, unidad, calendario):
+    vista = unidades.vista_modelo(modelo, unidad, calendario)
+    tarjetas, _ = informes.pronostico_variantes(
+        vista['df_variantes'], segundos_unidad=unidades.segundos_por_unidad(unidad, vista['calendario']))
+    return {t['variante']: t['riesgo'] for t in tarjetas}
+
+
+def test_riesgo_no_depende_de_la_unidad():
+    modelo = modelo_variantes()
+    calendario = cal.crear_calendario('08:00-16:00')
+    corridos = riesgos(modelo, 'Días', None)
+    assert len(set(corridos.values())) > 1
+    assert riesgos(modelo, 'Horas', None) == riesgos(modelo, 'Minutos', None) == corridos
+    # Un día hábil es una jornada de 8 h: 10 días hábiles = 80 horas hábiles
+    habiles = riesgos(modelo, 'Días hábiles', calendario)
+    assert riesgos(modelo, 'Horas hábiles', calendario) == habiles
+    assert len(set(habiles.values())) > 1
+    assert len(habiles) == len(corridos)
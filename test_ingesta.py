@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache_modelo
+import ingesta
+import procesamiento
+from test_particiones import bytes_estados, comparar_modelos
+from test_procesamiento import generar_log
+
+
+@pytest.fixture(autouse=True)
+def sin_memoria(monkeypatch):
+    monkeypatch.setattr(ingesta, '_formatos_por_encabezado', {})
+    monkeypatch.setattr(ingesta, '_mapeos_por_encabezado', {})
+    monkeypatch.setattr(ingesta, 'ARCHIVO_MAPEOS', None)
+
+
+def fechas_mezcladas(n=3000, seed=0):
+    # Mayoría en el formato del sistema, algo de ISO, textos inválidos y vacíos
+    rng = np.random.default_rng(seed)
+    fechas = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365 * 86400, n), unit='s')
+    textos = pd.Series(fechas.strftime('%d-%m-%Y %H:%M:%S'), dtype=object)
+    sorteo = rng.random(n)
+    textos[sorteo < 0.1] = fechas[sorteo < 0.1].strftime('%Y-%m-%dT%H:%M:%S')
+    textos[(sorteo >= 0.1) & (sorteo < 0.12)] = 'sin fecha'
+    textos[(sorteo >= 0.12) & (sorteo < 0.14)] = None
+    return textos
+
+
+def log_renombrado(n_casos=300, seed=14):
+    # (log con las columnas del sistema, el mismo con otros nombres y una columna extra)
+    df = generar_log(n_casos=n_casos, seed=seed)
+    df['FECHA_ESTADO'] = df['FECHA_ESTADO'].dt.strftime('%d-%m-%Y %H:%M:%S')
+    otro = df.rename(columns={'ID': 'Nro Tramite', 'ESTADO': 'Paso', 'FECHA_ESTADO': 'Cuando', 'RECURSO': 'Usuario'})
+    otro.insert(0, 'Canal', np.where(np.arange(len(df)) % 3, 'Web', 'Oficina'))
+    return df.to_csv(index=False, sep=';').encode(), otro.to_csv(index=False, sep=';').encode()
+
+
+def test_parsear_fechas_igual_que_mixed():
+    textos = fechas_mezcladas()
+    esperado = pd.to_datetime(textos, format='mixed', dayfirst=True, errors='coerce')
+    pd.testing.assert_series_equal(ingesta.parsear_fechas(textos, 'huella'), esperado)
+    assert ingesta._formatos_por_encabezado == {'huella': '%d-%m-%Y %H:%M:%S'}
+
+
+def test_formato_recordado_se_descarta_si_no_calza():
+    # Mismo encabezado, otro formato: el recordado no cubre la muestra y se vuelve a detectar
+    ingesta.parsear_fechas(fechas_mezcladas(), 'huella')
+    textos = pd.Series(['2024/03/01', '2024/03/02', '2024/12/31', None], dtype=object)
+    fechas = ingesta.parsear_fechas(textos, 'huella')
+    assert list(fechas.dt.strftime('%Y-%m-%d')[:3]) == ['2024-03-01', '2024-03-02', '2024-12-31']
+    assert ingesta._formatos_por_encabezado['huella'] == '%Y/%m/%d'
+
+
+def test_detectar_mapeo_por_alias():
+    encabezado = ['Case ID', 'activity', 'time:timestamp', 'Usuario', 'Monto']
+    assert ingesta.detectar_mapeo(encabezado) == {'ID': 'Case ID', 'ESTADO': 'activity', 'FECHA_ESTADO': 'time:timestamp',
+                                                 'RECURSO': 'Usuario', 'atributos': []}
+
+
+def test_mapeo_recordado_igual_que_columnas_del_sistema(tmp_path, monkeypatch):
+    # Sin mapeo faltan columnas; con el mapeo confirmado el modelo es el mismo, los
+    # atributos llegan como Atr_*, la clave de caché cambia y el mapeo queda persistido
+    log, renombrado = log_renombrado()
+    est = bytes_estados()
+    with pytest.raises(ValueError):
+        procesamiento.procesar_archivos(renombrado, est)
+
+    monkeypatch.setattr(ingesta, 'ARCHIVO_MAPEOS', str(tmp_path / 'mapeos.json'))
+    clave_sin_atributos = cache_modelo.clave_modelo(renombrado, est)
+    mapeo = {'ID': 'Nro Tramite', 'ESTADO': 'Paso', 'FECHA_ESTADO': 'Cuando', 'RECURSO': 'Usuario', 'atributos': []}
+    ingesta.recordar_mapeo(renombrado, mapeo)
+    assert cache_modelo.clave_modelo(renombrado, est) != clave_sin_atributos
+    comparar_modelos(procesamiento.procesar_archivos(renombrado, est), procesamiento.procesar_archivos(log, est))
+
+    ingesta.recordar_mapeo(renombrado, {**mapeo, 'atributos': ['Canal']})
+    df_trans = procesamiento.procesar_archivos(renombrado, est)['df_transiciones']
+    assert set(df_trans['Atr_Canal'].dropna().unique()) == {'Web', 'Oficina'}
+
+    monkeypatch.setattr(ingesta, '_mapeos_por_encabezado', {})
+    ingesta._mapeos_por_encabezado.update(ingesta._leer_mapeos())
+    assert ingesta.mapeo_columnas(renombrado)['atributos'] == ['Canal']
@@ -0,0 +1,79 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import particiones
+import procesamiento
+from test_procesamiento import ESTADOS, generar_log
+
+
+def bytes_log(n_casos=600, seed=0, ids_numericos=False):
+    df = generar_log(n_casos=n_casos, ids_numericos=ids_numericos, seed=seed)
+    df['FECHA_ESTADO'] = df['FECHA_ESTADO'].dt.strftime('%d-%m-%Y %H:%M:%S')
+    return df.to_csv(index=False, sep=';').encode()
+
+
+def bytes_estados(repetido=None):
+    # Maestro de estados; `repetido` aparece dos veces (el segundo orden es el vigente)
+    est = pd.DataFrame({'ESTADO': ESTADOS, 'EST_ORDEN': range(1, len(ESTADOS) + 1)})
+    if repetido:
+        est = pd.concat([est, pd.DataFrame({'ESTADO': [repetido], 'EST_ORDEN': [99]})])
+    return est.to_csv(index=False, sep=';').encode()
+
+
+def comparar_modelos(a, b):
+    # Tablas, hash de rutas, índice DFG y sketches iguales
+    for k in ('df_transiciones', 'df_variantes'):
+        pd.testing.assert_frame_equal(a[k].reset_index(drop=True), b[k].reset_index(drop=True), check_categorical=True)
+    np.testing.assert_array_equal(a['hash_casos'], b['hash_casos'])
+    np.testing.assert_array_equal(a['inicios_casos'], b['inicios_casos'])
+    assert a['dfg']['estados'].equals(b['dfg']['estados']) and a['dfg']['variantes'].equals(b['dfg']['variantes'])
+    for k in ('n', 'suma', 'suma2', 'n_total', 'suma_total', 'suma2_total'):
+        assert abs(a['dfg'][k] - b['dfg'][k]).sum() == 0, k
+    for k in a['sketches']:
+        pd.testing.assert_frame_equal(a['sketches'][k]['cubetas'], b['sketches'][k]['cubetas'], check_dtype=False)
+    for k in ('dict_orden', 'periodo_fechas', 'tiene_est_orden', 'filas_omitidas'):
+        assert a[k] == b[k], k
+    np.testing.assert_array_equal(a['orden_estados'], b['orden_estados'])
+
+
+@pytest.fixture
+def pool_de_dos(monkeypatch):
+    monkeypatch.setattr(particiones, 'MAX_PROCESOS', 2)
+    monkeypatch.setattr(particiones, 'MIN_BYTES_PARALELO', 0)
+    monkeypatch.setattr(particiones, '_pool', None)
+    yield
+    if particiones._pool is not None: particiones._pool.shutdown()
+
+
+@pytest.mark.parametrize('repetido', [None, 'Pago'])
+def test_paralelo_y_particiones_igual_que_en_serie(pool_de_dos, repetido):
+    log, est = bytes_log(), bytes_estados(repetido)
+    serie = procesamiento.procesar_archivos(log, est)
+    comparar_modelos(particiones.procesar_en_paralelo(log, est), serie)
+    comparar_modelos(particiones.procesar_en_particiones(io.BytesIO(log), est, 0.5), serie)
+
+
+@pytest.mark.parametrize('ids_numericos', [False, True])
+def test_bloques_chicos_y_muchas_particiones_igual_que_en_memoria(tmp_path, monkeypatch, ids_numericos):
+    # Log en disco leído en varios bloques y repartido en varias particiones, en serie
+    monkeypatch.setattr(particiones, 'MAX_PROCESOS', 1)
+    monkeypatch.setattr(particiones, 'FILAS_BLOQUE_MIN', 100)
+    log, est = bytes_log(ids_numericos=ids_numericos), bytes_estados()
+    ruta = tmp_path / 'log.csv'
+    ruta.write_bytes(log)
+    presupuesto = 0.2
+    n_part, n_filas = particiones._dimensiones(str(ruta), presupuesto, 1)
+    assert n_part > 4 and n_filas * 4 < log.count(b'\n')
+    assert particiones.usar_particiones(str(ruta), presupuesto) and not particiones.usar_particiones(str(ruta))
+    comparar_modelos(particiones.procesar_en_particiones(str(ruta), est, presupuesto), procesamiento.procesar_archivos(log, est))
+
+
+def test_estado_repetido_no_duplica_eventos():
+    log = bytes_log(n_casos=200)
+    sin_repetir = procesamiento.procesar_archivos(log, bytes_estados())
+    con_repetido = procesamiento.procesar_archivos(log, bytes_estados('Pago'))
+    assert len(con_repetido['df_transiciones']) == len(sin_repetir['df_transiciones'])
+    assert con_repetido['dict_orden']['Pago'] == 99
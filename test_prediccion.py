@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+import prediccion
+import procesamiento
+import snapshot
+import unidades
+from test_procesamiento import generar_log
+from test_snapshot import dir_snapshots, modelo_de
+
+
+def comparar_indices(a, b):
+    assert a['claves'].equals(b['claves'])
+    np.testing.assert_array_equal(a['n'], b['n'])
+    for p in procesamiento.PERCENTILES_PREFIJOS:
+        np.testing.assert_allclose(a['percentiles'][p], b['percentiles'][p], atol=1e-6)
+
+
+def test_indice_prefijos_del_modelo_y_de_la_vista():
+    # Armado al cargar el log; la vista lo escala igual que si se armara en su unidad
+    modelo = modelo_de(generar_log(n_casos=500, seed=6))
+    comparar_indices(modelo['prefijos'], procesamiento.indice_prefijos(modelo['df_transiciones']))
+    for unidad in ('Horas', 'Días hábiles'):
+        vista = unidades.vista_modelo(modelo, unidad)
+        comparar_indices(vista['prefijos'], procesamiento.indice_prefijos(vista['df_transiciones']))
+
+
+def test_predecir_restante_desde_el_primer_estado():
+    # Casos abiertos con solo su primer evento, todos a la fecha de corte: el restante es
+    # el percentil de la duración total de los casos cerrados que empezaron igual
+    modelo = modelo_de(generar_log(n_casos=800, seed=7))
+    vista = unidades.vista_modelo(modelo, 'Minutos')
+    df_trans = modelo['df_transiciones']
+    primeros = df_trans[df_trans['Origen'] == procesamiento.INICIO]
+    total = df_trans.groupby('ID', observed=True)['Duracion'].sum() / 60
+
+    corte = pd.Timestamp('2025-01-01')
+    eventos = pd.DataFrame({'ID': primeros['ID'].to_numpy(), 'ESTADO': primeros['Destino'].astype(str).to_numpy(),
+                            'FECHA_ESTADO': corte})
+    res = prediccion.predecir_restante(vista['prefijos'], eventos, corte, 'Minutos').set_index('ID')
+
+    assert (res['Eventos_Coincidentes'] == 1).all() and (res['Transcurrido'] == 0).all()
+    for estado, ids in eventos.groupby('ESTADO')['ID']:
+        esperado = np.percentile(total.loc[ids].to_numpy(), prediccion.PERCENTILES_RESTANTE)
+        assert (res.loc[ids, 'Casos_Referencia'] == len(ids)).all()
+        for p, valor in zip(prediccion.PERCENTILES_RESTANTE, esperado):
+            np.testing.assert_allclose(res.loc[ids, f'P{p}'], valor)
+
+
+def test_snapshot_conserva_indice_prefijos(dir_snapshots):
+    modelo = modelo_de(generar_log(n_casos=300, seed=8))
+    snapshot.guardar_snapshot(modelo, 'mes')
+    _, cargado = snapshot.cargar_snapshot('mes')
+    comparar_indices(cargado['prefijos'], modelo['prefijos'])
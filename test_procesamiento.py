@@ -0,0 +1,143 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingesta
+import procesamiento
+from procesamiento import INICIO, FIN, COLUMNAS_TRANSICIONES
+
+# ==========================================
+# REFERENCIA: BUCLE POR CASO ORIGINAL
+# ==========================================
+# El armado de transiciones previo a construir_transiciones (un groupby por caso),
+# con la duración en segundos como el modelo actual.
+def transiciones_bucle(df, col_responsable=None):
+    df = df.sort_values(['ID', 'FECHA_ESTADO'])
+    transiciones = []
+    for case_id, group in df.groupby('ID'):
+        estados = [INICIO] + group['ESTADO'].tolist() + [FIN]
+        fechas  = ([group['FECHA_ESTADO'].min()] + group['FECHA_ESTADO'].tolist() + [group['FECHA_ESTADO'].max()])
+        recursos_lista = (group[col_responsable].tolist() if col_responsable else ['Desconocido'] * len(group))
+        recursos = ['Sistema'] + recursos_lista + ['Sistema']
+        for i in range(len(estados) - 1):
+            duracion = ((fechas[i+1] - fechas[i]) // pd.Timedelta(seconds=1)
+                        if pd.notnull(fechas[i+1]) and pd.notnull(fechas[i]) else 0)
+            transiciones.append({
+                'ID': case_id, 'Origen': estados[i], 'Destino': estados[i+1],
+                'Fecha_Inicio': fechas[i], 'Duracion': duracion, 'Recurso_Origen': recursos[i]
+            })
+    return pd.DataFrame(transiciones, columns=COLUMNAS_TRANSICIONES)
+
+
+# El orden del maestro de estados fila por fila, antes de orden_estados vectorizado
+def orden_estados_bucle(df_est):
+    dict_orden = {INICIO: -9999, FIN: 9999}
+    for _, r in df_est.dropna(subset=['ESTADO', 'EST_ORDEN']).iterrows():
+        val_str = str(r['EST_ORDEN']).strip()
+        try: orden_val = float(val_str)
+        except ValueError:
+            m = re.search(r'\d+', val_str)
+            orden_val = float(m.group()) if m else 9999
+        dict_orden[str(r['ESTADO']).strip()] = orden_val
+    return dict_orden
+
+
+# ==========================================
+# LOG GENERADO
+# ==========================================
+ESTADOS = ['Ingreso', 'Revision', 'Aprobacion', 'Pago', 'Archivo', 'Correccion']
+
+
+def generar_log(n_casos=400, ids_numericos=False, seed=0):
+    # Casos de 1 a 6 eventos (incluye casos de un solo evento), fechas repetidas
+    # dentro de un caso, algunas fechas inválidas y recursos faltantes
+    rng = np.random.default_rng(seed)
+    filas = []
+    for c in range(n_casos):
+        t = pd.Timestamp('2024-01-01') + pd.Timedelta(minutes=int(rng.integers(0, 60 * 24 * 300)))
+        for _ in range(int(rng.integers(1, 7))):
+            if rng.random() > 0.2:                   # 20 %: misma fecha que el evento anterior
+                t = t + pd.Timedelta(seconds=int(rng.exponential(3 * 86400)))
+            filas.append({
+                'ID':           c * 7 if ids_numericos else f'C{c:05d}',
+                'ESTADO':       ESTADOS[rng.integers(0, len(ESTADOS))],
+                'FECHA_ESTADO': t if rng.random() > 0.02 else pd.NaT,
+                'RECURSO':      f'R{rng.integers(0, 8)}' if rng.random() > 0.1 else None,
+            })
+    df = pd.DataFrame(filas).sample(frac=1, random_state=seed).reset_index(drop=True)
+    return df.astype({'ESTADO': 'category', 'RECURSO': 'category'})
+
+
+def comparar(vectorizado, referencia):
+    # Columna por columna; las categóricas del modelo se comparan por su valor
+    assert list(vectorizado.columns) == COLUMNAS_TRANSICIONES
+    assert len(vectorizado) == len(referencia)
+    for c in COLUMNAS_TRANSICIONES:
+        a, b = vectorizado[c], referencia[c]
+        if isinstance(a.dtype, pd.CategoricalDtype):
+            a = a.astype(object)
+        if c == 'Fecha_Inicio':
+            np.testing.assert_array_equal(a.to_numpy(dtype='datetime64[ns]'), b.to_numpy(dtype='datetime64[ns]'), err_msg=c)
+        elif c == 'Duracion':
+            np.testing.assert_array_equal(a.to_numpy(dtype=np.int64), b.to_numpy(dtype=np.int64), err_msg=c)
+        else:
+            assert pd.isna(a.to_numpy(dtype=object)).tolist() == pd.isna(b.to_numpy(dtype=object)).tolist(), c
+            validos = ~pd.isna(b.to_numpy(dtype=object))
+            assert (a.to_numpy(dtype=object)[validos] == b.to_numpy(dtype=object)[validos]).all(), c
+
+
+# ==========================================
+# EQUIVALENCIA CON EL BUCLE
+# ==========================================
+@pytest.mark.parametrize('ids_numericos', [False, True])
+@pytest.mark.parametrize('col_responsable', ['RECURSO', None])
+def test_transiciones_igual_que_bucle(ids_numericos, col_responsable):
+    df = generar_log(ids_numericos=ids_numericos, seed=int(ids_numericos))
+    comparar(procesamiento.construir_transiciones(df, col_responsable), transiciones_bucle(df, col_responsable))
+
+
+def test_casos_de_un_evento_y_fechas_empatadas():
+    df = pd.DataFrame({
+        'ID':           ['B', 'A', 'A', 'A', 'C', 'C'],
+        'ESTADO':       ['Pago', 'Ingreso', 'Revision', 'Pago', 'Ingreso', 'Archivo'],
+        'FECHA_ESTADO': pd.to_datetime(['2024-01-05', '2024-01-01', '2024-01-02', '2024-01-02',
+                                        '2024-01-03', None]),
+        'RECURSO':      ['R1', 'R1', None, 'R2', 'R3', 'R3'],
+    }).astype({'ESTADO': 'category', 'RECURSO': 'category'})
+    trans = procesamiento.construir_transiciones(df, 'RECURSO')
+    comparar(trans, transiciones_bucle(df, 'RECURSO'))
+    caso_b = trans[trans['ID'] == 'B']
+    assert caso_b['Origen'].astype(str).tolist() == [INICIO, 'Pago']
+    assert caso_b['Duracion'].tolist() == [0, 0]
+
+
+def test_modelo_desde_csv_igual_que_bucle():
+    # Mismo camino que la carga de la aplicación: lectura, fechas y modelo completo
+    df = generar_log(n_casos=200, seed=3)
+    df['FECHA_ESTADO'] = df['FECHA_ESTADO'].dt.strftime('%d-%m-%Y %H:%M:%S')
+    bytes_log = df.to_csv(index=False, sep=';').encode('utf-8')
+    bytes_est = pd.DataFrame({'ESTADO': ESTADOS, 'EST_ORDEN': range(1, len(ESTADOS) + 1)}).to_csv(index=False, sep=';').encode()
+    modelo = procesamiento.procesar_archivos(bytes_log, bytes_est)
+
+    df_log, _ = ingesta.leer_log(bytes_log)
+    df_log['FECHA_ESTADO'] = ingesta.parsear_fechas(df_log['FECHA_ESTADO'])
+    referencia = transiciones_bucle(df_log[df_log['ID'].notna()], 'RECURSO')
+    comparar(modelo['df_transiciones'][COLUMNAS_TRANSICIONES], referencia)
+
+
+def test_orden_estados_igual_que_bucle():
+    # Números con decimales o espacios, texto con un número, sin número, vacíos y repetidos
+    est = pd.DataFrame({
+        'ESTADO':    ['Ingreso', ' Revision ', 'Aprobacion', 'Pago', 'Archivo', 'Correccion', 'Pago', None, 'Anulado'],
+        'EST_ORDEN': ['1', ' 2.5 ', 'Etapa 3', 'sin orden', '-4', None, '10', '7', '1e2'],
+    })
+    df_est, _ = ingesta.leer_estados(est.to_csv(index=False, sep=';').encode())
+    dict_orden, tiene_est_orden = procesamiento.orden_estados(df_est)
+    assert tiene_est_orden and dict_orden == orden_estados_bucle(df_est)
+    assert dict_orden['Pago'] == 10 and 'Correccion' not in dict_orden
+
+    estados = pd.Index([INICIO, FIN, 'Revision', 'Correccion', 'Anulado'])
+    np.testing.assert_array_equal(procesamiento.orden_por_codigo(dict_orden, estados), [-9999, 9999, 2.5, np.nan, 100])
+    assert procesamiento.orden_estados(df_est[['ESTADO']]) == ({INICIO: -9999, FIN: 9999}, False)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import simulacion
+from test_procesamiento import generar_log
+from test_snapshot import modelo_de
+
+
+def modelo_sim(n_casos, seed):
+    modelo = modelo_de(generar_log(n_casos=n_casos, seed=seed))
+    return simulacion.modelo_simulacion(modelo['df_transiciones'], modelo['df_variantes'])
+
+
+def test_simular_colas_fifo_multiservidor():
+    # Una etapa, servicio de 3 y llegadas cada 1: con un servidor se acumula la cola,
+    # con dos el tercero espera a que se libere el primero
+    llegadas, inicio_caso = np.array([0.0, 1.0, 2.0]), np.array([0, 1, 2, 3])
+    etapa, servicio = np.zeros(3, dtype=np.int64), np.full(3, 3.0)
+    fin, espera = simulacion.simular_colas(llegadas, inicio_caso, etapa, servicio, np.array([1]))
+    np.testing.assert_array_equal(fin, [3, 6, 9])
+    np.testing.assert_array_equal(espera, [0, 2, 4])
+    fin, espera = simulacion.simular_colas(llegadas, inicio_caso, etapa, servicio, np.array([2]))
+    np.testing.assert_array_equal(fin, [3, 4, 6])
+    np.testing.assert_array_equal(espera, [0, 0, 1])
+
+
+def test_sin_colas_el_ciclo_es_la_suma_de_servicios():
+    ms = modelo_sim(300, 10)
+    llegadas, inicio_caso, etapa, servicio = simulacion.muestrear_casos(ms, np.random.default_rng(0), 200)
+    fin, espera = simulacion.simular_colas(llegadas, inicio_caso, etapa, servicio, np.full(len(ms['estados']), 200))
+    assert (espera == 0).all()
+    np.testing.assert_allclose(fin - llegadas, np.add.reduceat(np.r_[servicio, 0.0], inicio_caso[:-1]) * (np.diff(inicio_caso) > 0))
+
+
+def test_concurrencia_percentil():
+    # Dos intervalos solapados la mitad del tiempo total abierto
+    assert simulacion.concurrencia_percentil(np.array([0.0, 5.0]), np.array([10.0, 15.0]), 50) == 1
+    assert simulacion.concurrencia_percentil(np.array([0.0, 5.0]), np.array([10.0, 15.0]), 90) == 2
+
+
+def test_simular_escenario_reproducible_y_pareado(monkeypatch):
+    # Sin cambios, base y escenario coinciden réplica a réplica; el pool no cambia el resultado
+    ms = modelo_sim(300, 11)
+    monkeypatch.setattr(simulacion, 'MAX_PROCESOS', 1)
+    ciclo, espera = simulacion.simular_escenario(ms, {}, n_replicas=60, n_casos=100)
+    np.testing.assert_array_equal(ciclo[:, 0], ciclo[:, 1])
+    np.testing.assert_array_equal(espera[:, 0], espera[:, 1])
+
+    monkeypatch.setattr(simulacion, 'MAX_PROCESOS', 2)
+    ciclo_pool, espera_pool = simulacion.simular_escenario(ms, {}, n_replicas=60, n_casos=100)
+    np.testing.assert_array_equal(ciclo, ciclo_pool)
+    np.testing.assert_array_equal(espera, espera_pool)
+
+
+def test_escenario_no_puede_dejar_una_etapa_sin_recursos():
+    ms = modelo_sim(100, 12)
+    etapa = ms['estados'][np.argmax(ms['recursos'])]
+    with pytest.raises(ValueError):
+        simulacion.servidores_escenario(ms, {etapa: -int(ms['recursos'].max())})
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+import estadisticas
+import informes
+import procesamiento
+import snapshot
+import vista_combinada
+from test_procesamiento import ESTADOS, generar_log
+
+
+def modelo_de(df):
+    df = df.assign(FECHA_ESTADO=df['FECHA_ESTADO'].dt.strftime('%d-%m-%Y %H:%M:%S'))
+    bytes_est = pd.DataFrame({'ESTADO': ESTADOS, 'EST_ORDEN': range(1, len(ESTADOS) + 1)}).to_csv(index=False, sep=';').encode()
+    return procesamiento.procesar_archivos(df.to_csv(index=False, sep=';').encode(), bytes_est)
+
+
+@pytest.fixture
+def dir_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, 'DIR_SNAPSHOTS', str(tmp_path))
+    return tmp_path
+
+
+def test_snapshot_igual_que_modelo(dir_snapshots):
+    # Guardar y reabrir devuelve el mismo modelo: tablas, arreglos, índice DFG, sketches y meta
+    modelo = modelo_de(generar_log(n_casos=400, seed=9))
+    snapshot.guardar_snapshot(modelo, 'mes', clave='abc')
+    clave, cargado = snapshot.cargar_snapshot('mes')
+
+    assert clave == 'abc' and set(cargado) == set(modelo)
+    for k in snapshot.TABLAS:
+        pd.testing.assert_frame_equal(cargado[k], modelo[k])
+    for k in ('hash_casos', 'inicios_casos', 'orden_estados'):
+        np.testing.assert_array_equal(cargado[k], modelo[k])
+    for k, v in modelo['dfg'].items():
+        if sp.issparse(v):
+            assert (cargado['dfg'][k] != v).nnz == 0
+        else:
+            np.testing.assert_array_equal(np.asarray(cargado['dfg'][k]), np.asarray(v))
+    for k, sketch in modelo['sketches'].items():
+        for parte in ('cubetas', 'resumen'):
+            pd.testing.assert_frame_equal(cargado['sketches'][k][parte], sketch[parte])
+    for k in snapshot.META:
+        assert cargado[k] == modelo[k]
+
+
+def test_vista_combinada_igual_que_log_completo(dir_snapshots):
+    # Dos "meses" (casos disjuntos) combinados desde sus snapshots = sketches del log entero
+    df = generar_log(n_casos=600, seed=5)
+    ids = df['ID'].unique()
+    for nombre, parte in (('2024-01', ids[:300]), ('2024-02', ids[300:])):
+        snapshot.guardar_snapshot(modelo_de(df[df['ID'].isin(parte)]), nombre)
+    tablas, resumen = vista_combinada.vista_combinada(['2024-01', '2024-02'], 'Horas')
+
+    completo = modelo_de(df)
+    assert resumen['casos'] == len(completo['df_variantes'])
+    for clave, nombre in vista_combinada.TABLAS.items():
+        sketch = estadisticas.escalar_sketch(completo['sketches'][clave], 1 / 3600)
+        esperado = informes.tabla_estadisticas(None, None, None, nombre, sketch=sketch)
+        pd.testing.assert_frame_equal(tablas[clave], esperado)
+
+
+def test_vista_combinada_rechaza_unidades_habiles(dir_snapshots):
+    snapshot.guardar_snapshot(modelo_de(generar_log(n_casos=50)), 'mes')
+    with pytest.raises(ValueError):
+        vista_combinada.vista_combinada(['mes'], 'Días hábiles')
@@ -0,0 +1,71 @@
+import numpy as np
+
+import calendario as cal
+import estadisticas
+import grafo
+import procesamiento
+
+# ==========================================
+# UNIDADES DE TIEMPO
+# ==========================================
+# El modelo guarda Duracion / Duracion_Total en segundos (int64). Las pestañas trabajan
+# sobre una vista con las duraciones en la unidad elegida (float64): para las unidades
+# lineales solo se escala (índice DFG y sketches incluidos, sin reordenar); las hábiles
+# usan el calendario laboral (turno + feriados) y reconstruyen el índice.
+SEGUNDOS_DIA   = cal.SEGUNDOS_DIA
+UNIDAD_DEFECTO = 'Días'
+# 'jornada': un día hábil equivale a la duración del turno, no a 24 h
+UNIDADES = {
+    'Minutos':       {'segundos': 60,           'nombre': 'minutos',       'sufijo': 'min'},
+    'Horas':         {'segundos': 3_600,        'nombre': 'horas',         'sufijo': 'h'},
+    'Días':          {'segundos': SEGUNDOS_DIA, 'nombre': 'días',          'sufijo': 'd'},
+    'Horas hábiles': {'segundos': 3_600,        'nombre': 'horas hábiles', 'sufijo': 'hh', 'habiles': True},
+    'Días hábiles':  {'segundos': SEGUNDOS_DIA, 'nombre': 'días hábiles',  'sufijo': 'dh', 'habiles': True, 'jornada': True},
+}
+
+
+def segundos_por_unidad(unidad, calendario=None):
+    cfg = UNIDADES[unidad]
+    return cal.segundos_jornada(calendario) if cfg.get('jornada') else cfg['segundos']
+
+
+def duracion_en_unidad(inicio, fin, unidad=UNIDAD_DEFECTO, calendario=None):
+    # Duración de [inicio, fin) en `unidad` para arreglos datetime64 (NaN si falta una fecha)
+    if UNIDADES[unidad].get('habiles'):
+        calendario = calendario or cal.calendario_defecto()
+        segundos = cal.segundos_habiles(inicio, fin, calendario).astype(np.float64)
+        segundos[np.isnat(inicio) | np.isnat(fin)] = np.nan
+    else:
+        segundos = (fin - inicio) / np.timedelta64(1, 's')
+    return segundos / segundos_por_unidad(unidad, calendario)
+
+
+def vista_modelo(modelo, unidad=UNIDAD_DEFECTO, calendario=None):
+    # {'df_transiciones', 'df_variantes', 'dfg', 'prefijos', 'sketches', 'unidad', 'calendario'}
+    # con duraciones en `unidad`
+    cfg = UNIDADES[unidad]
+    df_trans, df_var = modelo['df_transiciones'], modelo['df_variantes']
+    sketches = modelo.get('sketches')
+
+    if cfg.get('habiles'):
+        calendario = calendario or cal.calendario_defecto()
+        divisor = segundos_por_unidad(unidad, calendario)
+        segundos = cal.duraciones_habiles(df_trans, calendario)
+        inicios = modelo['inicios_casos']
+        total = np.add.reduceat(segundos, inicios) if len(inicios) else np.zeros(0, dtype=np.int64)
+        df_trans = df_trans.assign(Duracion=segundos / divisor)
+        df_var = df_var.assign(Duracion_Total=total / divisor)
+        dfg = grafo.construir_indice_dfg(df_trans)
+        prefijos = procesamiento.indice_prefijos(df_trans)
+        if sketches: sketches = estadisticas.sketches_modelo(df_trans, df_var)
+    else:
+        calendario = None
+        factor = 1 / cfg['segundos']
+        df_trans = df_trans.assign(Duracion=df_trans['Duracion'].to_numpy() * factor)
+        df_var = df_var.assign(Duracion_Total=df_var['Duracion_Total'].to_numpy() * factor)
+        dfg = grafo.escalar_indice(modelo['dfg'], factor)
+        prefijos = procesamiento.escalar_prefijos(modelo['prefijos'], factor)
+        if sketches: sketches = {k: estadisticas.escalar_sketch(s, factor) for k, s in sketches.items()}
+
+    return {'df_transiciones': df_trans, 'df_variantes': df_var, 'dfg': dfg, 'prefijos': prefijos,
+            'sketches': sketches, 'unidad': unidad, 'calendario': calendario}
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import sys
+
+import estadisticas
+import informes
+import snapshot
+import unidades
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+# Estadísticas de tiempos de varios períodos a partir de sus snapshots (p. ej. doce
+# meses -> vista anual) combinando solo los sketches: no se leen los eventos, así que
+# la memoria no crece con el volumen del log. Deja en <salida>/ un CSV por tabla
+# (variantes por ruta, etapas, recursos) y un resumen.json:
+#   python vista_combinada.py 2024-01 2024-02 2024-03 --salida anual_2024/ --unidad Días
+# Los sketches están en segundos corridos: las unidades hábiles requieren los eventos.
+TABLAS = {'variante': 'Ruta', 'etapa': 'Etapa', 'recurso': 'Recurso'}
+
+
+def vista_combinada(nombres, unidad=unidades.UNIDAD_DEFECTO):
+    # ({clave: tabla de estadísticas}, resumen) de los snapshots `nombres`
+    if unidades.UNIDADES[unidad].get('habiles'):
+        raise ValueError("Las unidades hábiles no se pueden calcular desde sketches.")
+    sketches = snapshot.combinar_snapshots(nombres)
+    factor = 1 / unidades.UNIDADES[unidad]['segundos']
+    tablas = {clave: informes.tabla_estadisticas(None, None, None, TABLAS[clave],
+                                                 sketch=estadisticas.escalar_sketch(sketches[clave], factor))
+              for clave in TABLAS if clave in sketches}
+    metas = [snapshot.leer_meta(n) for n in nombres]
+    resumen = {
+        'snapshots':     list(nombres),
+        'periodos':      [m['periodo_fechas'] for m in metas],
+        'casos':         sum(m['n_casos'] for m in metas),
+        'transiciones':  sum(m['n_transiciones'] for m in metas),
+        'unidad':        unidades.UNIDADES[unidad]['nombre'],
+        'error_relativo': next(iter(sketches.values()))['alfa'] if sketches else None,
+    }
+    return tablas, resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Combina los sketches de varios snapshots en una vista de tiempos.")
+    parser.add_argument('snapshots', nargs='+', help="Nombres de los snapshots (carpetas en --dir-snapshots)")
+    parser.add_argument('--dir-snapshots', default=snapshot.DIR_SNAPSHOTS, help="Directorio de los snapshots")
+    parser.add_argument('--salida', default='vista_combinada', help="Directorio de salida")
+    parser.add_argument('--unidad', default=unidades.UNIDAD_DEFECTO,
+                        choices=[u for u, cfg in unidades.UNIDADES.items() if not cfg.get('habiles')],
+                        help="Unidad de tiempo de las duraciones informadas")
+    args = parser.parse_args(argv)
+
+    snapshot.DIR_SNAPSHOTS = args.dir_snapshots
+    try:
+        tablas, resumen = vista_combinada(args.snapshots, args.unidad)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"ERROR  {e}", file=sys.stderr)
+        return 1
+    os.makedirs(args.salida, exist_ok=True)
+    for clave, df in tablas.items():
+        df.to_csv(os.path.join(args.salida, f"estadisticas_{clave}.csv"), index=False, encoding='utf-8')
+    with open(os.path.join(args.salida, 'resumen.json'), 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+    print(f"OK     {len(args.snapshots)} snapshots, {resumen['casos']:,} casos -> {args.salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())